@@ -5,10 +5,11 @@ Monitora condições climáticas e fornece insights para agricultura brasileira.
 
 import os
 from typing import Dict, Any, List
-from google import genai
-from google.genai import types
+from .llm import LazyClient, types
+from services.metrics import instrument_agent
 
 
+@instrument_agent("climate_monitor")
 class ClimateMonitorAgent:
     """Agente responsável por monitorar clima e condições meteorológicas."""
     
@@ -18,7 +19,7 @@ class ClimateMonitorAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = LazyClient(api_key)
         self.model_id = "gemini-2.0-flash-exp"
         
     async def analyze_climate(self, location: str, climate_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -68,7 +69,7 @@ class ClimateMonitorAgent:
             Use linguagem clara e objetiva, com foco em ações práticas.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -131,7 +132,7 @@ class ClimateMonitorAgent:
             Seja específico e prático nas recomendações.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -188,7 +189,7 @@ class ClimateMonitorAgent:
             Considere as condições agrícolas brasileiras.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -280,7 +281,7 @@ class ClimateMonitorAgent:
             que podem ser tomadas COM OS RECURSOS DISPONÍVEIS no Brasil.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -421,7 +422,7 @@ class ClimateMonitorAgent:
             - Foque em AÇÕES CONCRETAS que podem ser tomadas AGORA
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
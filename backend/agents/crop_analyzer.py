@@ -4,12 +4,14 @@ Analyzes crop health through images and provides diagnostic insights.
 """
 
 import os
+import json
 import base64
-from typing import Dict, Any, Optional
-from google import genai
-from google.genai import types
+from typing import Dict, Any, Optional, Union
+from .llm import LazyClient, types
+from services.metrics import instrument_agent
 
 
+@instrument_agent("crop_analyzer")
 class CropAnalyzerAgent:
     """Agent responsible for analyzing crop health and diseases."""
     
@@ -19,17 +21,24 @@ class CropAnalyzerAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = LazyClient(api_key)
         self.model_id = "gemini-2.0-flash-exp"
     
-    async def analyze_crop_image(self, image_data: str, crop_type: str, additional_info: Optional[str] = None) -> Dict[str, Any]:
+    async def analyze_crop_image(
+        self,
+        image_data: Union[str, bytes],
+        crop_type: str,
+        additional_info: Optional[str] = None,
+        mime_type: str = "image/jpeg"
+    ) -> Dict[str, Any]:
         """
         Analyze crop health from an image.
         
         Args:
-            image_data: Base64 encoded image or image URL
+            image_data: Raw image bytes, base64 encoded image or image URL
             crop_type: Type of crop in the image
             additional_info: Additional context about the crop
+            mime_type: MIME type of the image data
             
         Returns:
             Analysis results with health assessment and recommendations
@@ -51,19 +60,24 @@ class CropAnalyzerAgent:
             Format your response as JSON with keys: health_status, issues, severity, recommendations, prevention, confidence.
             """
             
-            # Handle both base64 and URL formats
-            if image_data.startswith('http'):
+            # Handle raw bytes, base64 and URL formats
+            if isinstance(image_data, bytes):
                 contents = [
-                    types.Part.from_uri(file_uri=image_data, mime_type="image/jpeg"),
+                    types.Part.from_bytes(data=image_data, mime_type=mime_type),
+                    types.Part.from_text(prompt)
+                ]
+            elif image_data.startswith('http'):
+                contents = [
+                    types.Part.from_uri(file_uri=image_data, mime_type=mime_type),
                     types.Part.from_text(prompt)
                 ]
             else:
                 contents = [
-                    types.Part.from_bytes(data=base64.b64decode(image_data), mime_type="image/jpeg"),
+                    types.Part.from_bytes(data=base64.b64decode(image_data), mime_type=mime_type),
                     types.Part.from_text(prompt)
                 ]
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=contents
             )
@@ -82,6 +96,49 @@ class CropAnalyzerAgent:
                 "error": str(e)
             }
     
+    def prescreen_diagnosis(self, crop_type: str, prescreen: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Build a deterministic diagnosis for images the local vegetation pre-screen can settle.
+        
+        Args:
+            crop_type: Type of crop in the image
+            prescreen: Vegetation pre-screen output (verdict, indices, heatmap)
+            
+        Returns:
+            Analysis results in the same format as analyze_crop_image, or None if
+            the image is ambiguous and needs the vision model
+        """
+        verdict = prescreen.get("verdict")
+        
+        if verdict == "healthy":
+            analysis = {
+                "health_status": "healthy",
+                "issues": [],
+                "severity": "low",
+                "recommendations": ["No intervention needed; keep routine scouting schedule"],
+                "prevention": ["Continue current nutrition, irrigation and monitoring practices"],
+                "confidence": "high",
+            }
+        elif verdict == "non_crop":
+            analysis = {
+                "health_status": "not_applicable",
+                "issues": ["No crop foliage detected in the image"],
+                "severity": "low",
+                "recommendations": [f"Retake the photo with the {crop_type} canopy or affected leaves in frame"],
+                "prevention": [],
+                "confidence": "high",
+            }
+        else:
+            return None
+        
+        return {
+            "status": "success",
+            "agent": "crop_analyzer",
+            "crop_type": crop_type,
+            "analysis": json.dumps(analysis, ensure_ascii=False),
+            "source": "prescreen"
+        }
+    
     async def identify_disease(self, symptoms: str, crop_type: str) -> Dict[str, Any]:
         """
         Identify potential crop disease from described symptoms.
@@ -110,7 +167,7 @@ class CropAnalyzerAgent:
             Format as JSON with keys: diseases (array), treatments, recovery_time, spread_risk, prevention.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -160,7 +217,7 @@ class CropAnalyzerAgent:
             Format as JSON.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -210,7 +267,7 @@ class CropAnalyzerAgent:
             Format as JSON with detailed explanations.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
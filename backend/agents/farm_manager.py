@@ -5,14 +5,15 @@ Orquestra todos os agentes usando Google Agent Development Kit.
 
 import os
 from typing import Dict, Any, List
-from google import genai
-from google.genai import types
+from .llm import LazyAgent, LazyClient, types
+from services.metrics import instrument_agent
 from .climate_monitor import ClimateMonitorAgent
 from .crop_analyzer import CropAnalyzerAgent
 from .water_optimizer import WaterOptimizerAgent
 from .yield_predictor import YieldPredictorAgent
 
 
+@instrument_agent("farm_manager")
 class FarmManagerAgent:
     """
     Agente Gerente da Fazenda - Coordena todos os agentes especializados.
@@ -25,14 +26,14 @@ class FarmManagerAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = LazyClient(api_key)
         self.model_id = "gemini-2.0-flash-exp"
         
-        # Initialize all specialized agents
-        self.climate_agent = ClimateMonitorAgent()
-        self.crop_agent = CropAnalyzerAgent()
-        self.water_agent = WaterOptimizerAgent()
-        self.yield_agent = YieldPredictorAgent()
+        # Specialized agents are constructed on first use
+        self.climate_agent = LazyAgent(ClimateMonitorAgent)
+        self.crop_agent = LazyAgent(CropAnalyzerAgent)
+        self.water_agent = LazyAgent(WaterOptimizerAgent)
+        self.yield_agent = LazyAgent(YieldPredictorAgent)
         
         # System instruction em português para o Farm Manager
         self.system_instruction = """
@@ -111,7 +112,7 @@ class FarmManagerAgent:
             """
             
             # Gerar resposta usando Gemini 2.0 Flash
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=full_prompt,
                 config=types.GenerateContentConfig(
@@ -187,7 +188,7 @@ class FarmManagerAgent:
             Use linguagem clara, objetiva e acionável.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config=types.GenerateContentConfig(temperature=0.7)
@@ -285,7 +286,7 @@ class FarmManagerAgent:
             Seja específico, prático e considere as condições brasileiras.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config=types.GenerateContentConfig(temperature=0.7)
@@ -366,7 +367,7 @@ class FarmManagerAgent:
             Use dados concretos e seja específico nas recomendações.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config=types.GenerateContentConfig(temperature=0.7)
@@ -448,7 +449,7 @@ class FarmManagerAgent:
             - Considere condições e recursos brasileiros
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -0,0 +1,333 @@
+"""
+Gemini Client
+Shared Gemini client, SDK types and agents, each created on first use instead of at import.
+"""
+
+import os
+import time
+import asyncio
+import importlib
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from services.cassette import CASSETTE, KIND_LLM, CassetteMissError, canonical, request_key
+from services.deadline import DeadlineExceededError, remaining
+from services.metrics import LLM_DURATION, LLM_FIRST_TOKEN, LLM_IN_FLIGHT, current_agent
+from services.usage import ACCOUNTANT
+
+
+class LazyModule:
+    """Module proxy that imports the module on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# google.genai.types takes seconds to import; agents only need it when they call the model
+types = LazyModule("google.genai.types")
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: Optional[str] = None):
+    """
+    Shared genai.Client for an API key (GOOGLE_API_KEY by default).
+
+    GEMINI_BASE_URL replaces the API endpoint, e.g. with a proxy or the local
+    stand-in server of the load benchmarks (benchmarks/fake_gemini.py).
+    """
+    api_key = api_key or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable not set")
+
+    client = _clients.get(api_key)
+    if client is None:
+        # The warm-up hook may build the client from a worker thread
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                from google import genai
+                base_url = os.getenv("GEMINI_BASE_URL")
+                http_options = types.HttpOptions(base_url=base_url) if base_url else None
+                client = _clients[api_key] = genai.Client(api_key=api_key, http_options=http_options)
+    return client
+
+
+class CassetteModels:
+    """
+    client.aio.models that records calls to the cassette or answers them from it
+    (LLM_CASSETTE_MODE, see services.cassette).
+    """
+
+    def __init__(self, models: Any):
+        self._models = models
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._models, name)
+
+    @staticmethod
+    def _request(kwargs: Dict[str, Any]) -> Any:
+        request = canonical(kwargs)
+        # Transport options (the per-request deadline) do not change the answer
+        config = request.get("config")
+        if isinstance(config, dict):
+            config.pop("http_options", None)
+            if not config:
+                del request["config"]
+        return request
+
+    @staticmethod
+    def _replay(method: str, model: str, request: Any) -> Optional[Dict[str, Any]]:
+        entry = CASSETTE.lookup(KIND_LLM, request_key(method, model, request))
+        if entry is None and CASSETTE.on_miss != "live":
+            raise CassetteMissError(f"No recorded {method} call to {model} for this request")
+        return entry
+
+    async def generate_content(self, *, model: str, **kwargs) -> Any:
+        request = self._request(kwargs)
+        if CASSETTE.replaying:
+            entry = self._replay("generate_content", model, request)
+            if entry is not None:
+                await CASSETTE.delay(entry["latency"])
+                return types.GenerateContentResponse.model_validate(entry["response"])
+
+        started = time.perf_counter()
+        response = await self._models.generate_content(model=model, **kwargs)
+        if CASSETTE.recording:
+            await CASSETTE.record(KIND_LLM, request_key("generate_content", model, request), {
+                "method": "generate_content",
+                "model": model,
+                "request": request,
+                "response": response.model_dump(mode="json", exclude_none=True),
+                "latency": time.perf_counter() - started,
+            })
+        return response
+
+    async def generate_content_stream(self, *, model: str, **kwargs) -> AsyncIterator[Any]:
+        request = self._request(kwargs)
+        if CASSETTE.replaying:
+            entry = self._replay("generate_content_stream", model, request)
+            if entry is not None:
+                return self._replayed_stream(entry)
+
+        started = time.perf_counter()
+        stream = await self._models.generate_content_stream(model=model, **kwargs)
+        if CASSETTE.recording:
+            return self._recorded_stream(stream, model, request, started)
+        return stream
+
+    @staticmethod
+    async def _replayed_stream(entry: Dict[str, Any]) -> AsyncIterator[Any]:
+        previous = 0.0
+        for offset, chunk in zip(entry["offsets"], entry["chunks"]):
+            await CASSETTE.delay(offset - previous)
+            previous = offset
+            yield types.GenerateContentResponse.model_validate(chunk)
+
+    @staticmethod
+    async def _recorded_stream(stream: AsyncIterator[Any], model: str, request: Any, started: float) -> AsyncIterator[Any]:
+        chunks = []
+        offsets = []
+        async for chunk in stream:
+            chunks.append(chunk.model_dump(mode="json", exclude_none=True))
+            offsets.append(time.perf_counter() - started)
+            yield chunk
+        # Only complete streams are recorded
+        await CASSETTE.record(KIND_LLM, request_key("generate_content_stream", model, request), {
+            "method": "generate_content_stream",
+            "model": model,
+            "request": request,
+            "chunks": chunks,
+            "offsets": offsets,
+        })
+
+
+# Added to the upstream timeout, so the request's own deadline (cancellation and 504) fires first
+UPSTREAM_TIMEOUT_GRACE = 1.0
+
+
+def with_deadline(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Model call arguments carrying the remaining request deadline as the HTTP timeout,
+    which the SDK also sends to the API (X-Server-Timeout) so Gemini can give up too.
+    """
+    left = remaining()
+    if left is None:
+        return kwargs
+    if left <= 0:
+        raise DeadlineExceededError("Request deadline exceeded before the model call")
+    config = kwargs.get("config")
+    if config is None:
+        config = types.GenerateContentConfig()
+    elif isinstance(config, dict):
+        config = types.GenerateContentConfig.model_validate(config)
+    timeout = int((left + UPSTREAM_TIMEOUT_GRACE) * 1000)
+    if config.http_options is not None:
+        http_options = config.http_options.model_copy(update={"timeout": timeout})
+    else:
+        http_options = types.HttpOptions(timeout=timeout)
+    return {**kwargs, "config": config.model_copy(update={"http_options": http_options})}
+
+
+def _as_cancellation(error: BaseException) -> Optional[asyncio.CancelledError]:
+    """
+    The CancelledError to raise for a failed model call when its task is being cancelled, else None.
+
+    The SDK's error handling can replace a cancellation with another exception (with an
+    aiohttp older than 3.11, an AttributeError for a missing aiohttp error class), which
+    agents would otherwise report as an ordinary failure and the request would not stop.
+    """
+    if isinstance(error, asyncio.CancelledError):
+        return error
+    task = asyncio.current_task()
+    if task is not None and task.cancelling():
+        return asyncio.CancelledError()
+    return None
+
+
+class TimedModels:
+    """
+    client.aio.models with request latency, time to first token and token usage recorded.
+
+    The model is chosen per call against the requesting farm's token budget
+    (see services.usage): the fallback model once over budget, refused past the hard limit.
+    Calls inherit the request's deadline (see services.deadline).
+    """
+
+    def __init__(self, models: Any):
+        self._models = models
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._models, name)
+
+    async def generate_content(self, *, model: str, **kwargs) -> Any:
+        agent, _ = current_agent.get()
+        requested, model = model, ACCOUNTANT.choose_model(model)
+        kwargs = with_deadline(kwargs)
+        in_flight = LLM_IN_FLIGHT.labels(model)
+        in_flight.inc()
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self._models.generate_content(model=model, **kwargs)
+            outcome = "ok"
+            ACCOUNTANT.record(model, response.usage_metadata, degraded=model != requested)
+            return response
+        except BaseException as e:
+            cancellation = _as_cancellation(e)
+            if cancellation is None:
+                raise
+            outcome = "cancelled"
+            raise cancellation
+        finally:
+            in_flight.dec()
+            LLM_DURATION.labels(model, agent, outcome).observe(time.perf_counter() - started)
+
+    async def generate_content_stream(self, *, model: str, **kwargs) -> AsyncIterator[Any]:
+        agent, _ = current_agent.get()
+        requested, model = model, ACCOUNTANT.choose_model(model)
+        kwargs = with_deadline(kwargs)
+        in_flight = LLM_IN_FLIGHT.labels(model)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            stream = await self._models.generate_content_stream(model=model, **kwargs)
+        except BaseException as e:
+            in_flight.dec()
+            cancellation = _as_cancellation(e)
+            LLM_DURATION.labels(model, agent, "error" if cancellation is None else "cancelled").observe(time.perf_counter() - started)
+            if cancellation is None:
+                raise
+            raise cancellation
+        return self._timed_stream(stream, model, agent, started, model != requested)
+
+    @staticmethod
+    async def _timed_stream(
+        stream: AsyncIterator[Any],
+        model: str,
+        agent: str,
+        started: float,
+        degraded: bool
+    ) -> AsyncIterator[Any]:
+        outcome = "error"
+        first = True
+        usage = None
+        try:
+            async for chunk in stream:
+                if first:
+                    LLM_FIRST_TOKEN.labels(model, agent).observe(time.perf_counter() - started)
+                    first = False
+                # Each chunk carries the running totals; the last one has the whole response's
+                usage = chunk.usage_metadata or usage
+                yield chunk
+            outcome = "ok"
+        except BaseException as e:
+            cancellation = _as_cancellation(e)
+            if cancellation is None:
+                raise
+            outcome = "cancelled"
+            raise cancellation
+        finally:
+            if usage is not None:
+                ACCOUNTANT.record(model, usage, degraded=degraded)
+            LLM_IN_FLIGHT.labels(model).dec()
+            LLM_DURATION.labels(model, agent, outcome).observe(time.perf_counter() - started)
+
+
+class TimedAio:
+    """client.aio whose models calls are timed (and recorded or replayed in cassette mode)."""
+
+    def __init__(self, aio: Any):
+        self._aio = aio
+
+    @property
+    def models(self) -> TimedModels:
+        models = self._aio.models
+        if CASSETTE.mode != "off":
+            models = CassetteModels(models)
+        return TimedModels(models)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._aio, name)
+
+
+class LazyClient:
+    """Stands in for genai.Client; the shared client is built on first use and async model calls are timed."""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self._api_key = api_key
+
+    def __getattr__(self, name: str) -> Any:
+        value = getattr(get_client(self._api_key), name)
+        return TimedAio(value) if name == "aio" else value
+
+
+class LazyAgent:
+    """Proxy that constructs an agent on first attribute access."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._agent = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """The agent, constructing it if needed."""
+        if self._agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._factory()
+        return self._agent
+
+    @property
+    def created(self) -> bool:
+        return self._agent is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
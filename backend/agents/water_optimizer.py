@@ -6,10 +6,11 @@ Optimizes water usage and irrigation schedules for sustainable agriculture.
 import os
 from typing import Dict, Any, List
 from datetime import datetime, timedelta
-from google import genai
-from google.genai import types
+from .llm import LazyClient, types
+from services.metrics import instrument_agent
 
 
+@instrument_agent("water_optimizer")
 class WaterOptimizerAgent:
     """Agent responsible for optimizing water usage and irrigation."""
     
@@ -19,7 +20,7 @@ class WaterOptimizerAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = LazyClient(api_key)
         self.model_id = "gemini-2.0-flash-exp"
     
     async def create_irrigation_schedule(
@@ -66,7 +67,7 @@ class WaterOptimizerAgent:
             Format as JSON with a daily schedule array and summary statistics.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -125,7 +126,7 @@ class WaterOptimizerAgent:
             Format as JSON with detailed metrics and actionable recommendations.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -180,7 +181,7 @@ class WaterOptimizerAgent:
             Format as JSON with issues array and recommendations.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -239,7 +240,7 @@ class WaterOptimizerAgent:
             Format as JSON with detailed comparison and final recommendation.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -6,10 +6,11 @@ Predicts crop yields and provides production forecasts.
 import os
 from typing import Dict, Any, List
 from datetime import datetime
-from google import genai
-from google.genai import types
+from .llm import LazyClient, types
+from services.metrics import instrument_agent
 
 
+@instrument_agent("yield_predictor")
 class YieldPredictorAgent:
     """Agent responsible for predicting crop yields and production forecasts."""
     
@@ -19,7 +20,7 @@ class YieldPredictorAgent:
         if not api_key:
             raise ValueError("GOOGLE_API_KEY environment variable not set")
         
-        self.client = genai.Client(api_key=api_key)
+        self.client = LazyClient(api_key)
         self.model_id = "gemini-2.0-flash-exp"
     
     async def predict_yield(
@@ -81,7 +82,7 @@ class YieldPredictorAgent:
             Format as JSON with detailed predictions and analysis.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -147,7 +148,7 @@ class YieldPredictorAgent:
             Format as JSON with actionable recommendations.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -209,7 +210,7 @@ class YieldPredictorAgent:
             Format as JSON with detailed financial projections.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
@@ -267,7 +268,7 @@ class YieldPredictorAgent:
             Format as JSON with detailed monthly schedule and financial projections.
             """
             
-            response = self.client.models.generate_content(
+            response = await self.client.aio.models.generate_content(
                 model=self.model_id,
                 contents=prompt
             )
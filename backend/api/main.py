@@ -4,11 +4,20 @@ Multi-Agent System for Smart Agriculture
 """
 
 import os
-from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+import asyncio
+from fastapi import FastAPI, Response
 from dotenv import load_dotenv
 
+from services.cassette import CASSETTE
+from services.metrics import CONTENT_TYPE, REGISTRY, watch_event_loop
+from .middleware import (
+    CORSMiddleware,
+    DeadlineMiddleware,
+    MetricsMiddleware,
+    NegotiationMiddleware,
+    TrafficRecorderMiddleware
+)
+from .responses import FastJSONResponse
 from .routes import router
 
 # Load environment variables
@@ -18,56 +27,26 @@ load_dotenv()
 app = FastAPI(
     title="AgriSmart Brasil API",
     description="Sistema Multi-Agente para Agricultura Inteligente",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
-# ========== MIDDLEWARE HTTP PARA CORS (PRIMEIRO!) ==========
-@app.middleware("http")
-async def cors_middleware(request: Request, call_next):
-    """Middleware para adicionar headers CORS em TODAS as requisições."""
-    # Handle preflight OPTIONS requests
-    if request.method == "OPTIONS":
-        response = Response()
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH, HEAD"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        response.headers["Access-Control-Max-Age"] = "3600"
-        return response
-    
-    # Process normal requests
-    response = await call_next(request)
-    
-    # Add CORS headers to all responses
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH, HEAD"
-    response.headers["Access-Control-Allow-Headers"] = "*"
-    response.headers["Access-Control-Expose-Headers"] = "*"
-    
-    return response
+# ========== DEADLINES (innermost, so a 504 still gets CORS headers and is counted by metrics) ==========
+if os.getenv("REQUEST_CANCELLATION", "true").lower() == "true":
+    app.add_middleware(DeadlineMiddleware)
 
-# ========== CORS MIDDLEWARE (SEGUNDO!) ==========
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["*"]
-)
+# ========== RESPONSE FORMAT (JSON or MessagePack by Accept header) ==========
+app.add_middleware(NegotiationMiddleware)
 
-# ========== OPTIONS HANDLER PARA TODAS AS ROTAS ==========
-@app.options("/{full_path:path}")
-async def options_handler(full_path: str):
-    """Handle OPTIONS requests for CORS preflight."""
-    return Response(
-        status_code=200,
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS, PATCH, HEAD",
-            "Access-Control-Allow-Headers": "*",
-            "Access-Control-Max-Age": "3600",
-        }
-    )
+# ========== CORS (pure ASGI, before routing) ==========
+app.add_middleware(CORSMiddleware)
+
+# ========== TRAFFIC RECORDING (LLM_CASSETTE_MODE=record, for offline replay) ==========
+if CASSETTE.recording:
+    app.add_middleware(TrafficRecorderMiddleware)
+
+# ========== METRICS (outermost, so timings include CORS and serialization) ==========
+app.add_middleware(MetricsMiddleware)
 
 # Include routers AFTER CORS setup
 app.include_router(router, prefix="/api")
@@ -91,6 +70,27 @@ async def root():
     }
 
 
+@app.on_event("startup")
+async def start_metrics():
+    """Start flushing this worker's metrics for multi-worker scrapes and watching event loop lag."""
+    await REGISTRY.start()
+    app.state.loop_watcher = asyncio.create_task(watch_event_loop())
+
+
+@app.on_event("shutdown")
+async def stop_metrics():
+    """Stop the event loop watcher and write the final metrics snapshot of this worker."""
+    app.state.loop_watcher.cancel()
+    await asyncio.gather(app.state.loop_watcher, return_exceptions=True)
+    await REGISTRY.stop()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics (all workers when METRICS_MULTIPROC_DIR is set)."""
+    return Response(await asyncio.to_thread(REGISTRY.render), media_type=CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Cloud Run."""
@@ -103,10 +103,11 @@ async def health_check():
 if __name__ == "__main__":
     import uvicorn
     
+    # Development server; production runs gunicorn with gunicorn.conf.py
     port = int(os.getenv("PORT", 8080))
     uvicorn.run(
         "api.main:app",
         host="0.0.0.0",
         port=port,
-        reload=True
+        reload=os.getenv("ENVIRONMENT", "development") == "development"
     )
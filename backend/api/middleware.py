@@ -0,0 +1,363 @@
+"""
+AgriSmart Brasil - ASGI Middleware
+Pure ASGI middleware that adds headers without wrapping response bodies, so streaming and SSE pass through.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.cassette import CASSETTE, KIND_HTTP, encode_body
+from services.deadline import TIMEOUT_HEADER, DeadlinePolicy, request_deadline
+from services.metrics import HTTP_CANCELLED, HTTP_DURATION, HTTP_IN_FLIGHT
+from .responses import MSGPACK_AVAILABLE, accepts_msgpack, wants_msgpack
+
+
+ALLOW_METHODS = "GET, POST, PUT, DELETE, OPTIONS, PATCH, HEAD"
+
+# Scope key set by DeadlineMiddleware when it cancels a handler: "disconnect" or "deadline"
+CANCELLED = "agrismart.cancelled"
+
+# Status recorded for requests the client abandoned (no response was sent; nginx's convention)
+CLIENT_CLOSED_REQUEST = 499
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class CORSMiddleware:
+    """
+    CORS for every HTTP response, with preflight answered before routing.
+
+    Origins come from CORS_ORIGINS (comma-separated, "*" for any, the default
+    when unset). A preflight is an OPTIONS request with both Origin and
+    Access-Control-Request-Method; any other OPTIONS request goes to the app.
+    Header lists are built once; simple requests only get headers appended to
+    the response start message.
+    """
+
+    def __init__(self, app: ASGIApp, origins: Optional[List[str]] = None, max_age: Optional[int] = None):
+        self.app = app
+        if origins is None:
+            origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",") if o.strip()] or ["*"]
+        self.allow_any = "*" in origins
+        self.origins = frozenset(origin.encode() for origin in origins)
+        max_age = max_age if max_age is not None else int(os.getenv("CORS_MAX_AGE", 3600))
+
+        self.simple_headers: Headers = [
+            (b"access-control-allow-methods", ALLOW_METHODS.encode()),
+            (b"access-control-allow-headers", b"*"),
+            (b"access-control-expose-headers", b"*"),
+        ]
+        self.preflight_headers: Headers = [
+            (b"access-control-allow-methods", ALLOW_METHODS.encode()),
+            (b"access-control-max-age", str(max_age).encode()),
+        ]
+        if not self.allow_any:
+            self.simple_headers.append((b"vary", b"Origin"))
+            self.preflight_headers.append((b"vary", b"Origin"))
+
+    def _allow_origin(self, origin: Optional[bytes]) -> Optional[bytes]:
+        """Value of Access-Control-Allow-Origin for a request, or None if not allowed."""
+        if self.allow_any:
+            return b"*"
+        if origin is not None and origin in self.origins:
+            return origin
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        requested_method = None
+        requested_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                requested_method = value
+            elif name == b"access-control-request-headers":
+                requested_headers = value
+
+        allow_origin = self._allow_origin(origin)
+
+        if scope["method"] == "OPTIONS" and origin is not None and requested_method is not None:
+            await self._preflight(send, allow_origin, requested_headers)
+            return
+
+        if allow_origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        extra_headers = [(b"access-control-allow-origin", allow_origin), *self.simple_headers]
+
+        async def send_with_cors(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *extra_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    async def _preflight(self, send: Send, allow_origin: Optional[bytes], requested_headers: Optional[bytes]):
+        if allow_origin is None:
+            await send({
+                "type": "http.response.start",
+                "status": 400,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", b"24")],
+            })
+            await send({"type": "http.response.body", "body": b"Disallowed CORS origin\r\n"})
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 204,
+            "headers": [
+                (b"access-control-allow-origin", allow_origin),
+                (b"access-control-allow-headers", requested_headers or b"*"),
+                *self.preflight_headers,
+            ],
+        })
+        await send({"type": "http.response.body", "body": b""})
+
+
+class NegotiationMiddleware:
+    """Let FastJSONResponse answer in MessagePack when the Accept header asks for it."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if not MSGPACK_AVAILABLE:
+            await self.app(scope, receive, send)
+            return
+
+        accept = next((value for name, value in scope["headers"] if name == b"accept"), b"")
+
+        async def send_with_vary(message: Message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (b"vary", b"Accept")]
+            await send(message)
+
+        token = wants_msgpack.set(accepts_msgpack(accept))
+        try:
+            await self.app(scope, receive, send_with_vary)
+        finally:
+            wants_msgpack.reset(token)
+
+
+class MetricsMiddleware:
+    """
+    Request latency by route template and the in-flight request gauge.
+
+    The route label is the matched path template (e.g. /api/farms/{farm_id}),
+    so label cardinality stays bounded; requests that match no route are
+    labelled "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._templates: Dict[Any, str] = {}
+
+    def _route(self, scope: Scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        template = self._templates.get(endpoint)
+        if template is None:
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is not None:
+                    self._templates.setdefault(route.endpoint, route.path)
+            template = self._templates.setdefault(endpoint, getattr(endpoint, "__name__", "unknown"))
+        return template
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = self._route(scope)
+            cancelled = scope.get(CANCELLED)
+            if cancelled is not None:
+                HTTP_CANCELLED.labels(scope["method"], route, cancelled).inc()
+                if cancelled == "disconnect":
+                    status = CLIENT_CLOSED_REQUEST
+            HTTP_DURATION.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+
+
+class DeadlineMiddleware:
+    """
+    Request deadlines, and cancellation of requests nobody is waiting for.
+
+    The handler runs in its own task while this middleware watches the
+    connection. When the client disconnects, or the deadline passes before
+    the response has started, the task is cancelled: the agent coroutine and
+    its in-flight Gemini call stop at once instead of holding the worker until
+    the model answers. A missed deadline is answered with 504. Handlers (and
+    model calls, see agents.llm) see the deadline through request_deadline.
+    """
+
+    DEADLINE_BODY = b'{"detail":"Request deadline exceeded"}'
+
+    def __init__(self, app: ASGIApp, policy: Optional[DeadlinePolicy] = None):
+        self.app = app
+        self.policy = policy or DeadlinePolicy()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_timeout = next((value for name, value in scope["headers"] if name == TIMEOUT_HEADER), None)
+        seconds = self.policy.seconds(scope["path"], client_timeout)
+        expires = time.monotonic() + seconds if seconds else None
+
+        # Only the watcher reads the connection; the handler gets its messages from this queue.
+        # It holds one body chunk at most, so an upload the handler has not read yet keeps its
+        # backpressure (a disconnect then surfaces once the handler reads on)
+        messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+        disconnected = asyncio.Event()
+        response_started = False
+        response_complete = False
+
+        async def watch_connection():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    if not messages.full():
+                        messages.put_nowait(message)
+                    return
+                await messages.put(message)
+
+        async def queued_receive() -> Message:
+            if disconnected.is_set() and messages.empty():
+                # Every later receive (e.g. a streaming response polling for disconnect) sees it too
+                return {"type": "http.disconnect"}
+            return await messages.get()
+
+        async def send_tracking(message: Message):
+            nonlocal response_started, response_complete
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        token = request_deadline.set(expires)
+        try:
+            handler = asyncio.create_task(self.app(scope, queued_receive, send_tracking))
+        finally:
+            request_deadline.reset(token)
+        watcher = asyncio.create_task(watch_connection())
+
+        cancelled = None
+        try:
+            pending = {handler, watcher}
+            while handler in pending:
+                # The deadline covers the time to the first response byte; streams then run until done
+                timeout = max(expires - time.monotonic(), 0) if expires is not None and not response_started else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if handler in done:
+                    break
+                if watcher in done:
+                    # The server also reports a disconnect once the response is complete
+                    if not response_complete:
+                        cancelled = "disconnect"
+                        break
+                elif not done and not response_started:
+                    cancelled = "deadline"
+                    break
+        finally:
+            watcher.cancel()
+            if not handler.done():
+                handler.cancel()
+            # Wait for the handler to unwind, so its model call is closed before the slot is reported free
+            await asyncio.gather(handler, watcher, return_exceptions=True)
+
+        if cancelled is None:
+            handler.result()
+            return
+
+        scope[CANCELLED] = cancelled
+        if cancelled == "deadline" and not response_started:
+            await send({
+                "type": "http.response.start",
+                "status": 504,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(self.DEADLINE_BODY)).encode())],
+            })
+            await send({"type": "http.response.body", "body": self.DEADLINE_BODY})
+
+
+class TrafficRecorderMiddleware:
+    """
+    Append every /api request (method, path, query, body and the headers that
+    affect routing) to the LLM cassette, for replaying the traffic offline.
+    """
+
+    # Headers replayed with the request; auth and cookies are never recorded
+    RECORDED_HEADERS = frozenset({b"content-type", b"accept", b"x-farm-id"})
+
+    def __init__(self, app: ASGIApp, prefix: str = "/api"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        chunks: List[bytes] = []
+        status = 500
+        started = time.time()
+
+        async def recording_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, send_with_status)
+        finally:
+            await CASSETTE.record(KIND_HTTP, hashlib.sha256(f"{scope['method']} {scope['path']}".encode()).digest(), {
+                "at": started,
+                "duration": time.time() - started,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope["query_string"].decode("latin-1"),
+                "headers": [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in scope["headers"] if name in self.RECORDED_HEADERS
+                ],
+                "body": encode_body(b"".join(chunks)),
+                "status": status,
+            })
@@ -0,0 +1,56 @@
+"""
+AgriSmart Brasil - Response Serialization
+orjson-backed default response class with optional MessagePack output for machine clients.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from services.metrics import RENDER_DURATION
+
+try:
+    import msgpack
+except ImportError:  # MessagePack negotiation is optional
+    msgpack = None
+
+
+MSGPACK_AVAILABLE = msgpack is not None
+
+MSGPACK_MEDIA_TYPES = (b"application/msgpack", b"application/x-msgpack")
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Set per request by NegotiationMiddleware from the Accept header
+wants_msgpack: ContextVar[bool] = ContextVar("wants_msgpack", default=False)
+
+_RENDER_JSON = RENDER_DURATION.labels("json")
+_RENDER_MSGPACK = RENDER_DURATION.labels("msgpack")
+
+
+def accepts_msgpack(accept: bytes) -> bool:
+    """Whether an Accept header asks for MessagePack (and it can be produced)."""
+    return MSGPACK_AVAILABLE and any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON via orjson, or MessagePack when the client negotiated it.
+
+    Values orjson cannot serialize natively fall back to str(), like the
+    default=str used by the NDJSON and SSE streams.
+    """
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        if wants_msgpack.get():
+            self.media_type = "application/msgpack"
+            body = msgpack.packb(content, default=str, use_bin_type=True)
+            _RENDER_MSGPACK.observe(time.perf_counter() - started)
+            return body
+        body = orjson.dumps(content, default=str, option=ORJSON_OPTIONS)
+        _RENDER_JSON.observe(time.perf_counter() - started)
+        return body
@@ -3,11 +3,20 @@ AgriSmart Brasil - API Routes
 All endpoints for the multi-agent agriculture system
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, UploadFile, File, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from typing import Dict, Any, List, Optional
+from datetime import datetime
+import os
+import asyncio
 import base64
+import functools
+import inspect
 import io
+import json
+import shutil
+import tempfile
 
 from agents import (
     ClimateMonitorAgent,
@@ -16,15 +25,236 @@ from agents import (
     YieldPredictorAgent,
     FarmManagerAgent
 )
+from agents.llm import LazyAgent, get_client
+from services import (
+    StorageBackend,
+    create_storage,
+    ImagePreprocessor,
+    PerceptualHashIndex,
+    ImageFetcher,
+    BlockedURLError,
+    JobQueue,
+    QueueFullError,
+    AnalysisWriter,
+    SensorArchive,
+    RecentSensorReadings,
+    crop_batch
+)
+from services.analysis_writer import compact_request
+from services.cassette import CASSETTE
+from services.metrics import REGISTRY
+from services.usage import (
+    ACCOUNTANT as token_accountant,
+    BUDGET_DEGRADED,
+    BUDGET_EXHAUSTED,
+    BudgetExceededError,
+    budgeted,
+    usage_scope
+)
+from services.sensor_archive import PARQUET_AVAILABLE, daily_summary
+from services.image_dedup import diagnosis_scope
+
+from .schemas import (
+    AlertCounts,
+    AlertCreated,
+    AlertRead,
+    AlertsMarkedRead,
+    ArchivedDailySummary,
+    ClimateAnalysisResponse,
+    CropAnalysisResponse,
+    DroughtAssessmentResponse,
+    FarmDashboard,
+    FarmManagerResponse,
+    FrostRiskResponse,
+    IrrigationRecommendationResponse,
+    JobView,
+    LiveSensorReadings,
+    LiveSensorSummary,
+    Page,
+    SensorIngestResult,
+    SensorSeries,
+    WaterResponse,
+    WeatherImpactResponse,
+    YieldResponse,
+)
+from services.storage import decode_cursor
 
 router = APIRouter()
 
-# Initialize agents
-climate_agent = ClimateMonitorAgent()
-crop_agent = CropAnalyzerAgent()
-water_agent = WaterOptimizerAgent()
-yield_agent = YieldPredictorAgent()
-farm_manager = FarmManagerAgent()
+# Agents are constructed on first use, keeping the Gemini SDK out of cold start
+climate_agent = LazyAgent(ClimateMonitorAgent)
+crop_agent = LazyAgent(CropAnalyzerAgent)
+water_agent = LazyAgent(WaterOptimizerAgent)
+yield_agent = LazyAgent(YieldPredictorAgent)
+farm_manager = LazyAgent(FarmManagerAgent)
+
+# Build the Gemini client and agents in the background after startup instead of on the first request
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "false").lower() == "true"
+
+# Image preprocessing stage (process pool created on first use)
+image_preprocessor = ImagePreprocessor()
+
+# Near-duplicate image index of previous diagnoses
+image_cache = PerceptualHashIndex()
+
+# Pooled, disk-cached downloader for image URLs
+image_fetcher = ImageFetcher()
+
+# Background jobs for long-running agent tasks
+job_queue = JobQueue()
+
+# Storage backend selected by STORAGE_BACKEND (created on first use so the API can start without credentials)
+_db: Optional[StorageBackend] = None
+
+SENSOR_BULK_MAX_READINGS = int(os.getenv("SENSOR_BULK_MAX_READINGS", 50000))
+
+
+def get_db() -> StorageBackend:
+    """Get the shared storage backend instance."""
+    global _db
+    if _db is None:
+        _db = create_storage()
+    return _db
+
+
+# Write-behind persistence of agent results (request path never waits on storage)
+analysis_writer = AnalysisWriter(get_db)
+
+# Columnar, memory-mapped sensor history for long-range analytics
+sensor_archive = SensorArchive()
+
+# Last hours of readings per farm, kept in process for live dashboards
+recent_readings = RecentSensorReadings()
+
+
+def _cache_requests() -> Dict[tuple, float]:
+    """Hits and misses of the caches in front of storage, images and agents."""
+    samples = {
+        ("image_dedup", "hit"): image_cache.hits,
+        ("image_dedup", "miss"): image_cache.lookups - image_cache.hits,
+        ("image_url", "hit"): image_fetcher.cache_hits + image_fetcher.revalidated,
+        ("image_url", "miss"): image_fetcher.downloads,
+        ("analysis_reuse", "hit"): analysis_writer.lookup_hits,
+        ("analysis_reuse", "miss"): analysis_writer.lookups - analysis_writer.lookup_hits,
+    }
+    read_cache = _db.get_cache_stats() if _db is not None else {}
+    if read_cache:
+        samples[("read_cache", "hit")] = read_cache["hits"]
+        samples[("read_cache", "miss")] = read_cache["misses"]
+    return samples
+
+
+# Read from existing counters at scrape time; hit ratio = hit / (hit + miss)
+REGISTRY.callback(
+    "agrismart_cache_requests_total", "counter", "Cache lookups by cache and result.",
+    ("cache", "result"), _cache_requests
+)
+REGISTRY.callback(
+    "agrismart_queue_depth", "gauge", "Items waiting in background queues.",
+    ("queue",), lambda: {("jobs",): job_queue.get_stats()["queued"], ("analysis_writer",): analysis_writer.get_stats()["queued"]}
+)
+REGISTRY.callback(
+    "agrismart_jobs_running", "gauge", "Background jobs being executed.",
+    (), lambda: {(): job_queue.running}
+)
+
+
+@router.on_event("startup")
+async def start_job_queue():
+    """Start the background job workers, the analysis writer and token usage flushing."""
+    await job_queue.start()
+    await analysis_writer.start()
+    await token_accountant.start(get_db)
+    if AGENT_WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, warm_up_agents)
+
+
+def warm_up_agents():
+    """Import the Gemini SDK and construct the shared client and agents (runs in a worker thread)."""
+    try:
+        get_client()
+        for agent in (climate_agent, crop_agent, water_agent, yield_agent, farm_manager):
+            agent.get()
+    except Exception:
+        # Missing credentials etc. surface as errors on the first agent request instead
+        pass
+
+
+@router.on_event("shutdown")
+async def shutdown_workers():
+    """Stop the background job workers, flush analyses and token usage, and release pools, sessions and storage."""
+    await job_queue.stop()
+    await analysis_writer.stop()
+    await token_accountant.stop()
+    CASSETTE.close()
+    image_preprocessor.shutdown()
+    await image_fetcher.close()
+    if _db is not None:
+        _db.close()
+
+
+async def _analyze_image_bytes(
+    data: bytes,
+    crop_type: str,
+    additional_info: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Preprocess an image and diagnose it as cheaply as possible.
+    
+    Clearly healthy or non-crop images are answered by the local vegetation
+    pre-screen, near-duplicates reuse a previous diagnosis, and everything
+    else goes to the crop agent.
+    """
+    image_bytes, mime_type, preprocessing = await image_preprocessor.process(data)
+    image_hash = int(preprocessing["image_hash"], 16)
+    prescreen = preprocessing.pop("prescreen", None)
+    
+    if prescreen:
+        result = crop_agent.prescreen_diagnosis(crop_type, prescreen)
+        if result:
+            return {**result, "preprocessing": preprocessing, "prescreen": prescreen, "cached": False}
+    
+    # A diagnosis is only reused for the same crop and the same farmer-provided context
+    scope = diagnosis_scope(crop_type, additional_info)
+    cached = image_cache.lookup(image_hash, scope)
+    if cached:
+        result, distance = cached
+        return {
+            **result,
+            "preprocessing": preprocessing,
+            "prescreen": prescreen,
+            "cached": True,
+            "cache_distance": distance
+        }
+    
+    result = await crop_agent.analyze_crop_image(
+        image_data=image_bytes,
+        crop_type=crop_type,
+        additional_info=additional_info,
+        mime_type=mime_type
+    )
+    if result.get("status") == "success":
+        image_cache.add(image_hash, scope, result)
+    
+    return {**result, "preprocessing": preprocessing, "prescreen": prescreen, "cached": False}
+
+
+async def _run_crop_image_analysis(request: "CropImageAnalysisRequest") -> Dict[str, Any]:
+    """Analyze a crop image given as base64 data or URL."""
+    if request.image_data.startswith('http'):
+        data, _, fetch = await image_fetcher.fetch(request.image_data)
+        result = await _analyze_image_bytes(
+            data,
+            crop_type=request.crop_type,
+            additional_info=request.additional_info
+        )
+        return {**result, "fetch": fetch}
+    
+    return await _analyze_image_bytes(
+        base64.b64decode(request.image_data),
+        crop_type=request.crop_type,
+        additional_info=request.additional_info
+    )
 
 
 # Pydantic models for request/response validation
@@ -135,7 +365,8 @@ class PlantingScheduleRequest(BaseModel):
 
 
 class DailyBriefingRequest(BaseModel):
-    farm_data: Dict[str, Any]
+    farm_data: Dict[str, Any] = Field(default_factory=dict)
+    farm_id: Optional[str] = None
 
 
 class AgentQueryRequest(BaseModel):
@@ -160,9 +391,179 @@ class EmergencyRequest(BaseModel):
     details: Dict[str, Any]
 
 
+class SensorReading(BaseModel):
+    sensor_id: str
+    sensor_type: str
+    value: float
+    unit: Optional[str] = None
+    zone: Optional[str] = None
+    timestamp: Optional[datetime] = None
+
+
+class AlertRequest(BaseModel):
+    title: str
+    message: Optional[str] = None
+    severity: str = "info"
+    category: Optional[str] = None
+
+
+_sensor_readings_adapter = TypeAdapter(List[SensorReading])
+
+
+def _parse_sensor_payload(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    """
+    Decode a bulk sensor payload into validated reading dicts.
+    
+    Accepted formats:
+    - JSON lines (application/x-ndjson): one reading object per line
+    - JSON array of reading objects
+    - Columnar JSON: {"columns": {"sensor_id": [...], "value": [...], ...}}
+      where scalar entries in "defaults" apply to every row
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        payload = json.loads(body)
+        if isinstance(payload, dict) and "columns" in payload:
+            columns = payload["columns"]
+            if not isinstance(columns, dict) or not all(isinstance(values, list) for values in columns.values()):
+                raise ValueError('"columns" must map field names to lists of values')
+            lengths = {len(values) for values in columns.values()}
+            if len(lengths) > 1:
+                raise ValueError("All columns must have the same length")
+            defaults = payload.get("defaults", {})
+            if not isinstance(defaults, dict) or any(isinstance(value, (dict, list)) for value in defaults.values()):
+                raise ValueError('"defaults" must map field names to scalar values')
+            names = list(columns)
+            rows = [
+                {**defaults, **dict(zip(names, values))}
+                for values in zip(*columns.values())
+            ]
+        elif isinstance(payload, list):
+            rows = payload
+        else:
+            raise ValueError("Expected a JSON array, JSON lines or a columnar payload")
+    
+    if len(rows) > SENSOR_BULK_MAX_READINGS:
+        raise ValueError(f"At most {SENSOR_BULK_MAX_READINGS} readings per request")
+    
+    readings = _sensor_readings_adapter.validate_python(rows)
+    return [reading.model_dump(exclude_none=True) for reading in readings]
+
+
+def _with_farm_header(endpoint, wrapper):
+    """Give a route wrapper the endpoint's signature plus an optional X-Farm-Id header."""
+    signature = inspect.signature(endpoint)
+    farm_header = inspect.Parameter(
+        "x_farm_id",
+        inspect.Parameter.KEYWORD_ONLY,
+        default=Header(None),
+        annotation=Optional[str]
+    )
+    wrapper.__signature__ = signature.replace(
+        parameters=[*signature.parameters.values(), farm_header]
+    )
+    return wrapper
+
+
+async def _call_within_budget(analysis_type: str, farm_id: Optional[str], call) -> Any:
+    """
+    Await an agent endpoint with its model tokens counted against the farm; a model
+    call refused over the hard budget (even one the agent caught) is a 429.
+    """
+    scope = usage_scope.set((analysis_type, farm_id or ""))
+    try:
+        return await budgeted(call)
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    finally:
+        usage_scope.reset(scope)
+
+
+def _budgeted(analysis_type: str):
+    """
+    Count an agent route's model tokens against its farm (farm_id field or X-Farm-Id
+    header) without storing results. Over the daily budget the agents use the fallback
+    model; past the hard limit the request is rejected with 429.
+    """
+    def decorate(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, x_farm_id: Optional[str] = None, **kwargs):
+            farm_id = getattr(kwargs["request"], "farm_id", None) or x_farm_id
+            budget = token_accountant.budget_state(farm_id)
+            if budget == BUDGET_EXHAUSTED:
+                raise HTTPException(status_code=429, detail="Daily token budget exhausted")
+            
+            result = await _call_within_budget(analysis_type, farm_id, endpoint(*args, **kwargs))
+            if budget == BUDGET_DEGRADED and isinstance(result, dict):
+                result = {**result, "degraded": "fallback_model"}
+            return result
+        
+        return _with_farm_header(endpoint, wrapper)
+    
+    return decorate
+
+
+def _persisted(analysis_type: str, reuse: bool = False):
+    """
+    Save successful results of an agent route to the analyses store (write-behind).
+    
+    With reuse, identical repeat requests are answered from stored analyses; routes
+    whose answers should reflect current data (the conversational /farm/query) leave
+    it off. The farm is taken from the request's farm_id field or the X-Farm-Id
+    header; model tokens are counted against it. Over its daily budget the agents use
+    the fallback model; past the hard limit a reusing route returns the newest stored
+    answer, however old, and otherwise the request is rejected with 429.
+    """
+    def decorate(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, x_farm_id: Optional[str] = None, **kwargs):
+            payload = kwargs["request"].model_dump(mode="json")
+            farm_id = payload.get("farm_id") or x_farm_id
+            key = AnalysisWriter.request_key(analysis_type, payload)
+            
+            if reuse:
+                previous = await analysis_writer.lookup(key)
+                if previous is not None:
+                    return {**previous["result"], "from_history": True, "analysis_id": previous.get("id")}
+            
+            budget = token_accountant.budget_state(farm_id)
+            if budget == BUDGET_EXHAUSTED:
+                previous = await analysis_writer.lookup(key, any_age=True) if reuse else None
+                if previous is None:
+                    raise HTTPException(status_code=429, detail="Daily token budget exhausted")
+                return {
+                    **previous["result"],
+                    "from_history": True,
+                    "analysis_id": previous.get("id"),
+                    "degraded": "budget_exhausted",
+                }
+            
+            result = await _call_within_budget(analysis_type, farm_id, endpoint(*args, **kwargs))
+            if budget == BUDGET_DEGRADED and isinstance(result, dict):
+                result = {**result, "degraded": "fallback_model"}
+            if isinstance(result, dict) and result.get("status") == "success":
+                analysis_writer.submit(analysis_type, {
+                    "farm_id": farm_id,
+                    "request_key": key,
+                    "request": compact_request(payload),
+                    "result": result,
+                })
+            return result
+        
+        return _with_farm_header(endpoint, wrapper)
+    
+    return decorate
+
+
 # ===== CLIMATE MONITOR ROUTES =====
 
-@router.post("/climate/analyze")
+@router.post(
+    "/climate/analyze",
+    response_model=ClimateAnalysisResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("climate.analyze", reuse=True)
 async def analyze_climate(request: ClimateAnalysisRequest):
     """Analyze climate conditions for a specific location."""
     try:
@@ -175,7 +576,12 @@ async def analyze_climate(request: ClimateAnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/climate/irrigation-recommendation")
+@router.post(
+    "/climate/irrigation-recommendation",
+    response_model=IrrigationRecommendationResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("climate.irrigation-recommendation", reuse=True)
 async def get_irrigation_recommendation(request: IrrigationRecommendationRequest):
     """Get irrigation recommendations based on climate."""
     try:
@@ -188,7 +594,12 @@ async def get_irrigation_recommendation(request: IrrigationRecommendationRequest
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/climate/weather-impact")
+@router.post(
+    "/climate/weather-impact",
+    response_model=WeatherImpactResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("climate.weather-impact", reuse=True)
 async def predict_weather_impact(request: WeatherImpactRequest):
     """Predict weather impact on crops."""
     try:
@@ -201,7 +612,12 @@ async def predict_weather_impact(request: WeatherImpactRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/weather/frost-risk")
+@router.post(
+    "/weather/frost-risk",
+    response_model=FrostRiskResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("weather.frost-risk", reuse=True)
 async def assess_frost_risk(request: FrostRiskRequest):
     """
     Avaliar risco de geada para culturas.
@@ -219,7 +635,12 @@ async def assess_frost_risk(request: FrostRiskRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/climate/drought-assessment")
+@router.post(
+    "/climate/drought-assessment",
+    response_model=DroughtAssessmentResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("climate.drought-assessment", reuse=True)
 async def assess_drought(request: DroughtAssessmentRequest):
     """Avaliar condições de seca e impactos nas culturas."""
     try:
@@ -236,21 +657,27 @@ async def assess_drought(request: DroughtAssessmentRequest):
 
 # ===== CROP ANALYZER ROUTES =====
 
-@router.post("/crop/analyze-image")
+@router.post(
+    "/crop/analyze-image",
+    response_model=CropAnalysisResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("crop.analyze-image", reuse=True)
 async def analyze_crop_image(request: CropImageAnalysisRequest):
     """Analyze crop health from an image."""
     try:
-        result = await crop_agent.analyze_crop_image(
-            image_data=request.image_data,
-            crop_type=request.crop_type,
-            additional_info=request.additional_info
-        )
-        return result
+        return await _run_crop_image_analysis(request)
+    except BlockedURLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/crop/upload-image")
+@router.post(
+    "/crop/upload-image",
+    response_model=CropAnalysisResponse,
+    response_model_exclude_unset=True
+)
 async def upload_crop_image(
     file: UploadFile = File(...),
     crop_type: str = "unknown"
@@ -260,20 +687,70 @@ async def upload_crop_image(
         # Read image file
         contents = await file.read()
         
-        # Convert to base64
-        image_base64 = base64.b64encode(contents).decode('utf-8')
-        
-        # Analyze image
-        result = await crop_agent.analyze_crop_image(
-            image_data=image_base64,
-            crop_type=crop_type
-        )
-        return result
+        # Preprocess and analyze (or reuse a near-duplicate diagnosis)
+        return await _analyze_image_bytes(contents, crop_type=crop_type)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/crop/identify-disease")
+@router.post("/crop/batch-analyze")
+async def batch_analyze_crop_images(
+    files: List[UploadFile] = File(default=[]),
+    archive: Optional[UploadFile] = File(None),
+    crop_type: str = "unknown",
+    concurrency: int = Query(crop_batch.DEFAULT_CONCURRENCY, ge=1, le=32)
+):
+    """
+    Analyze a scouting run of crop images (multipart files and/or a zip archive).
+    
+    Streams one NDJSON line per image as it completes, followed by a
+    field-level summary of issues, severities, throughput and latency.
+    """
+    workdir = tempfile.mkdtemp(prefix="agrismart-batch-")
+    try:
+        items = await crop_batch.spool_uploads(files, archive, workdir)
+    except Exception as e:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+    
+    if not items or len(items) > crop_batch.MAX_IMAGES:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch must contain between 1 and {crop_batch.MAX_IMAGES} images"
+        )
+    
+    async def analyze(data: bytes) -> Dict[str, Any]:
+        return await _analyze_image_bytes(data, crop_type=crop_type)
+    
+    async def stream():
+        try:
+            async for event in crop_batch.run_batch(items, analyze, concurrency):
+                yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/crop/preprocessing-stats", response_model=Dict[str, Any])
+async def get_preprocessing_stats():
+    """Get image preprocessing totals (images processed, bytes saved)."""
+    return image_preprocessor.get_stats()
+
+
+@router.get("/crop/cache-stats", response_model=Dict[str, Any])
+async def get_image_cache_stats():
+    """Get near-duplicate image cache and image URL cache statistics."""
+    return {**image_cache.get_stats(), "url_fetch": image_fetcher.get_stats()}
+
+
+@router.post(
+    "/crop/identify-disease",
+    response_model=CropAnalysisResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("crop.identify-disease", reuse=True)
 async def identify_disease(request: DiseaseIdentificationRequest):
     """Identify crop disease from symptoms."""
     try:
@@ -286,7 +763,12 @@ async def identify_disease(request: DiseaseIdentificationRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/crop/nutrient-assessment")
+@router.post(
+    "/crop/nutrient-assessment",
+    response_model=CropAnalysisResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("crop.nutrient-assessment", reuse=True)
 async def assess_nutrient_deficiency(request: NutrientAssessmentRequest):
     """Assess nutrient deficiencies."""
     try:
@@ -299,7 +781,12 @@ async def assess_nutrient_deficiency(request: NutrientAssessmentRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/crop/rotation-recommendation")
+@router.post(
+    "/crop/rotation-recommendation",
+    response_model=CropAnalysisResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("crop.rotation-recommendation", reuse=True)
 async def recommend_crop_rotation(request: CropRotationRequest):
     """Recommend crop rotation strategy."""
     try:
@@ -315,7 +802,12 @@ async def recommend_crop_rotation(request: CropRotationRequest):
 
 # ===== WATER OPTIMIZER ROUTES =====
 
-@router.post("/water/irrigation-schedule")
+@router.post(
+    "/water/irrigation-schedule",
+    response_model=WaterResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("water.irrigation-schedule", reuse=True)
 async def create_irrigation_schedule(request: IrrigationScheduleRequest):
     """Create an optimized irrigation schedule."""
     try:
@@ -331,7 +823,8 @@ async def create_irrigation_schedule(request: IrrigationScheduleRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/water/efficiency")
+@router.post("/water/efficiency", response_model=WaterResponse, response_model_exclude_unset=True)
+@_persisted("water.efficiency", reuse=True)
 async def calculate_water_efficiency(request: WaterEfficiencyRequest):
     """Calculate water usage efficiency."""
     try:
@@ -346,7 +839,12 @@ async def calculate_water_efficiency(request: WaterEfficiencyRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/water/detect-issues")
+@router.post(
+    "/water/detect-issues",
+    response_model=WaterResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("water.detect-issues", reuse=True)
 async def detect_irrigation_issues(request: IrrigationIssuesRequest):
     """Detect irrigation system issues."""
     try:
@@ -359,7 +857,12 @@ async def detect_irrigation_issues(request: IrrigationIssuesRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/water/technology-recommendation")
+@router.post(
+    "/water/technology-recommendation",
+    response_model=WaterResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("water.technology-recommendation", reuse=True)
 async def recommend_irrigation_technology(request: IrrigationTechnologyRequest):
     """Recommend optimal irrigation technology."""
     try:
@@ -375,7 +878,8 @@ async def recommend_irrigation_technology(request: IrrigationTechnologyRequest):
 
 # ===== YIELD PREDICTOR ROUTES =====
 
-@router.post("/yield/predict")
+@router.post("/yield/predict", response_model=YieldResponse, response_model_exclude_unset=True)
+@_persisted("yield.predict", reuse=True)
 async def predict_yield(request: YieldPredictionRequest):
     """Predict crop yield."""
     try:
@@ -391,7 +895,8 @@ async def predict_yield(request: YieldPredictionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/yield/gap-analysis")
+@router.post("/yield/gap-analysis", response_model=YieldResponse, response_model_exclude_unset=True)
+@_persisted("yield.gap-analysis", reuse=True)
 async def analyze_yield_gaps(request: YieldGapAnalysisRequest):
     """Analyze yield gaps."""
     try:
@@ -406,7 +911,12 @@ async def analyze_yield_gaps(request: YieldGapAnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/yield/market-timing")
+@router.post(
+    "/yield/market-timing",
+    response_model=YieldResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("yield.market-timing", reuse=True)
 async def forecast_market_timing(request: MarketTimingRequest):
     """Forecast optimal market timing."""
     try:
@@ -421,7 +931,12 @@ async def forecast_market_timing(request: MarketTimingRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/yield/planting-schedule")
+@router.post(
+    "/yield/planting-schedule",
+    response_model=YieldResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("yield.planting-schedule", reuse=True)
 async def optimize_planting_schedule(request: PlantingScheduleRequest):
     """Optimize planting schedule."""
     try:
@@ -438,19 +953,32 @@ async def optimize_planting_schedule(request: PlantingScheduleRequest):
 
 # ===== FARM MANAGER ROUTES =====
 
-@router.post("/farm/daily-briefing")
+@router.post(
+    "/farm/daily-briefing",
+    response_model=FarmManagerResponse,
+    response_model_exclude_unset=True
+)
+@_budgeted("farm.daily-briefing")
 async def get_daily_briefing(request: DailyBriefingRequest):
-    """Get daily farm briefing."""
+    """Get daily farm briefing (stored farm and crops are loaded when farm_id is given)."""
     try:
+        farm_data = request.farm_data
+        if request.farm_id:
+            db = get_db()
+            stored = await db.get_farm(request.farm_id) or {}
+            crops = await db.get_crops(request.farm_id)
+            farm_data = {**stored, "crops": crops, **farm_data}
+        
         result = await farm_manager.get_daily_briefing(
-            farm_data=request.farm_data
+            farm_data=farm_data
         )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/farm/query")
+@router.post("/farm/query", response_model=FarmManagerResponse, response_model_exclude_unset=True)
+@_persisted("farm.query")
 async def coordinate_agents(request: AgentQueryRequest):
     """Query the farm management system."""
     try:
@@ -463,7 +991,12 @@ async def coordinate_agents(request: AgentQueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/farm/action-plan")
+@router.post(
+    "/farm/action-plan",
+    response_model=FarmManagerResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("farm.action-plan", reuse=True)
 async def create_action_plan(request: ActionPlanRequest):
     """Create a comprehensive action plan."""
     try:
@@ -478,7 +1011,12 @@ async def create_action_plan(request: ActionPlanRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/farm/performance")
+@router.post(
+    "/farm/performance",
+    response_model=FarmManagerResponse,
+    response_model_exclude_unset=True
+)
+@_persisted("farm.performance", reuse=True)
 async def analyze_farm_performance(request: PerformanceAnalysisRequest):
     """Analyze farm performance."""
     try:
@@ -491,7 +1029,12 @@ async def analyze_farm_performance(request: PerformanceAnalysisRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/farm/emergency")
+@router.post(
+    "/farm/emergency",
+    response_model=FarmManagerResponse,
+    response_model_exclude_unset=True
+)
+@_budgeted("farm.emergency")
 async def handle_emergency(request: EmergencyRequest):
     """Handle farm emergency."""
     try:
@@ -504,7 +1047,526 @@ async def handle_emergency(request: EmergencyRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/agents")
+# ===== FARM DATA ROUTES =====
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated field projection."""
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+
+def _ndjson_stream(items) -> StreamingResponse:
+    """Stream an async iterator of documents as JSON lines."""
+    async def lines():
+        async for item in items:
+            yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+async def _list_response(page_call, iter_call, stream: bool, cursor: Optional[str]):
+    """Return one page, or stream every result as NDJSON when `stream` is set."""
+    try:
+        if cursor:
+            # Reject bad cursors before a streamed response has started
+            decode_cursor(cursor)
+        if stream:
+            return _ndjson_stream(iter_call())
+        return await page_call()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/farms", response_model=Page, response_model_exclude_unset=True)
+async def list_farms(
+    user_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    """List farms one page at a time (or stream all of them as NDJSON)."""
+    db = get_db()
+    projection = _parse_fields(fields)
+    return await _list_response(
+        lambda: db.list_farms_page(user_id, limit=limit, cursor=cursor, fields=projection),
+        lambda: db.iter_farms(user_id, fields=projection, cursor=cursor),
+        stream,
+        cursor
+    )
+
+
+@router.get("/farms/{farm_id}", response_model=FarmDashboard, response_model_exclude_unset=True)
+async def get_farm_dashboard(farm_id: str):
+    """Get a farm and its crops for the dashboard (served from the read cache)."""
+    try:
+        db = get_db()
+        farm = await db.get_farm(farm_id)
+        crops = await db.get_crops(farm_id) if farm is not None else []
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if farm is None:
+        raise HTTPException(status_code=404, detail="Farm not found")
+    
+    return {"farm": {**farm, "id": farm_id}, "crops": crops}
+
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_read_cache_stats():
+    """Get farm/crop read cache hit ratio, stale reads and listener count."""
+    return get_db().get_cache_stats()
+
+
+@router.get("/farms/{farm_id}/analyses", response_model=List[Dict[str, Any]])
+async def list_farm_analyses(
+    farm_id: str,
+    analysis_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Get a farm's saved agent analyses, newest first."""
+    try:
+        return await get_db().get_analyses(farm_id, analysis_type, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/analyses/stats", response_model=Dict[str, Any])
+async def get_analysis_writer_stats():
+    """Get write-behind queue depth, write and history lookup counters."""
+    return analysis_writer.get_stats()
+
+
+@router.get("/usage", response_model=List[Dict[str, Any]])
+async def get_token_usage(
+    day: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    farm_id: Optional[str] = None
+):
+    """Get a day's (default today, UTC) model calls and tokens per farm, endpoint and model, largest first."""
+    try:
+        return await token_accountant.usage(day, farm_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/usage/top-prompts", response_model=Dict[str, Any])
+async def get_top_prompts(
+    day: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Get endpoints ranked by average prompt tokens and this worker's largest single prompts."""
+    try:
+        return await token_accountant.top_prompts(limit, day)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/usage/stats", response_model=Dict[str, Any])
+async def get_token_usage_stats():
+    """Get token accounting counters (calls, degraded and refused calls, flushes)."""
+    return token_accountant.get_stats()
+
+
+@router.get("/usage/cassette", response_model=Dict[str, Any])
+async def get_cassette_stats():
+    """Get the LLM record/replay cassette mode and its record, replay and miss counters."""
+    return CASSETTE.get_stats()
+
+
+@router.get("/farms/{farm_id}/usage", response_model=Dict[str, Any])
+async def get_farm_token_usage(farm_id: str):
+    """Get a farm's token usage today, per endpoint and model, and the state of its budget."""
+    try:
+        rows = await token_accountant.usage(farm_id=farm_id)
+        return {**token_accountant.budget_status(farm_id), "usage": rows}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/farms/{farm_id}/crops", response_model=Page, response_model_exclude_unset=True)
+async def list_farm_crops(
+    farm_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    """List a farm's crops one page at a time (or stream all of them as NDJSON)."""
+    db = get_db()
+    projection = _parse_fields(fields)
+    return await _list_response(
+        lambda: db.get_crops_page(farm_id, limit=limit, cursor=cursor, fields=projection),
+        lambda: db.iter_crops(farm_id, fields=projection, cursor=cursor),
+        stream,
+        cursor
+    )
+
+
+@router.get("/farms/{farm_id}/alerts", response_model=Page, response_model_exclude_unset=True)
+async def list_farm_alerts(
+    farm_id: str,
+    unread_only: bool = False,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    """List a farm's alerts, newest first, one page at a time (or stream them as NDJSON)."""
+    db = get_db()
+    projection = _parse_fields(fields)
+    return await _list_response(
+        lambda: db.get_alerts_page(farm_id, unread_only, limit=limit, cursor=cursor, fields=projection),
+        lambda: db.iter_alerts(farm_id, unread_only, fields=projection, cursor=cursor),
+        stream,
+        cursor
+    )
+
+
+@router.post(
+    "/farms/{farm_id}/alerts",
+    response_model=AlertCreated,
+    response_model_exclude_unset=True
+)
+async def create_farm_alert(farm_id: str, request: AlertRequest):
+    """Create an alert and update the farm's alert counters."""
+    try:
+        return await get_db().create_alert(farm_id, request.model_dump(exclude_none=True))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get(
+    "/farms/{farm_id}/alerts/counts",
+    response_model=AlertCounts,
+    response_model_exclude_unset=True
+)
+async def get_farm_alert_counts(farm_id: str):
+    """Get a farm's total, unread and unread-per-severity alert counts (one counter read)."""
+    try:
+        return await get_db().get_alert_counts(farm_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/farms/{farm_id}/alerts/read-all",
+    response_model=AlertsMarkedRead,
+    response_model_exclude_unset=True
+)
+async def mark_farm_alerts_read(farm_id: str):
+    """Mark every unread alert of a farm as read."""
+    try:
+        return await get_db().mark_all_read(farm_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/farms/{farm_id}/alerts/counts/rebuild",
+    response_model=AlertCounts,
+    response_model_exclude_unset=True
+)
+async def rebuild_farm_alert_counts(farm_id: str):
+    """Recompute a farm's alert counters from its alerts."""
+    try:
+        return await get_db().rebuild_alert_counters(farm_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/alerts/{alert_id}/read", response_model=AlertRead, response_model_exclude_unset=True)
+async def mark_alert_read(alert_id: str):
+    """Mark one alert as read."""
+    try:
+        return await get_db().mark_alert_read(alert_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/farms/{farm_id}/sensor-data", response_model=Page, response_model_exclude_unset=True)
+async def list_farm_sensor_data(
+    farm_id: str,
+    sensor_type: Optional[str] = None,
+    hours: int = Query(24, ge=1, le=24 * 366),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    stream: bool = False
+):
+    """List raw sensor readings, newest first, one page at a time (or stream them as NDJSON)."""
+    db = get_db()
+    projection = _parse_fields(fields)
+    return await _list_response(
+        lambda: db.get_sensor_data_page(
+            farm_id, sensor_type, hours, limit=limit, cursor=cursor, fields=projection
+        ),
+        lambda: db.iter_sensor_data(farm_id, sensor_type, hours, fields=projection, cursor=cursor),
+        stream,
+        cursor
+    )
+
+
+# ===== SENSOR ROUTES =====
+
+@router.post(
+    "/sensors/{farm_id}/readings/bulk",
+    response_model=SensorIngestResult,
+    response_model_exclude_unset=True
+)
+async def ingest_sensor_readings(farm_id: str, request: Request):
+    """
+    Bulk-ingest sensor readings (JSON lines, JSON array or columnar JSON).
+    
+    Readings are validated together and written with batched commits.
+    """
+    body = await request.body()
+    try:
+        readings = _parse_sensor_payload(body, request.headers.get("content-type", ""))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False)[:20])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result = await get_db().save_sensor_data_bulk(farm_id, readings)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Timestamps were filled in by the storage backend
+    recent_readings.extend(farm_id, readings)
+    return result
+
+
+@router.get(
+    "/sensors/{farm_id}/live",
+    response_model=LiveSensorSummary,
+    response_model_exclude_unset=True
+)
+async def get_live_sensor_summary(farm_id: str, minutes: Optional[float] = Query(None, gt=0)):
+    """Get per-sensor count/mean/min/max and latest value from the recent-readings buffer."""
+    return {"farm_id": farm_id, "sensors": recent_readings.summary(farm_id, minutes)}
+
+
+@router.get(
+    "/sensors/{farm_id}/live/{sensor_id}",
+    response_model=LiveSensorReadings,
+    response_model_exclude_unset=True
+)
+async def get_live_sensor_readings(farm_id: str, sensor_id: str, minutes: Optional[float] = Query(None, gt=0)):
+    """Get a sensor's buffered readings, oldest first (epoch seconds and values)."""
+    return {"farm_id": farm_id, "sensor_id": sensor_id, **recent_readings.readings(farm_id, sensor_id, minutes)}
+
+
+@router.get("/sensors/live/stats", response_model=Dict[str, Any])
+async def get_live_sensor_buffer_stats():
+    """Get the number of buffered farms and readings and the memory they hold."""
+    return recent_readings.get_stats()
+
+
+@router.get(
+    "/sensors/{farm_id}/series",
+    response_model=SensorSeries,
+    response_model_exclude_unset=True
+)
+async def get_sensor_series(
+    farm_id: str,
+    sensor_id: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = Query(None, pattern="^(5m|1h|1d)$"),
+    max_points: int = Query(500, ge=1, le=5000)
+):
+    """
+    Get a sensor time series (min/max/mean/count per bucket) from rollups.
+    
+    The resolution is chosen automatically from the range unless given.
+    """
+    try:
+        return await get_db().get_sensor_series(
+            farm_id=farm_id,
+            sensor_id=sensor_id,
+            start=start,
+            end=end or datetime.utcnow(),
+            resolution=resolution,
+            max_points=max_points
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/sensors/{farm_id}/rollups/backfill",
+    status_code=202,
+    response_model=JobView,
+    response_model_exclude_unset=True
+)
+async def backfill_sensor_rollups(farm_id: str):
+    """Rebuild a farm's sensor rollups from raw readings as a background job."""
+    return await _submit_job("sensors.rollup-backfill", {"farm_id": farm_id}, priority=9)
+
+
+@router.post(
+    "/sensors/{farm_id}/archive/export",
+    status_code=202,
+    response_model=JobView,
+    response_model_exclude_unset=True
+)
+async def export_sensor_archive(farm_id: str, parquet: bool = False):
+    """Append new sensor readings to the farm's columnar archive as a background job."""
+    if parquet and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=400, detail="Parquet snapshots require pyarrow")
+    try:
+        sensor_archive.months(farm_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _submit_job("sensors.archive-export", {"farm_id": farm_id, "parquet": parquet}, priority=9)
+
+
+@router.get("/sensors/{farm_id}/archive", response_model=Dict[str, Any])
+async def get_sensor_archive_stats(farm_id: str):
+    """Get the archived months, row counts and export watermark of a farm."""
+    try:
+        return sensor_archive.get_stats(farm_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/sensors/{farm_id}/archive/daily",
+    response_model=ArchivedDailySummary,
+    response_model_exclude_unset=True
+)
+async def get_archived_daily_summary(
+    farm_id: str,
+    sensor_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+):
+    """Get per-day count/mean/min/max of a sensor computed from the memory-mapped archive."""
+    try:
+        columns = await asyncio.to_thread(sensor_archive.load, farm_id, start, end, sensor_id)
+        days = await asyncio.to_thread(daily_summary, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {"farm_id": farm_id, "sensor_id": sensor_id, "readings": len(columns), "days": days}
+
+
+# ===== BACKGROUND JOB ROUTES =====
+
+# A model call refused over the token budget fails the job with BudgetExceededError
+job_queue.register(
+    "crop.analyze-image",
+    lambda payload: budgeted(_run_crop_image_analysis(CropImageAnalysisRequest(**payload)))
+)
+job_queue.register(
+    "farm.action-plan",
+    lambda payload: budgeted(farm_manager.create_action_plan(**payload))
+)
+job_queue.register(
+    "farm.performance",
+    lambda payload: budgeted(farm_manager.analyze_farm_performance(**payload))
+)
+# Backfills and exports read the current readings, so a finished one is never reused
+job_queue.register(
+    "sensors.rollup-backfill",
+    lambda payload: get_db().backfill_sensor_rollups(**payload),
+    reuse_results=False
+)
+job_queue.register(
+    "sensors.archive-export",
+    lambda payload: sensor_archive.export(get_db(), **payload),
+    reuse_results=False
+)
+
+
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public representation of a job (without the submitted payload)."""
+    return {k: v for k, v in job.items() if k not in ("payload", "key")}
+
+
+async def _submit_job(kind: str, payload: Dict[str, Any], priority: int) -> Dict[str, Any]:
+    try:
+        job = await job_queue.submit(kind, payload, priority=priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return _job_view(job)
+
+
+@router.post(
+    "/jobs/crop/analyze-image",
+    status_code=202,
+    response_model=JobView,
+    response_model_exclude_unset=True
+)
+async def submit_crop_image_job(request: CropImageAnalysisRequest, priority: int = Query(5, ge=0, le=9)):
+    """Submit a crop image analysis as a background job."""
+    return await _submit_job("crop.analyze-image", request.model_dump(), priority)
+
+
+@router.post(
+    "/jobs/farm/action-plan",
+    status_code=202,
+    response_model=JobView,
+    response_model_exclude_unset=True
+)
+async def submit_action_plan_job(request: ActionPlanRequest, priority: int = Query(5, ge=0, le=9)):
+    """Submit an action plan as a background job."""
+    return await _submit_job("farm.action-plan", request.model_dump(), priority)
+
+
+@router.post(
+    "/jobs/farm/performance",
+    status_code=202,
+    response_model=JobView,
+    response_model_exclude_unset=True
+)
+async def submit_performance_job(request: PerformanceAnalysisRequest, priority: int = Query(5, ge=0, le=9)):
+    """Submit a farm performance report as a background job."""
+    return await _submit_job("farm.performance", request.model_dump(), priority)
+
+
+@router.get("/jobs/stats", response_model=Dict[str, Any])
+async def get_job_stats():
+    """Get job queue depth and worker utilization."""
+    return job_queue.get_stats()
+
+
+@router.get("/jobs/{job_id}", response_model=JobView, response_model_exclude_unset=True)
+async def get_job(job_id: str):
+    """Poll a background job's status and result."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return _job_view(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Subscribe to a background job's status changes via Server-Sent Events."""
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    
+    async def events():
+        async for job in job_queue.subscribe(job_id):
+            data = json.dumps(_job_view(job), ensure_ascii=False, default=str)
+            yield f"event: {job['status']}\ndata: {data}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/agents", response_model=Dict[str, Any])
 async def list_agents():
     """List all available agents and their capabilities."""
     return {
@@ -524,6 +1586,7 @@ async def list_agents():
                 "endpoints": [
                     "/crop/analyze-image",
                     "/crop/upload-image",
+                    "/crop/batch-analyze",
                     "/crop/identify-disease",
                     "/crop/nutrient-assessment",
                     "/crop/rotation-recommendation"
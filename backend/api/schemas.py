@@ -0,0 +1,220 @@
+"""
+AgriSmart Brasil - API Response Models
+Typed response fields for every JSON endpoint; extra keys returned by agents pass through unchanged.
+"""
+
+from typing import Dict, Any, List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class APIModel(BaseModel):
+    """Base response model: declared fields are typed and validated, other keys are kept as-is."""
+
+    model_config = ConfigDict(extra="allow")
+
+
+# ===== AGENT RESPONSES =====
+
+class AgentResponse(APIModel):
+    status: str
+    agent: Optional[str] = None
+    error: Optional[str] = None
+    # Set when an identical earlier request was answered from the analyses store
+    from_history: Optional[bool] = None
+    analysis_id: Optional[str] = None
+    # "fallback_model" or "budget_exhausted" when the farm's token budget limited the answer
+    degraded: Optional[str] = None
+
+
+class ClimateAnalysisResponse(AgentResponse):
+    location: Optional[str] = None
+    analysis: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+
+
+class IrrigationRecommendationResponse(AgentResponse):
+    crop_type: Optional[str] = None
+    recommendation: Optional[str] = None
+
+
+class WeatherImpactResponse(AgentResponse):
+    prediction: Optional[str] = None
+    crop_stage: Optional[str] = None
+
+
+class FrostRisk(APIModel):
+    location: Optional[str] = None
+    min_temp_forecast: Optional[float] = None
+    crop_type: Optional[str] = None
+    crop_stage: Optional[str] = None
+    analysis: Optional[str] = None
+
+
+class FrostRiskResponse(AgentResponse):
+    frost_risk: Optional[FrostRisk] = None
+
+
+class DroughtAssessment(APIModel):
+    location: Optional[str] = None
+    total_rainfall: Optional[float] = None
+    days_tracked: Optional[int] = None
+    avg_rainfall: Optional[float] = None
+    soil_moisture: Optional[float] = None
+    crop_type: Optional[str] = None
+    analysis: Optional[str] = None
+
+
+class DroughtAssessmentResponse(AgentResponse):
+    drought_assessment: Optional[DroughtAssessment] = None
+
+
+class CropAnalysisResponse(AgentResponse):
+    crop_type: Optional[str] = None
+    analysis: Optional[str] = None
+    diagnosis: Optional[str] = None
+    assessment: Optional[str] = None
+    recommendations: Optional[str] = None
+    # "prescreen" when answered by local vegetation indices instead of the vision model
+    source: Optional[str] = None
+
+
+class WaterResponse(AgentResponse):
+    crop_type: Optional[str] = None
+    field_size: Optional[float] = None
+    system_type: Optional[str] = None
+    schedule: Optional[str] = None
+    analysis: Optional[str] = None
+    metrics: Optional[str] = None
+    recommendations: Optional[str] = None
+
+
+class YieldResponse(AgentResponse):
+    crop_type: Optional[str] = None
+    prediction: Optional[str] = None
+    analysis: Optional[str] = None
+    forecast: Optional[str] = None
+    schedule: Optional[str] = None
+
+
+class FarmManagerResponse(AgentResponse):
+    briefing_date: Optional[str] = None
+    briefing: Optional[str] = None
+    response: Optional[str] = None
+    context_used: Optional[bool] = None
+    goal: Optional[str] = None
+    action_plan: Optional[str] = None
+    period: Optional[str] = None
+    analysis: Optional[str] = None
+    emergency_type: Optional[str] = None
+    priority: Optional[str] = None
+    response_plan: Optional[str] = None
+
+
+# ===== FARM DATA RESPONSES =====
+
+class Page(APIModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+class FarmDashboard(APIModel):
+    farm: Dict[str, Any]
+    crops: List[Dict[str, Any]]
+
+
+class AlertCreated(APIModel):
+    status: str
+    alert_id: str
+
+
+class AlertRead(APIModel):
+    status: str
+    alert_id: str
+
+
+class AlertsMarkedRead(APIModel):
+    status: str
+    farm_id: str
+    marked: int
+
+
+class AlertCounts(APIModel):
+    farm_id: str
+    total: int
+    unread: int
+    unread_by_severity: Dict[str, int]
+
+
+# ===== SENSOR RESPONSES =====
+
+class SensorIngestResult(APIModel):
+    status: str
+    farm_id: Optional[str] = None
+    written: int
+    batches: Optional[int] = None
+    retries: Optional[int] = None
+
+
+class LiveSensorStats(APIModel):
+    sensor_id: str
+    sensor_type: Optional[str] = None
+    count: int
+    mean: float
+    min: float
+    max: float
+    latest_value: float
+    latest_at: float
+
+
+class LiveSensorSummary(APIModel):
+    farm_id: str
+    sensors: List[LiveSensorStats]
+
+
+class LiveSensorReadings(APIModel):
+    farm_id: str
+    sensor_id: str
+    timestamps: List[float]
+    values: List[float]
+
+
+class SeriesPoint(APIModel):
+    bucket: str
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+
+
+class SensorSeries(APIModel):
+    farm_id: Optional[str] = None
+    sensor_id: Optional[str] = None
+    resolution: Optional[str] = None
+    points: List[SeriesPoint]
+
+
+class DailySensorStats(APIModel):
+    day: str
+    count: int
+    mean: float
+    min: float
+    max: float
+
+
+class ArchivedDailySummary(APIModel):
+    farm_id: str
+    sensor_id: str
+    readings: int
+    days: List[DailySensorStats]
+
+
+# ===== JOB RESPONSES =====
+
+class JobView(APIModel):
+    id: str
+    kind: str
+    status: str
+    priority: Optional[int] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -0,0 +1,4 @@
+"""
+AgriSmart Brasil Benchmarks
+Run from the backend directory, e.g. `python -m benchmarks.bench_image_preprocess`.
+"""
@@ -0,0 +1,145 @@
+"""
+Benchmark: unread alert badge from a query vs the materialized counter document
+Counts a farm's unread alerts per severity by streaming them, and by reading the counter
+document maintained by create_alert/mark_alert_read, against the in-process Firestore fake.
+First checks that the counters stay exact when commit acknowledgements are lost and retried, and
+that alerts from before counters existed are counted once the counters are rebuilt.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+
+from services.firestore import FirestoreService
+from services.sqlite_storage import SQLiteStorage
+from benchmarks.fake_firestore import FakeAsyncClient
+
+
+SEVERITIES = ["critical", "high", "medium", "low", "info"]
+
+
+async def count_by_query(db: FirestoreService, farm_id: str) -> dict:
+    counts = {}
+    async for alert in db.iter_alerts(farm_id, unread_only=True, fields=["severity"]):
+        severity = alert.get("severity", "unknown")
+        counts[severity] = counts.get(severity, 0) + 1
+    return {"unread": sum(counts.values()), "unread_by_severity": counts}
+
+
+async def _measure(client: FakeAsyncClient, fn, repeat: int):
+    reads, round_trips = client.reads, client.round_trips
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = await fn()
+    elapsed = (time.perf_counter() - started) * 1000 / repeat
+    return result, elapsed, (client.reads - reads) / repeat, (client.round_trips - round_trips) / repeat
+
+
+async def check_lost_acks() -> bool:
+    """Counters match a rebuild from the alerts when every commit is applied but reported as timed out."""
+    client = FakeAsyncClient()
+    db = FirestoreService(client=client)
+    alert_ids = []
+    for i in range(20):
+        client.lost_acks = 1
+        created = await db.create_alert("farm-acks", {"title": f"alert {i}", "severity": SEVERITIES[i % len(SEVERITIES)]})
+        alert_ids.append(created["alert_id"])
+    for alert_id in alert_ids[:5]:
+        client.lost_acks = 1
+        await db.mark_alert_read(alert_id)
+    stored = client._data["alert_counters"]["farm-acks"]
+    rebuilt = await db.rebuild_alert_counters("farm-acks")
+    ok = (stored["total"], stored["unread"]) == (rebuilt["total"], rebuilt["unread"]) == (20, 15)
+    print(f"lost commit acknowledgements: counters {stored['total']} total / {stored['unread']} unread, "
+          f"rebuilt {rebuilt['total']} / {rebuilt['unread']}", end="")
+
+    client.lost_acks = 1
+    await db.mark_all_read("farm-acks")
+    stored = client._data["alert_counters"]["farm-acks"]
+    ok = ok and stored["unread"] == 0 and len(client._data["alerts"]) == len(alert_ids)
+    print(f"; {stored['unread']} unread after mark_all_read -> {'OK' if ok else 'FAIL'}\n")
+    return ok
+
+
+async def check_migration(workdir: str) -> bool:
+    """A farm with alerts from before counters existed counts them all after its next alert."""
+    client = FakeAsyncClient()
+    db = FirestoreService(client=client)
+    for i in range(10):
+        await client.collection("alerts").document().set(
+            {"farm_id": "farm-old", "title": f"alert {i}", "severity": "high", "read": i < 4}
+        )
+    await db.create_alert("farm-old", {"title": "new", "severity": "low"})
+    await db.get_alert_counts("farm-old")
+    await db.create_alert("farm-old", {"title": "newer", "severity": "low"})
+    firestore_counts = await db.get_alert_counts("farm-old")
+
+    path = os.path.join(workdir, "alerts.db")
+    storage = SQLiteStorage(path=path)
+    for i in range(10):
+        created = await storage.create_alert("farm-old", {"title": f"alert {i}", "severity": "high"})
+        if i < 4:
+            await storage.mark_alert_read(created["alert_id"])
+    storage.close()
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE alert_counters")
+    storage = SQLiteStorage(path=path)
+    await storage.create_alert("farm-old", {"title": "new", "severity": "low"})
+    await storage.create_alert("farm-old", {"title": "newer", "severity": "low"})
+    sqlite_counts = await storage.get_alert_counts("farm-old")
+    storage.close()
+
+    ok = all((counts["total"], counts["unread"]) == (12, 8) for counts in (firestore_counts, sqlite_counts))
+    print(f"alerts from before counters: Firestore {firestore_counts['total']} total / {firestore_counts['unread']} unread, "
+          f"SQLite {sqlite_counts['total']} / {sqlite_counts['unread']}, expected 12 / 8 -> {'OK' if ok else 'FAIL'}\n")
+    return ok
+
+
+async def run(sizes, latency: float, repeat: int):
+    print(f"Firestore fake at {latency * 1000:.0f} ms/round trip, {repeat} badge reads per size")
+    print(f"{'alerts':>8} {'query ms':>9} {'reads':>7} {'counter ms':>11} {'reads':>6} {'mark_all_read ms':>17}")
+    for size in sizes:
+        client = FakeAsyncClient()
+        db = FirestoreService(client=client)
+        farm_id = f"farm-{size}"
+        for i in range(size):
+            await db.create_alert(farm_id, {"title": f"alert {i}", "severity": SEVERITIES[i % len(SEVERITIES)]})
+        # The one-time rebuild that marks the counters migrated
+        await db.get_alert_counts(farm_id)
+        client.latency = latency
+
+        by_query, query_ms, query_reads, _ = await _measure(client, lambda: count_by_query(db, farm_id), repeat)
+        counters, counter_ms, counter_reads, _ = await _measure(client, lambda: db.get_alert_counts(farm_id), repeat)
+        assert by_query["unread"] == counters["unread"], (by_query, counters)
+
+        started = time.perf_counter()
+        await db.mark_all_read(farm_id)
+        mark_ms = (time.perf_counter() - started) * 1000
+        assert (await db.get_alert_counts(farm_id))["unread"] == 0
+
+        print(
+            f"{size:>8} {query_ms:>9.2f} {query_reads:>7.0f} "
+            f"{counter_ms:>11.2f} {counter_reads:>6.0f} {mark_ms:>17.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per Firestore round trip")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if not asyncio.run(check_lost_acks()):
+        sys.exit(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        if not asyncio.run(check_migration(workdir)):
+            sys.exit(1)
+    asyncio.run(run(args.sizes, args.latency, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark: cancellation of abandoned requests and request deadlines
+Checks in-process that a request whose client disconnects frees its slot (handler, agent and Gemini call)
+at once and that a missed deadline answers 504; then compares answered req/s under load with clients
+that give up, with REQUEST_CANCELLATION off and on, against a Gemini stand-in with a concurrency quota.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import urllib.request
+from typing import Dict, Any, List, Optional, Tuple
+
+import aiohttp
+
+from benchmarks import fake_gemini
+from benchmarks.bench_load import SCENARIOS, percentile
+from benchmarks.bench_workers import free_port, start_server
+
+ACTION_PLAN_PATH, ACTION_PLAN_BODY = SCENARIOS["farm"][1]
+
+# Older aiohttp returns the connection of a cancelled request to the pool, so the Gemini call is
+# not aborted upstream (and the SDK misreports the cancellation); requirements.txt pins 3.11.18
+MIN_AIOHTTP = (3, 11)
+
+
+def gemini_stats(port: int) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as resp:
+        return json.load(resp)
+
+
+async def call(app, path: str, body: bytes, headers: List[Tuple[bytes, bytes]], disconnect_after: Optional[float]) -> Tuple[int, float]:
+    """
+    One request through the ASGI app; the client disconnects after `disconnect_after` seconds
+    if no response has started. Returns the status (0 if none was sent) and the seconds between
+    the disconnect (or the request) and the app returning.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"check"), (b"content-type", b"application/json"), *headers],
+        "client": ("127.0.0.1", 1234),
+        "server": ("check", 80),
+    }
+    status = 0
+    request_sent = False
+    gone_at = time.perf_counter()
+    responded = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent, gone_at
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        if disconnect_after is not None:
+            try:
+                await asyncio.wait_for(responded.wait(), disconnect_after)
+            except asyncio.TimeoutError:
+                gone_at = time.perf_counter()
+        else:
+            await responded.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            responded.set()
+
+    await app(scope, receive, send)
+    return status, time.perf_counter() - gone_at
+
+
+async def check(gemini_port: int) -> List[str]:
+    """In-process checks; returns the failures."""
+    from api.main import app
+    from api.routes import warm_up_agents
+    from services.metrics import HTTP_CANCELLED, HTTP_IN_FLIGHT, LLM_IN_FLIGHT
+
+    def llm_in_flight() -> float:
+        return sum(value for _, value in LLM_IN_FLIGHT.samples())
+
+    def cancelled(reason: str) -> float:
+        return sum(value for labels, value in HTTP_CANCELLED.samples() if labels[-1] == reason)
+
+    failures = []
+    await app.router.startup()
+    warm_up_agents()
+    try:
+        # SDK import and first connection; the short deadline keeps it from waiting on the model
+        await call(app, ACTION_PLAN_PATH, json.dumps(ACTION_PLAN_BODY(-1)).encode(), [(b"x-request-timeout", b"0.2")], None)
+        await asyncio.sleep(0.2)
+        upstream_cancelled = gemini_stats(gemini_port)["cancelled"]
+
+        body = json.dumps(ACTION_PLAN_BODY(0)).encode()
+        status, freed = await call(app, ACTION_PLAN_PATH, body, [], disconnect_after=0.5)
+        await asyncio.sleep(0.2)
+        print(f"disconnect after 0.5s: handler returned {freed * 1000:.1f} ms after the client left (status {status or 'none'})")
+        if freed > 0.1:
+            failures.append(f"handler returned {freed:.3f}s after the disconnect")
+        if HTTP_IN_FLIGHT.value or llm_in_flight():
+            failures.append(f"still in flight after the disconnect: {HTTP_IN_FLIGHT.value} requests, {llm_in_flight()} model calls")
+        if gemini_stats(gemini_port)["cancelled"] <= upstream_cancelled:
+            failures.append("the Gemini request was not cancelled")
+        if not cancelled("disconnect"):
+            failures.append("no cancellation recorded in agrismart_http_requests_cancelled_total")
+
+        started = time.perf_counter()
+        status, _ = await call(app, ACTION_PLAN_PATH, json.dumps(ACTION_PLAN_BODY(1)).encode(), [(b"x-request-timeout", b"0.5")], None)
+        elapsed = time.perf_counter() - started
+        print(f"X-Request-Timeout 0.5: status {status} after {elapsed * 1000:.0f} ms")
+        if status != 504 or elapsed > 0.6:
+            failures.append(f"deadline: status {status} after {elapsed:.3f}s, expected 504 after 0.5s")
+        if not cancelled("deadline"):
+            failures.append("no deadline cancellation recorded")
+    finally:
+        await app.router.shutdown()
+    return failures
+
+
+async def load(base_url: str, seconds: float, concurrency: int, abandon: float, patience: float) -> Dict[str, Any]:
+    """Clients post action plans; every `abandon` share of them gives up after `patience` seconds."""
+    latencies: List[float] = []
+    abandoned = 0
+    counter = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        async with session.post(f"{base_url}{ACTION_PLAN_PATH}", json=ACTION_PLAN_BODY(-1)) as resp:
+            await resp.read()
+        deadline = time.perf_counter() + seconds
+
+        async def post(i: int):
+            async with session.post(f"{base_url}{ACTION_PLAN_PATH}", json=ACTION_PLAN_BODY(i)) as resp:
+                await resp.read()
+                return resp.status
+
+        async def client():
+            nonlocal counter, abandoned
+            while time.perf_counter() < deadline:
+                i = counter
+                counter += 1
+                gives_up = (i * abandon) % 1 + abandon >= 1
+                started = time.perf_counter()
+                try:
+                    status = await asyncio.wait_for(post(i), patience if gives_up else None)
+                except asyncio.TimeoutError:
+                    abandoned += 1
+                    continue
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "answered": len(latencies),
+        "abandoned": abandoned,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--skip-load", action="store_true", help="only run the in-process checks")
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=32, help="clients")
+    parser.add_argument("--abandon", type=float, default=0.5, help="share of requests whose client gives up")
+    parser.add_argument("--patience", type=float, default=1.0, help="seconds before those clients give up")
+    fake_gemini.add_arguments(parser)
+    parser.set_defaults(latency="lognormal:1.0,0.4", max_concurrency=8, seed=1)
+    args = parser.parse_args()
+
+    installed = tuple(int(part) for part in aiohttp.__version__.split(".")[:2])
+    if installed < MIN_AIOHTTP:
+        print(f"FAIL: aiohttp {aiohttp.__version__} cannot cancel upstream requests, "
+              f"{'.'.join(map(str, MIN_AIOHTTP))} or later is required (pip install -r requirements.txt)")
+        sys.exit(1)
+
+    gemini_port = free_port()
+    check_args = parser.parse_args(["--latency", "fixed:5"])
+    gemini = fake_gemini.start(gemini_port, check_args)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            # Must be set before the app is imported
+            os.environ.update(
+                GEMINI_BASE_URL=f"http://127.0.0.1:{gemini_port}",
+                GOOGLE_API_KEY="cancellation-check",
+                ANALYSIS_REUSE_MAX_AGE_SECONDS="0",
+                STORAGE_BACKEND="sqlite",
+                SQLITE_STORAGE_PATH=os.path.join(workdir, "storage.db"),
+                JOB_SQLITE_PATH=os.path.join(workdir, "jobs.db"),
+                ANALYSIS_SPOOL_PATH=os.path.join(workdir, "analyses.spool.jsonl"),
+                REQUEST_CANCELLATION="true",
+            )
+            failures = asyncio.run(check(gemini_port))
+    finally:
+        gemini.terminate()
+        gemini.wait(timeout=30)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK\n")
+    if args.skip_load:
+        return
+
+    print(f"{args.concurrency} clients, {args.abandon:.0%} give up after {args.patience}s; "
+          f"Gemini {args.latency}, {args.max_concurrency or 'unlimited'} at once")
+    print(f"{'cancellation':<13} {'answered':>8} {'abandoned':>9} {'answered/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'upstream cancelled':>18}")
+    for enabled in ("false", "true"):
+        gemini_port = free_port()
+        gemini = fake_gemini.start(gemini_port, args)
+        try:
+            with tempfile.TemporaryDirectory() as workdir:
+                os.environ.update(
+                    GEMINI_BASE_URL=f"http://127.0.0.1:{gemini_port}",
+                    ANALYSIS_SPOOL_PATH=os.path.join(workdir, "analyses.spool.jsonl"),
+                    REQUEST_CANCELLATION=enabled,
+                )
+                port = free_port()
+                server = start_server(1, True, port, workdir)
+                try:
+                    result = asyncio.run(load(f"http://127.0.0.1:{port}", args.seconds, args.concurrency, args.abandon, args.patience))
+                finally:
+                    server.terminate()
+                    server.wait(timeout=60)
+            upstream = gemini_stats(gemini_port)["cancelled"]
+        finally:
+            gemini.terminate()
+            gemini.wait(timeout=30)
+        label = "on" if enabled == "true" else "off"
+        print(f"{label:<13} {result['answered']:>8} {result['abandoned']:>9} {result['rps']:>10.1f} "
+              f"{result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {upstream:>18}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark: previous triple CORS handling vs the pure-ASGI CORS middleware
+Drives a trivial JSON route and a streaming route in-process through the ASGI interface (no
+sockets), so the numbers isolate middleware overhead. Reports requests/sec and latency percentiles.
+"""
+
+import time
+import asyncio
+import argparse
+import statistics
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+
+from api.middleware import CORSMiddleware
+
+PREFLIGHT_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS, PATCH, HEAD",
+    "Access-Control-Allow-Headers": "*",
+    "Access-Control-Max-Age": "3600",
+}
+
+
+def add_routes(app: FastAPI):
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    @app.get("/stream")
+    async def stream():
+        async def events():
+            for i in range(20):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def legacy_app() -> FastAPI:
+    """The CORS setup api/main.py used before: http middleware + CORSMiddleware + OPTIONS route."""
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def cors_middleware(request: Request, call_next):
+        if request.method == "OPTIONS":
+            return Response(headers=PREFLIGHT_HEADERS)
+        response = await call_next(request)
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Methods"] = PREFLIGHT_HEADERS["Access-Control-Allow-Methods"]
+        response.headers["Access-Control-Allow-Headers"] = "*"
+        response.headers["Access-Control-Expose-Headers"] = "*"
+        return response
+
+    app.add_middleware(
+        StarletteCORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["*"]
+    )
+
+    @app.options("/{full_path:path}")
+    async def options_handler(full_path: str):
+        return Response(status_code=200, headers=PREFLIGHT_HEADERS)
+
+    add_routes(app)
+    return app
+
+
+def asgi_app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CORSMiddleware, origins=["*"])
+    add_routes(app)
+    return app
+
+
+async def call(app, method: str, path: str) -> int:
+    """Run one request through the ASGI app; returns the response status."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"origin", b"http://localhost:5173"),
+            (b"access-control-request-method", b"GET"),
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("bench", 80),
+    }
+    status = 0
+    body_done = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        # Like a server: the request body once, then a disconnect after the response
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await body_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            body_done.set()
+
+    await app(scope, receive, send)
+    await body_done.wait()
+    return status
+
+
+async def measure(app, method: str, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            status = await call(app, method, path)
+            latencies.append(time.perf_counter() - started)
+            assert status < 300, status
+
+    for _ in range(50):
+        await call(app, method, path)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def run(requests: int, concurrency: int):
+    apps = {"legacy": legacy_app(), "pure ASGI": asgi_app()}
+    cases = [("GET", "/ping"), ("OPTIONS", "/ping"), ("GET", "/stream")]
+    print(f"{requests} requests per case, concurrency {concurrency}")
+    print(f"{'case':<14} {'stack':<10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for method, path in cases:
+        for name, app in apps.items():
+            stats = await measure(app, method, path, requests, concurrency)
+            print(f"{method + ' ' + path:<14} {name:<10} {stats['rps']:>9.0f} {stats['p50_ms']:>8.3f} {stats['p99_ms']:>8.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
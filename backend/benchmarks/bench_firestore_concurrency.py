@@ -0,0 +1,59 @@
+"""
+Benchmark: concurrent FirestoreService reads
+Checks that parallel farm reads overlap on the event loop instead of serializing.
+Uses the in-process fake client with a fixed round-trip latency (no emulator needed).
+"""
+
+import time
+import asyncio
+import argparse
+
+from services.firestore import FirestoreService
+from benchmarks.fake_firestore import FakeAsyncClient
+
+
+async def run(farms: int, latency: float):
+    service = FirestoreService(client=FakeAsyncClient(latency=latency))
+    farm_ids = [f"farm-{i}" for i in range(farms)]
+    for farm_id in farm_ids:
+        service.db._data.setdefault("farms", {})[farm_id] = {"name": farm_id, "user_id": "u1"}
+
+    started = time.perf_counter()
+    for farm_id in farm_ids:
+        await service.get_farm(farm_id)
+    sequential = time.perf_counter() - started
+
+    service.cache.clear()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(service.get_farm(farm_id) for farm_id in farm_ids))
+    parallel = time.perf_counter() - started
+    assert all(results)
+
+    service.cache.clear()
+    started = time.perf_counter()
+    batched = await service.get_farms(farm_ids)
+    batch = time.perf_counter() - started
+    assert all(batched.values())
+
+    reads = service.db.reads
+    started = time.perf_counter()
+    await asyncio.gather(*(service.get_farm(farm_id) for farm_id in farm_ids))
+    cached = time.perf_counter() - started
+    cached_reads = service.db.reads - reads
+
+    print(f"{farms} farm reads at {latency * 1000:.0f} ms/round trip")
+    print(f"sequential awaits: {sequential * 1000:8.1f} ms")
+    print(f"asyncio.gather:    {parallel * 1000:8.1f} ms  ({sequential / parallel:.1f}x overlap)")
+    print(f"get_farms batch:   {batch * 1000:8.1f} ms")
+    print(f"read cache:        {cached * 1000:8.1f} ms  ({cached_reads} Firestore reads)")
+
+    if parallel > latency * 3:
+        raise SystemExit("parallel reads did not overlap")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--farms", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run(args.farms, args.latency))
@@ -0,0 +1,61 @@
+"""
+Benchmark: perceptual-hash deduplication index
+Measures build time and lookup latency for near-duplicate and novel images.
+"""
+
+import time
+import random
+import argparse
+
+from services.image_dedup import PerceptualHashIndex
+
+CROP_TYPES = ["Soja", "Milho", "Café", "Cana-de-açúcar"]
+
+
+def flip_bits(value: int, count: int) -> int:
+    for bit in random.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def run(entries: int, queries: int, max_distance: int):
+    random.seed(42)
+    index = PerceptualHashIndex(max_distance=max_distance, max_entries=entries)
+    hashes = [(random.getrandbits(64), random.choice(CROP_TYPES)) for _ in range(entries)]
+
+    started = time.perf_counter()
+    for i, (value, crop_type) in enumerate(hashes):
+        index.add(value, crop_type, i)
+    build = time.perf_counter() - started
+    print(f"indexed {entries:,} hashes in {build:.1f}s ({entries / build:,.0f}/s)")
+
+    def near_duplicate():
+        value, crop_type = random.choice(hashes)
+        return flip_bits(value, random.randint(0, max_distance)), crop_type
+
+    def novel_image():
+        return random.getrandbits(64), random.choice(CROP_TYPES)
+
+    for label, make_query in (("near-duplicate", near_duplicate), ("novel image", novel_image)):
+        index.lookups = index.hits = 0
+        index.total_lookup_time = 0.0
+        samples = [make_query() for _ in range(queries)]
+        latencies = []
+        for value, crop_type in samples:
+            started = time.perf_counter()
+            index.lookup(value, crop_type)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        stats = index.get_stats()
+        print(f"{label:15s} hit rate {stats['hit_rate']:.1%}  "
+              f"p50 {latencies[len(latencies) // 2] * 1e6:.0f} us  "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--max-distance", type=int, default=6)
+    args = parser.parse_args()
+    run(args.entries, args.queries, args.max_distance)
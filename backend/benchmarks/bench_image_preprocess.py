@@ -0,0 +1,60 @@
+"""
+Benchmark: image preprocessing stage
+Compares payload size and upload/preprocess latency before and after downsizing.
+"""
+
+import io
+import time
+import asyncio
+import argparse
+
+from PIL import Image
+
+from services.image_preprocessor import ImagePreprocessor
+
+
+def make_photo(width: int, height: int) -> bytes:
+    """Generate a phone-sized JPEG with enough detail to compress realistically."""
+    noise = Image.effect_noise((width, height), 64).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    img = Image.blend(noise, gradient, 0.5)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=95)
+    return out.getvalue()
+
+
+async def run(count: int, width: int, height: int, uplink_mbps: float):
+    photo = make_photo(width, height)
+    preprocessor = ImagePreprocessor()
+
+    # Warm up the process pool so worker start-up is not measured
+    await preprocessor.process(photo)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(preprocessor.process(photo) for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    preprocessor.shutdown()
+
+    stats = results[0][2]
+    bytes_per_sec = uplink_mbps * 1_000_000 / 8
+    upload_before = stats["original_bytes"] / bytes_per_sec
+    upload_after = stats["processed_bytes"] / bytes_per_sec
+    per_image_ms = sorted(r[2]["elapsed_ms"] for r in results)
+
+    print(f"input:            {width}x{height}, {stats['original_bytes'] / 1e6:.2f} MB")
+    print(f"output:           {stats['processed_size'][0]}x{stats['processed_size'][1]}, "
+          f"{stats['processed_bytes'] / 1e6:.2f} MB ({stats['format']})")
+    print(f"bytes saved:      {stats['bytes_saved'] / stats['original_bytes']:.1%}")
+    print(f"preprocess p50:   {per_image_ms[len(per_image_ms) // 2]:.1f} ms/image")
+    print(f"throughput:       {count / elapsed:.1f} images/s ({preprocessor.max_workers} workers)")
+    print(f"model upload @ {uplink_mbps:g} Mbps: {upload_before * 1000:.0f} ms -> {upload_after * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=32)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.count, args.width, args.height, args.uplink_mbps))
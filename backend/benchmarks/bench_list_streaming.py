@@ -0,0 +1,85 @@
+"""
+Benchmark: full-list sensor queries vs cursor-paginated streaming
+Reports time to first item and peak Python memory as the number of matching readings grows.
+The fake client filters and sorts the whole collection on every page request, so its own
+scan cost (a list of row references) still grows with size; the loaded result set does not.
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+from services.firestore import FirestoreService
+from benchmarks.fake_firestore import FakeAsyncClient
+
+
+def _seed(client: FakeAsyncClient, count: int):
+    now = datetime.utcnow()
+    client._data["sensor_data"] = {
+        f"r{i:08d}": {
+            "farm_id": "farm-1",
+            "sensor_id": f"probe-{i % 20}",
+            "sensor_type": "soil_moisture",
+            "value": random.uniform(10, 45),
+            "unit": "%",
+            "location": {"lat": -15.6, "lng": -47.8},
+            "timestamp": now - timedelta(seconds=i),
+        }
+        for i in range(count)
+    }
+
+
+async def _full_list(service: FirestoreService):
+    started = time.perf_counter()
+    readings = await service.get_sensor_data("farm-1", hours=24 * 30)
+    first = time.perf_counter() - started
+    return first, len(readings)
+
+
+async def _streamed(service: FirestoreService):
+    started = time.perf_counter()
+    first = None
+    count = 0
+    async for _ in service.iter_sensor_data("farm-1", hours=24 * 30, fields=["sensor_id", "value"]):
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    return first, count
+
+
+async def _measure(fn, service: FirestoreService):
+    tracemalloc.start()
+    first, count = await fn(service)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first * 1000, peak / 1e6, count
+
+
+async def run(sizes, latency: float, page_size: int):
+    print(f"{'readings':>9} {'mode':>9} {'first ms':>9} {'peak MB':>8} {'items':>8}")
+
+    for size in sizes:
+        client = FakeAsyncClient(latency=latency)
+        _seed(client, size)
+        service = FirestoreService(client=client)
+        service.page_size = page_size
+
+        for mode, fn in (("list", _full_list), ("stream", _streamed)):
+            first_ms, peak_mb, count = await _measure(fn, service)
+            print(f"{size:>9} {mode:>9} {first_ms:>9.1f} {peak_mb:>8.1f} {count:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per round trip")
+    parser.add_argument("--page-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.latency, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Benchmark: load scenarios per agent endpoint family against a local Gemini stand-in
+Starts benchmarks/fake_gemini.py and the production server (gunicorn.conf.py, SQLite storage), drives
+each family's endpoints for a fixed time and reports req/s, p50/p95/p99 latency and event loop lag.
+Compares with a stored baseline and exits non-zero on a regression.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+import aiohttp
+
+from benchmarks import fake_gemini
+from benchmarks.bench_workers import free_port, start_server
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "load.json")
+
+CROPS = ("Soja", "Milho", "Cana-de-açúcar", "Café", "Algodão")
+
+# Endpoint family -> [(path, body for request i)]; bodies vary so no two requests are identical
+SCENARIOS: Dict[str, List[Tuple[str, Callable[[int], Dict[str, Any]]]]] = {
+    "climate": [
+        ("/api/climate/analyze", lambda i: {
+            "location": "Sorriso, MT",
+            "climate_data": {"temperature": 20 + i % 15, "humidity": 40 + i % 50, "rainfall_mm": i % 30, "sample": i},
+        }),
+        ("/api/weather/frost-risk", lambda i: {
+            "location": "Guarapuava, PR", "min_temp_forecast": -2 + (i % 80) / 10, "crop_stage": "floração",
+            "crop_type": CROPS[i % len(CROPS)],
+        }),
+        ("/api/climate/drought-assessment", lambda i: {
+            "location": "Petrolina, PE", "rainfall_history": [float((i + d) % 40) for d in range(30)],
+            "soil_moisture": 10 + i % 25,
+        }),
+    ],
+    "crop": [
+        ("/api/crop/identify-disease", lambda i: {
+            "symptoms": f"Manchas amarelas nas folhas inferiores, lesões de {1 + i % 9} mm", "crop_type": CROPS[i % len(CROPS)],
+        }),
+        ("/api/crop/nutrient-assessment", lambda i: {
+            "observations": {"leaf_color": "verde-claro", "growth": "lento", "plot": i}, "crop_type": CROPS[i % len(CROPS)],
+        }),
+        ("/api/crop/rotation-recommendation", lambda i: {
+            "current_crop": CROPS[i % len(CROPS)], "soil_condition": f"argiloso, pH {5 + (i % 20) / 10}",
+            "previous_crops": [CROPS[(i + k) % len(CROPS)] for k in range(3)],
+        }),
+    ],
+    "water": [
+        ("/api/water/irrigation-schedule", lambda i: {
+            "crop_type": CROPS[i % len(CROPS)], "field_size": 10 + i % 500, "soil_type": "latossolo",
+            "climate_data": {"et0_mm": 4 + (i % 30) / 10, "rainfall_mm": i % 12}, "water_availability": "média",
+        }),
+        ("/api/water/efficiency", lambda i: {
+            "water_used": 1000 + i, "field_size": 50 + i % 200, "crop_yield": 3000 + i % 900, "crop_type": CROPS[i % len(CROPS)],
+        }),
+        ("/api/water/detect-issues", lambda i: {
+            "sensor_data": {"pressure_bar": 1 + (i % 30) / 10, "flow_lpm": 100 + i % 80}, "irrigation_system": "pivô central",
+        }),
+    ],
+    "yield": [
+        ("/api/yield/predict", lambda i: {
+            "crop_type": CROPS[i % len(CROPS)], "field_size": 100 + i % 900, "planting_date": "2025-10-15",
+            "current_conditions": {"ndvi": 0.5 + (i % 40) / 100, "soil_moisture": 20 + i % 20},
+        }),
+        ("/api/yield/gap-analysis", lambda i: {
+            "actual_yield": 2800 + i % 700, "potential_yield": 4200, "crop_type": CROPS[i % len(CROPS)],
+            "farming_practices": {"fertilization": "NPK 04-14-08", "plot": i},
+        }),
+        ("/api/yield/market-timing", lambda i: {
+            "crop_type": CROPS[i % len(CROPS)], "expected_harvest_date": "2026-03-01", "expected_quantity": 1000 + i,
+            "market_data": {"price_brl_saca": 120 + i % 30},
+        }),
+    ],
+    "farm": [
+        ("/api/farm/query", lambda i: {
+            "query": f"Qual a prioridade desta semana para o talhão {i % 40}?", "context": {"crops": list(CROPS[:3])},
+        }),
+        ("/api/farm/action-plan", lambda i: {
+            "goal": f"Aumentar a produtividade em {5 + i % 20}%", "timeframe": "6 meses",
+            "farm_status": {"area_ha": 300 + i % 700, "crops": list(CROPS[:2])},
+        }),
+        ("/api/farm/performance", lambda i: {
+            "performance_data": {"yield_t_ha": 3 + (i % 20) / 10, "cost_brl_ha": 4000 + i % 1500}, "period": "safra 2024/25",
+        }),
+    ],
+}
+
+LAG_METRIC = "agrismart_event_loop_lag_seconds"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(q / 100 * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def lag_histogram(text: str) -> Dict[float, float]:
+    """Cumulative bucket counts of the event loop lag histogram from a /metrics page."""
+    buckets: Dict[float, float] = {}
+    for line in text.splitlines():
+        if line.startswith(f"{LAG_METRIC}_bucket"):
+            bound = line.split('le="', 1)[1].split('"', 1)[0]
+            buckets[float("inf") if bound == "+Inf" else float(bound)] = float(line.rsplit(" ", 1)[1])
+    return buckets
+
+
+def histogram_quantile(before: Dict[float, float], after: Dict[float, float], q: float) -> float:
+    """
+    Upper bound of the bucket holding quantile q of the observations between two scrapes
+    (the largest finite bound when it falls in +Inf).
+    """
+    bounds = sorted(after)
+    counts = [after[b] - before.get(b, 0) for b in bounds]
+    if not counts or counts[-1] <= 0:
+        return 0.0
+    for bound, cumulative in zip(bounds, counts):
+        if cumulative >= q / 100 * counts[-1]:
+            return bound if bound != float("inf") else bounds[-2]
+    return bounds[-2]
+
+
+async def run_scenario(base_url: str, family: str, seconds: float, concurrency: int, offset: int) -> Dict[str, Any]:
+    endpoints = SCENARIOS[family]
+    latencies: List[float] = []
+    failures = 0
+    counter = offset
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+        # First requests import the Gemini SDK and build the agents; keep that out of the numbers
+        for path, body in endpoints:
+            async with session.post(f"{base_url}{path}", json=body(offset - 1)) as resp:
+                await resp.read()
+
+        async with session.get(f"{base_url}/metrics") as resp:
+            lag_before = lag_histogram(await resp.text())
+
+        deadline = time.perf_counter() + seconds
+
+        async def loop():
+            nonlocal counter, failures
+            while time.perf_counter() < deadline:
+                i = counter
+                counter += 1
+                path, body = endpoints[i % len(endpoints)]
+                started = time.perf_counter()
+                async with session.post(f"{base_url}{path}", json=body(i), headers={"X-Farm-Id": f"load-farm-{i % 20}"}) as resp:
+                    payload = await resp.read()
+                latencies.append(time.perf_counter() - started)
+                if resp.status != 200 or json.loads(payload).get("status") != "success":
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        async with session.get(f"{base_url}/metrics") as resp:
+            lag_after = lag_histogram(await resp.text())
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "error_rate": round(failures / len(latencies), 4) if latencies else 0.0,
+        "loop_lag_p99_ms": round(histogram_quantile(lag_before, lag_after, 99) * 1000, 1),
+    }
+
+
+def settings(args: argparse.Namespace) -> Dict[str, Any]:
+    """Everything a baseline depends on; results are only compared under identical settings."""
+    return {
+        "seconds": args.seconds,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "output_tokens": args.output_tokens,
+        "cpus": len(os.sched_getaffinity(0)),
+        "python": platform.python_version(),
+    }
+
+
+def regressions(family: str, result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    found = []
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        found.append(f"{family}: {result['rps']:.1f} req/s, baseline {baseline['rps']:.1f}")
+    for key in ("p50_ms", "p95_ms"):
+        if result[key] > baseline[key] * (1 + tolerance):
+            found.append(f"{family}: {key} {result[key]:.0f}, baseline {baseline[key]:.0f}")
+    # Lag is bucketed (steps of 2-2.5x) and noisy; flag two steps above the baseline's bucket
+    if result["loop_lag_p99_ms"] > max(baseline["loop_lag_p99_ms"] * 5, 10):
+        found.append(f"{family}: event loop lag p99 {result['loop_lag_p99_ms']:.1f} ms, baseline {baseline['loop_lag_p99_ms']:.1f}")
+    if result["error_rate"] > baseline["error_rate"] + 0.01:
+        found.append(f"{family}: error rate {result['error_rate']:.1%}, baseline {baseline['error_rate']:.1%}")
+    return found
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated endpoint families")
+    parser.add_argument("--seconds", type=float, default=10, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative change before a regression")
+    fake_gemini.add_arguments(parser)
+    parser.set_defaults(latency="lognormal:0.3,0.5", seed=1)
+    args = parser.parse_args()
+
+    families = [name.strip() for name in args.scenarios.split(",")]
+    unknown = [name for name in families if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    gemini_port = free_port()
+    gemini = fake_gemini.start(gemini_port, args)
+    # Inherited by the API server; every request reaches the (fake) model
+    os.environ.update(
+        GEMINI_BASE_URL=f"http://127.0.0.1:{gemini_port}",
+        GOOGLE_API_KEY="load-test",
+        ANALYSIS_REUSE_MAX_AGE_SECONDS="0",
+    )
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.environ["ANALYSIS_SPOOL_PATH"] = os.path.join(workdir, "analyses.spool.jsonl")
+            port = free_port()
+            server = start_server(args.workers, True, port, workdir)
+            try:
+                print(f"{'scenario':<10} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'lag p99 ms':>10}")
+                for n, family in enumerate(families):
+                    result = asyncio.run(run_scenario(f"http://127.0.0.1:{port}", family, args.seconds, args.concurrency, n * 1_000_000))
+                    results[family] = result
+                    print(f"{family:<10} {result['requests']:>8} {result['rps']:>8.1f} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} "
+                          f"{result['p99_ms']:>8.0f} {result['error_rate']:>7.1%} {result['loop_lag_p99_ms']:>10.1f}")
+            finally:
+                server.terminate()
+                server.wait(timeout=60)
+    finally:
+        gemini.terminate()
+        gemini.wait(timeout=30)
+
+    current = settings(args)
+    if args.save_baseline:
+        baseline = load_baseline(args.baseline) or {}
+        if baseline.get("settings") != current:
+            baseline = {"settings": current, "results": {}}
+        baseline["results"].update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+    if baseline["settings"] != current:
+        print(f"\nbaseline settings differ, not compared: {baseline['settings']}")
+        return
+
+    found = []
+    for family, result in results.items():
+        if family in baseline["results"]:
+            found += regressions(family, result, baseline["results"][family], args.tolerance)
+    for regression in found:
+        print(f"REGRESSION: {regression}")
+    if found:
+        sys.exit(1)
+    print("\nno regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: cost of metrics recording on the hot path
+Times histogram observations and agent-style instrumentation per call, and an in-process ASGI route
+with and without MetricsMiddleware.
+"""
+
+import time
+import asyncio
+import argparse
+
+from fastapi import FastAPI
+
+from api.middleware import MetricsMiddleware
+from benchmarks.bench_cors_middleware import measure
+from services.metrics import MetricsRegistry, instrument_agent
+
+
+def per_call(label: str, fn, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    print(f"{label:<40} {(time.perf_counter() - started) / repeat * 1e9:>8.0f} ns")
+
+
+@instrument_agent("bench")
+class TimedAgent:
+    async def answer(self):
+        return {"status": "success"}
+
+
+class PlainAgent:
+    async def answer(self):
+        return {"status": "success"}
+
+
+def app(instrumented: bool) -> FastAPI:
+    application = FastAPI()
+
+    @application.get("/farms/{farm_id}")
+    async def farm(farm_id: str):
+        return {"id": farm_id, "status": "ok"}
+
+    if instrumented:
+        application.add_middleware(MetricsMiddleware)
+    return application
+
+
+async def agent_calls(agent, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await agent.answer()
+    return (time.perf_counter() - started) / repeat * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry(multiprocess_dir="")
+    histogram = registry.histogram("bench_seconds", "bench", ("route", "status"))
+    child = histogram.labels("/farms/{farm_id}", "200")
+    per_call("histogram child observe", lambda: child.observe(0.0123), args.repeat)
+    per_call("histogram labels(...).observe", lambda: histogram.labels("/farms/{farm_id}", "200").observe(0.0123), args.repeat)
+
+    plain = asyncio.run(agent_calls(PlainAgent(), args.repeat // 4))
+    timed = asyncio.run(agent_calls(TimedAgent(), args.repeat // 4))
+    print(f"{'agent method, plain':<40} {plain:>8.0f} ns")
+    print(f"{'agent method, instrumented':<40} {timed:>8.0f} ns")
+
+    print(f"\n{'route':<40} {'req/s':>8} {'p50 ms':>8}")
+    for label, instrumented in (("without MetricsMiddleware", False), ("with MetricsMiddleware", True)):
+        stats = asyncio.run(measure(app(instrumented), "GET", "/farms/f1", args.requests, 16))
+        print(f"{label:<40} {stats['rps']:>8.0f} {stats['p50_ms']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
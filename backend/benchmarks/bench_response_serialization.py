@@ -0,0 +1,137 @@
+"""
+Benchmark: response serialization of large briefing and analysis payloads
+Compares FastAPI's untyped path (jsonable_encoder + json.dumps) with the typed path used by the
+routes (response model validate/serialize in pydantic-core + orjson), per response and end to end.
+"""
+
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api.responses import FastJSONResponse, MSGPACK_AVAILABLE, msgpack
+from api.schemas import FarmManagerResponse, Page
+from benchmarks.bench_cors_middleware import measure
+
+
+def briefing_payload(size_kb: int) -> Dict[str, Any]:
+    rng = random.Random(3)
+    words = ["soja", "milho", "irrigação", "chuva", "pragas", "colheita", "solo", "umidade"]
+    text = " ".join(rng.choice(words) for _ in range(size_kb * 150))
+    return {
+        "status": "success",
+        "agent": "farm_manager",
+        "briefing_date": "2026-03-14",
+        "briefing": text,
+        "farm_data": {
+            "crops": [
+                {"id": f"crop-{i}", "crop_type": rng.choice(words), "area_ha": rng.uniform(5, 300),
+                 "planted_at": datetime(2025, 10, 1) + timedelta(days=i)}
+                for i in range(200)
+            ],
+            "sensors": {f"probe-{i}": {"value": rng.uniform(10, 40), "unit": "%"} for i in range(100)},
+        },
+    }
+
+
+def analyses_payload(items: int) -> Dict[str, Any]:
+    rng = random.Random(4)
+    now = datetime.utcnow()
+    return {
+        "items": [
+            {
+                "id": f"analysis-{i}",
+                "farm_id": "farm-1",
+                "type": "crop.analyze-image",
+                "timestamp": now - timedelta(minutes=i),
+                "request": {"crop_type": "soja", "image": {"sha256": "ab" * 32, "chars": 812345}},
+                "result": {
+                    "status": "success",
+                    "agent": "crop_analyzer",
+                    "analysis": "Folhas com manchas " * 40,
+                    "confidence": rng.random(),
+                    "issues": ["ferrugem", "deficiência de potássio"],
+                },
+            }
+            for i in range(items)
+        ],
+        "next_cursor": "eyJ2IjoxfQ",
+    }
+
+
+def untyped(content: Any) -> bytes:
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def typed(adapter: TypeAdapter):
+    def serialize(content: Any) -> bytes:
+        value = adapter.validate_python(content)
+        return FastJSONResponse(adapter.dump_python(value, mode="json", exclude_unset=True)).body
+    return serialize
+
+
+def per_response(name: str, content: Any, adapter: TypeAdapter, repeat: int):
+    variants = {"jsonable_encoder+json": untyped, "model+orjson": typed(adapter)}
+    if MSGPACK_AVAILABLE:
+        variants["model+msgpack"] = lambda c: msgpack.packb(
+            adapter.dump_python(adapter.validate_python(c), mode="json", exclude_unset=True), use_bin_type=True
+        )
+
+    for variant, serialize in variants.items():
+        body = serialize(content)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            serialize(content)
+        elapsed = (time.perf_counter() - started) * 1000 / repeat
+        print(f"{name:<22} {variant:<22} {elapsed:>9.3f} {len(body) / 1024:>9.1f}")
+
+
+def app_for(content: Any, model: Any, typed_route: bool) -> FastAPI:
+    if typed_route:
+        app = FastAPI(default_response_class=FastJSONResponse)
+
+        @app.get("/payload", response_model=model, response_model_exclude_unset=True)
+        async def payload():
+            return content
+    else:
+        app = FastAPI()
+
+        @app.get("/payload")
+        async def payload():
+            return content
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--briefing-kb", type=int, default=64)
+    parser.add_argument("--analyses", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    cases = [
+        (f"briefing ~{args.briefing_kb}KB", briefing_payload(args.briefing_kb), FarmManagerResponse),
+        (f"{args.analyses} analyses page", analyses_payload(args.analyses), Page),
+    ]
+
+    print(f"{'payload':<22} {'serializer':<22} {'ms/resp':>9} {'KB':>9}")
+    for name, content, model in cases:
+        per_response(name, content, TypeAdapter(model), args.repeat)
+
+    print(f"\nend to end through FastAPI (in-process ASGI, concurrency 8)")
+    print(f"{'payload':<22} {'route':<22} {'req/s':>9} {'p99 ms':>9}")
+    for name, content, model in cases:
+        for label, typed_route in (("untyped dict", False), ("typed + FastJSON", True)):
+            stats = asyncio.run(measure(app_for(content, model, typed_route), "GET", "/payload", args.repeat * 4, 8))
+            print(f"{name:<22} {label:<22} {stats['rps']:>9.0f} {stats['p99_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmark: multi-year sensor history as lists of dicts vs the memory-mapped columnar archive
+Seeds an SQLite store, exports it to a SensorArchive, then loads the full history and computes
+per-day statistics both ways. Each load runs in a fresh process so RSS growth is measured cleanly.
+First checks that retrying an export that failed halfway doesn't archive readings twice, and that a
+repeated export job picks up readings ingested after the previous one.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime, timedelta
+
+from services.sqlite_storage import SQLiteStorage
+from services.sensor_archive import SensorArchive, daily_summary
+from services.jobs import TERMINAL_STATUSES
+
+
+FARM_ID = "farm-bench"
+
+
+def _rss_mb() -> float:
+    """Current resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+async def seed(db: SQLiteStorage, readings: int, days: int):
+    rng = random.Random(11)
+    end = datetime.utcnow()
+    step = days * 86400 / readings
+    batch = []
+    for i in range(readings):
+        batch.append({
+            "sensor_id": f"probe-{i % 8}",
+            "sensor_type": "soil_moisture",
+            "value": rng.uniform(10, 40),
+            "timestamp": end - timedelta(seconds=step * i),
+        })
+        if len(batch) == 50000:
+            await db.save_sensor_data_bulk(FARM_ID, batch)
+            batch = []
+    if batch:
+        await db.save_sensor_data_bulk(FARM_ID, batch)
+
+
+class FailingStorage:
+    """Streams readings newest first, failing once after `fail_after` of them."""
+
+    def __init__(self, readings: int, fail_after: int):
+        end = datetime.utcnow()
+        self.readings = [
+            {"sensor_id": f"probe-{i % 2}", "value": float(i), "timestamp": end - timedelta(minutes=i // 2)}
+            for i in range(readings)
+        ]
+        self.fail_after = fail_after
+
+    async def iter_sensor_data(self, farm_id: str, hours: int, fields=None):
+        for i, reading in enumerate(self.readings):
+            if i == self.fail_after:
+                self.fail_after = None
+                raise ConnectionError("storage went away")
+            yield dict(reading)
+
+
+def check_retry(root: str) -> bool:
+    archive = SensorArchive(root=root, chunk_rows=100)
+    storage = FailingStorage(1000, 650)
+    try:
+        asyncio.run(archive.export(storage, FARM_ID))
+    except ConnectionError:
+        pass
+    asyncio.run(archive.export(storage, FARM_ID))
+    rows = archive.get_stats(FARM_ID)["rows"]
+    ok = rows == len(storage.readings)
+    print(f"export retried after a failure: {rows} rows for {len(storage.readings)} readings -> {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def wait_for_job(job_queue, job_id: str) -> dict:
+    while True:
+        job = await job_queue.get(job_id)
+        if job["status"] in TERMINAL_STATUSES:
+            return job
+        await asyncio.sleep(0.01)
+
+
+def check_repeat_export(workdir: str) -> bool:
+    """A second export through the API after new readings arrive runs instead of reusing the first job."""
+    # Must be set before the app is imported
+    os.environ.update(
+        GOOGLE_API_KEY="archive-check",
+        STORAGE_BACKEND="sqlite",
+        SQLITE_STORAGE_PATH=os.path.join(workdir, "storage.db"),
+        SENSOR_ARCHIVE_PATH=os.path.join(workdir, "archive"),
+        JOB_BACKEND="memory",
+    )
+    from api import routes
+
+    async def run():
+        await routes.job_queue.start()
+        try:
+            db = routes.get_db()
+            now = datetime.utcnow()
+            await db.save_sensor_data_bulk(FARM_ID, [
+                {"sensor_id": "probe-0", "value": 20.0, "timestamp": now - timedelta(minutes=10)}
+            ])
+            first = await routes.export_sensor_archive(FARM_ID)
+            await wait_for_job(routes.job_queue, first["id"])
+            await db.save_sensor_data_bulk(FARM_ID, [
+                {"sensor_id": "probe-0", "value": 21.0, "timestamp": now - timedelta(minutes=5)}
+            ])
+            second = await routes.export_sensor_archive(FARM_ID)
+            await wait_for_job(routes.job_queue, second["id"])
+            return first["id"] != second["id"], routes.sensor_archive.get_stats(FARM_ID)["rows"]
+        finally:
+            await routes.job_queue.stop()
+
+    new_job, rows = asyncio.run(run())
+    ok = new_job and rows == 2
+    print(f"export repeated after a new reading: {'new' if new_job else 'same'} job, {rows} of 2 rows archived "
+          f"-> {'OK' if ok else 'FAIL'}")
+    return ok
+
+
+def load_dicts(db_path: str, days: int) -> dict:
+    async def run():
+        db = SQLiteStorage(path=db_path)
+        before = _rss_mb()
+        started = time.perf_counter()
+        readings = await db.get_sensor_data(FARM_ID, hours=days * 24 + 24)
+        loaded = time.perf_counter() - started
+
+        per_day = {}
+        for reading in readings:
+            if reading.get("sensor_id") != "probe-3":
+                continue
+            day = reading["timestamp"].date()
+            per_day.setdefault(day, []).append(reading["value"])
+        summary = {day: sum(values) / len(values) for day, values in per_day.items()}
+        total = time.perf_counter() - started
+        rss = _rss_mb() - before
+        db.close()
+        return {"rows": len(readings), "load_s": loaded, "total_s": total, "rss_mb": rss, "days": len(summary)}
+
+    return asyncio.run(run())
+
+
+def load_archive(root: str) -> dict:
+    archive = SensorArchive(root=root)
+    before = _rss_mb()
+    started = time.perf_counter()
+    columns = archive.load(FARM_ID)
+    loaded = time.perf_counter() - started
+
+    summary = daily_summary(columns.select("probe-3"))
+    total = time.perf_counter() - started
+    return {
+        "rows": len(columns),
+        "load_s": loaded,
+        "total_s": total,
+        "rss_mb": _rss_mb() - before,
+        "days": len(summary),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readings", type=int, default=300000)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if not check_retry(os.path.join(workdir, "retry")):
+            sys.exit(1)
+        if not check_repeat_export(workdir):
+            sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_path = os.path.join(workdir, "bench.db")
+        root = os.path.join(workdir, "archive")
+
+        async def prepare():
+            db = SQLiteStorage(path=db_path)
+            started = time.perf_counter()
+            await seed(db, args.readings, args.days)
+            seeded = time.perf_counter() - started
+            started = time.perf_counter()
+            result = await SensorArchive(root=root).export(db, FARM_ID)
+            db.close()
+            return seeded, time.perf_counter() - started, result
+
+        seeded, exported, result = asyncio.run(prepare())
+        print(
+            f"seeded {args.readings} readings over {args.days} days in {seeded:.1f}s, "
+            f"exported {result['exported']} into {len(result['months'])} month partitions in {exported:.1f}s"
+        )
+
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1) as pool:
+            dicts = pool.apply(load_dicts, (db_path, args.days))
+        with context.Pool(1) as pool:
+            columns = pool.apply(load_archive, (root,))
+
+    print(f"{'path':<22} {'rows':>9} {'load s':>8} {'+daily s':>9} {'RSS +MB':>8}")
+    for name, stats in (("get_sensor_data dicts", dicts), ("memory-mapped archive", columns)):
+        print(
+            f"{name:<22} {stats['rows']:>9} {stats['load_s']:>8.3f} "
+            f"{stats['total_s']:>9.3f} {stats['rss_mb']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
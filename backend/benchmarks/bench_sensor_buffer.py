@@ -0,0 +1,88 @@
+"""
+Benchmark: recent readings as dicts vs the typed-column sensor ring buffer
+Holds the same readings as get_sensor_data-shaped dicts and in a SensorRingBuffer, and reports
+memory per million readings (tracemalloc), append throughput and a 1-hour window summary.
+"""
+
+import time
+import uuid
+import random
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+from services.sensor_buffer import SensorRingBuffer
+from services.sensor_rollups import to_epoch
+
+
+def make_dicts(count: int, sensors: int) -> list:
+    rng = random.Random(5)
+    now = datetime.utcnow()
+    return [
+        {
+            "id": uuid.uuid4().hex[:20],
+            "farm_id": "farm-bench",
+            "sensor_id": f"probe-{i % sensors}",
+            "sensor_type": "soil_moisture",
+            "value": rng.uniform(10, 40),
+            "unit": "%",
+            "zone": f"zone-{i % 4}",
+            "timestamp": now - timedelta(seconds=count - i),
+        }
+        for i in range(count)
+    ]
+
+
+def dict_summary(readings: list, since: datetime) -> dict:
+    stats = {}
+    for reading in readings:
+        if reading["timestamp"] < since:
+            continue
+        entry = stats.setdefault(reading["sensor_id"], [0, 0.0, float("inf"), float("-inf")])
+        entry[0] += 1
+        entry[1] += reading["value"]
+        entry[2] = min(entry[2], reading["value"])
+        entry[3] = max(entry[3], reading["value"])
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readings", type=int, default=300000)
+    parser.add_argument("--sensors", type=int, default=50)
+    args = parser.parse_args()
+    per_million = 1_000_000 / args.readings
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    readings = make_dicts(args.readings, args.sensors)
+    dict_bytes = tracemalloc.get_traced_memory()[0] - before
+
+    epochs = [to_epoch(reading["timestamp"]) for reading in readings]
+    before = tracemalloc.get_traced_memory()[0]
+    buffer = SensorRingBuffer(args.readings)
+    started = time.perf_counter()
+    for reading, epoch in zip(readings, epochs):
+        buffer.append(reading["sensor_id"], reading["value"], epoch, reading["sensor_type"])
+    append_s = time.perf_counter() - started
+    ring_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    since = datetime.utcnow() - timedelta(hours=1)
+    started = time.perf_counter()
+    dict_stats = dict_summary(readings, since)
+    dict_query_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    ring_stats = buffer.summary(to_epoch(since))
+    ring_query_ms = (time.perf_counter() - started) * 1000
+    assert len(dict_stats) == len(ring_stats)
+
+    print(f"{args.readings} readings from {args.sensors} sensors")
+    print(f"{'representation':<16} {'MB per 1M':>10} {'bytes/reading':>14} {'1h summary ms':>14}")
+    print(f"{'list of dicts':<16} {dict_bytes * per_million / 2**20:>10.1f} {dict_bytes / args.readings:>14.1f} {dict_query_ms:>14.2f}")
+    print(f"{'ring buffer':<16} {ring_bytes * per_million / 2**20:>10.1f} {ring_bytes / args.readings:>14.1f} {ring_query_ms:>14.2f}")
+    print(f"ring buffer appends: {args.readings / append_s:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
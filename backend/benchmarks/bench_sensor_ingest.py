@@ -0,0 +1,52 @@
+"""
+Benchmark: bulk sensor ingestion
+Compares one-write-per-reading against batched bulk writes on the in-process fake client.
+"""
+
+import time
+import random
+import asyncio
+import argparse
+
+from services.firestore import FirestoreService
+from benchmarks.fake_firestore import FakeAsyncClient
+
+
+def make_readings(count: int):
+    return [
+        {
+            "sensor_id": f"probe-{i % 300}",
+            "sensor_type": "soil_moisture",
+            "value": round(random.uniform(10, 45), 2),
+            "unit": "%",
+        }
+        for i in range(count)
+    ]
+
+
+async def run(count: int, latency: float):
+    service = FirestoreService(client=FakeAsyncClient(latency=latency))
+
+    sample = make_readings(min(count, 500))
+    started = time.perf_counter()
+    for reading in sample:
+        await service.save_sensor_data("farm-1", reading)
+    single_rate = len(sample) / (time.perf_counter() - started)
+
+    readings = make_readings(count)
+    started = time.perf_counter()
+    result = await service.save_sensor_data_bulk("farm-1", readings)
+    bulk_rate = count / (time.perf_counter() - started)
+
+    print(f"round trip latency:   {latency * 1000:.0f} ms")
+    print(f"save_sensor_data:     {single_rate:10,.0f} readings/s")
+    print(f"save_sensor_data_bulk:{bulk_rate:10,.0f} readings/s "
+          f"({result['batches']} batches, {service.batch_size}/batch)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readings", type=int, default=50_000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run(args.readings, args.latency))
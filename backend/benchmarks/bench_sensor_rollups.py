@@ -0,0 +1,130 @@
+"""
+Benchmark: sensor range queries, raw readings vs rollups
+Reports documents read and latency for a 30-day dashboard query as history grows.
+Documents read is the figure that maps to Firestore cost and latency; the fake client
+filters every query in Python, so its wall-clock times grow with collection size.
+First checks that retrying a rollup commit whose acknowledgement was lost doesn't count twice, and
+that a backfill repeated after new readings arrive runs again.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from services.firestore import FirestoreService
+from services.jobs import TERMINAL_STATUSES
+from services.sensor_rollups import aggregate_readings
+from benchmarks.fake_firestore import FakeAsyncClient
+
+
+async def check_lost_acks() -> bool:
+    """Rollup counts stay exact when every batch commit is applied but reported as timed out once."""
+    client = FakeAsyncClient()
+    service = FirestoreService(client=client)
+    now = datetime.utcnow()
+    readings = [
+        {"sensor_id": f"probe-{i % 3}", "value": 20.0, "timestamp": now - timedelta(minutes=i)}
+        for i in range(5000)
+    ]
+    aggregates = aggregate_readings(readings)
+    batches = -(-len(aggregates) // (service.batch_size - 1))
+    client.lost_acks = batches
+    await service.apply_sensor_rollups("farm-1", aggregates)
+
+    counted = sum(doc["count"] for doc in client._data["sensor_rollups"].values() if doc["resolution"] == "1d")
+    ok = counted == len(readings)
+    print(f"lost commit acknowledgements ({batches} batches): {counted} of {len(readings)} readings in the "
+          f"daily rollups -> {'OK' if ok else 'FAIL'}\n")
+    return ok
+
+
+def check_repeat_backfill(workdir: str) -> bool:
+    """Two backfills through the API separated by a new reading both run."""
+    # Must be set before the app is imported
+    os.environ.update(
+        GOOGLE_API_KEY="rollup-check",
+        STORAGE_BACKEND="sqlite",
+        SQLITE_STORAGE_PATH=os.path.join(workdir, "storage.db"),
+        JOB_BACKEND="memory",
+    )
+    from api import routes
+
+    async def backfill() -> dict:
+        job = await routes.backfill_sensor_rollups("farm-1")
+        while job["status"] not in TERMINAL_STATUSES:
+            await asyncio.sleep(0.01)
+            job = await routes.job_queue.get(job["id"])
+        return job
+
+    async def run():
+        await routes.job_queue.start()
+        try:
+            db = routes.get_db()
+            now = datetime.utcnow()
+            await db.save_sensor_data_bulk("farm-1", [{"sensor_id": "probe-0", "value": 20.0, "timestamp": now}])
+            first = await backfill()
+            await db.save_sensor_data_bulk("farm-1", [{"sensor_id": "probe-1", "value": 21.0, "timestamp": now}])
+            second = await backfill()
+            return first, second
+        finally:
+            await routes.job_queue.stop()
+
+    first, second = asyncio.run(run())
+    readings = (second.get("result") or {}).get("readings")
+    ok = first["id"] != second["id"] and readings == 2
+    print(f"backfill repeated after a new reading: {'new' if first['id'] != second['id'] else 'same'} job, "
+          f"{readings} of 2 readings rolled up -> {'OK' if ok else 'FAIL'}\n")
+    return ok
+
+
+async def run(history_days, sensors: int, query_days: int):
+    now = datetime.utcnow()
+    print(f"{'history':>8} {'raw docs':>9} {'raw ms':>8} {'rollup docs':>12} {'rollup ms':>10}")
+
+    for days in history_days:
+        client = FakeAsyncClient()
+        service = FirestoreService(client=client)
+        readings = [
+            {
+                "sensor_id": f"probe-{s}",
+                "sensor_type": "soil_moisture",
+                "value": random.uniform(10, 45),
+                "timestamp": now - timedelta(minutes=5 * i),
+            }
+            for i in range(days * 288)
+            for s in range(sensors)
+        ]
+        await service.save_sensor_data_bulk("farm-1", readings)
+
+        client.reads = 0
+        started = time.perf_counter()
+        raw = await service.get_sensor_data("farm-1", hours=query_days * 24)
+        raw_ms = (time.perf_counter() - started) * 1000
+        raw_reads = client.reads
+
+        client.reads = 0
+        started = time.perf_counter()
+        series = await service.get_sensor_series("farm-1", "probe-0", now - timedelta(days=query_days), now)
+        rollup_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{days:>7}d {raw_reads:>9,} {raw_ms:>8.1f} {client.reads:>12,} {rollup_ms:>10.1f}"
+              f"   ({series['resolution']}, {len(raw):,} raw rows)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history-days", type=int, nargs="+", default=[30, 90, 180])
+    parser.add_argument("--sensors", type=int, default=2)
+    parser.add_argument("--query-days", type=int, default=30)
+    args = parser.parse_args()
+    if not asyncio.run(check_lost_acks()):
+        sys.exit(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        if not check_repeat_backfill(workdir):
+            sys.exit(1)
+    asyncio.run(run(args.history_days, args.sensors, args.query_days))
@@ -0,0 +1,156 @@
+"""
+Benchmark: Firestore vs embedded SQLite storage on identical workloads
+Runs the same ingest and dashboard queries against both StorageBackend implementations.
+The Firestore side uses the in-process fake with a simulated round-trip latency, so its
+numbers model network cost rather than real Firestore server time.
+First checks on both backends that a token usage flush retried after a lost acknowledgement counts once.
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from services.firestore import FirestoreService
+from services.sqlite_storage import SQLiteStorage
+from services.usage import TokenAccountant, today, usage_scope
+from benchmarks.fake_firestore import FakeAsyncClient
+
+
+class LostAck:
+    """Storage whose first add_token_usage is applied but then reported as failed."""
+
+    def __init__(self, db):
+        self.db = db
+        self.lost = False
+
+    async def add_token_usage(self, rows, flush_id=None):
+        result = await self.db.add_token_usage(rows, flush_id=flush_id)
+        if not self.lost:
+            self.lost = True
+            raise ConnectionError("acknowledgement lost")
+        return result
+
+    def __getattr__(self, name: str):
+        return getattr(self.db, name)
+
+
+async def check_usage_flush(name: str, db) -> bool:
+    accountant = TokenAccountant(flush_interval=3600, farm_budget=0, farm_budgets={}, key_budget=0)
+    storage = LostAck(db)
+    accountant.storage_factory = lambda: storage
+    usage = type("Usage", (), {"prompt_token_count": 100, "candidates_token_count": 10})()
+    # More rows than one Firestore batch holds
+    for i in range(1200):
+        scope = usage_scope.set((f"endpoint-{i}", "farm-usage"))
+        accountant.record("gemini-test", usage)
+        usage_scope.reset(scope)
+
+    first, retried = await accountant.flush(), await accountant.flush()
+    stored = sum(row["calls"] for row in await db.get_token_usage(today(), "farm-usage"))
+    ok = not first and retried and stored == 1200
+    print(f"{name}: usage flush retried after a lost acknowledgement -> {stored} of 1200 calls stored "
+          f"{'OK' if ok else 'FAIL'}")
+    return ok
+
+
+async def _timed(fn, repeat: int = 1) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+async def workload(db, readings: int, farms: int):
+    """Return {operation: milliseconds} for one backend."""
+    now = datetime.utcnow()
+    rng = random.Random(7)
+    results = {}
+
+    async def seed_farms():
+        for i in range(farms):
+            await db.create_farm(f"farm-{i}", {"name": f"Fazenda {i}", "user_id": "u1"})
+            await db.add_crop(f"farm-{i}", {"crop_type": "soja", "area_ha": 120})
+
+    batch = [
+        {
+            "sensor_id": f"probe-{i % 10}",
+            "sensor_type": "soil_moisture" if i % 2 else "air_temperature",
+            "value": rng.uniform(10, 40),
+            "timestamp": now - timedelta(seconds=30 * i),
+        }
+        for i in range(readings)
+    ]
+
+    async def ingest():
+        await db.save_sensor_data_bulk("farm-0", batch)
+
+    async def alerts_and_analyses():
+        for i in range(200):
+            await db.create_alert("farm-0", {"title": f"alert {i}", "severity": "low"})
+            await db.save_analysis("crop" if i % 2 else "climate", {"farm_id": "farm-0", "score": i})
+
+    results["create farms + crops"] = await _timed(seed_farms)
+    results[f"bulk ingest {readings} readings"] = await _timed(ingest)
+    results["200 alerts + 200 analyses"] = await _timed(alerts_and_analyses)
+
+    results["get_farm"] = await _timed(lambda: db.get_farm("farm-1"), repeat=50)
+    results["get_crops"] = await _timed(lambda: db.get_crops("farm-1"), repeat=50)
+    results["get_analyses(type, 50)"] = await _timed(lambda: db.get_analyses("farm-0", "crop"), repeat=20)
+    results["get_alerts(unread, 100)"] = await _timed(lambda: db.get_alerts("farm-0", unread_only=True), repeat=20)
+    results["get_sensor_data(1h)"] = await _timed(
+        lambda: db.get_sensor_data("farm-0", "soil_moisture", hours=1), repeat=10
+    )
+    results["get_sensor_data_page(24h, 50)"] = await _timed(
+        lambda: db.get_sensor_data_page("farm-0", hours=24, limit=50), repeat=20
+    )
+    results["get_sensor_series(7d)"] = await _timed(
+        lambda: db.get_sensor_series("farm-0", "probe-3", now - timedelta(days=7), now), repeat=20
+    )
+    return results
+
+
+async def run(readings: int, farms: int, latency: float):
+    with tempfile.TemporaryDirectory() as workdir:
+        sqlite = SQLiteStorage(path=os.path.join(workdir, "usage.db"))
+        checks = [
+            await check_usage_flush("firestore", FirestoreService(client=FakeAsyncClient())),
+            await check_usage_flush("sqlite", sqlite),
+        ]
+        sqlite.close()
+    if not all(checks):
+        sys.exit(1)
+    print()
+
+    firestore = FirestoreService(client=FakeAsyncClient(latency=latency))
+    # Compare storage paths, not the read cache in front of Firestore
+    firestore.cache.ttl = 0
+    firestore_ms = await workload(firestore, readings, farms)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        sqlite = SQLiteStorage(path=os.path.join(workdir, "bench.db"))
+        sqlite_ms = await workload(sqlite, readings, farms)
+        sqlite.close()
+
+    print(f"Firestore fake at {latency * 1000:.0f} ms/round trip vs SQLite (WAL, file-backed)")
+    print(f"{'operation':<34} {'firestore ms':>13} {'sqlite ms':>10} {'speedup':>8}")
+    for name, fs in firestore_ms.items():
+        sq = sqlite_ms[name]
+        print(f"{name:<34} {fs:>13.2f} {sq:>10.2f} {fs / sq if sq else 0:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readings", type=int, default=20000)
+    parser.add_argument("--farms", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per Firestore round trip")
+    args = parser.parse_args()
+    asyncio.run(run(args.readings, args.farms, args.latency))
+
+
+if __name__ == "__main__":
+    main()
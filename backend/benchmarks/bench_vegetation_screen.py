@@ -0,0 +1,69 @@
+"""
+Benchmark: vegetation index pre-screen
+Measures single-core throughput of the NumPy pre-screen and its verdicts on synthetic scenes.
+Exits non-zero if a scene that needs the model (lesions, fully necrotic foliage) is screened out.
+"""
+
+import sys
+import time
+import argparse
+
+from PIL import Image, ImageDraw
+
+from services.vegetation_screen import screen
+
+
+def make_scene(kind: str, width: int, height: int) -> Image.Image:
+    """Synthetic canopy, soil, pavement, diseased-leaf and blighted (uniformly brown) foliage scenes."""
+    base = {
+        "canopy": (46, 128, 52),
+        "soil": (122, 92, 64),
+        "pavement": (128, 126, 122),
+        "lesions": (58, 120, 50),
+        "necrotic": (120, 70, 30),
+    }[kind]
+    img = Image.new("RGB", (width, height), base)
+    noise = Image.effect_noise((width, height), 24).convert("RGB")
+    img = Image.blend(img, noise, 0.15)
+
+    if kind == "lesions":
+        draw = ImageDraw.Draw(img)
+        for i in range(40):
+            x, y = (i * 97) % width, (i * 53) % height
+            color = (205, 190, 50) if i % 2 else (110, 70, 35)
+            draw.ellipse((x, y, x + width // 12, y + height // 12), fill=color)
+    return img
+
+
+# Scenes that must reach the model: a local verdict would be a false all-clear
+NEEDS_MODEL = ("lesions", "necrotic")
+
+
+def run(count: int, width: int, height: int) -> list:
+    """Print verdicts and throughput per scene; returns the scenes wrongly answered locally."""
+    screened_out = []
+    for kind in ("canopy", "soil", "pavement", "lesions", "necrotic"):
+        img = make_scene(kind, width, height)
+        started = time.perf_counter()
+        for _ in range(count):
+            result = screen(img)
+        elapsed = time.perf_counter() - started
+        print(f"{kind:8s} verdict={result['verdict']:9s} coverage={result['vegetation_coverage']:.2f} "
+              f"chlorosis={result['chlorosis_fraction']:.3f} necrosis={result['necrosis_fraction']:.3f} "
+              f"-> {count / elapsed:,.0f} images/s/core")
+        if kind in NEEDS_MODEL and result["verdict"] != "ambiguous":
+            screened_out.append(f"{kind}: {result['verdict']}")
+    return screened_out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--width", type=int, default=256)
+    parser.add_argument("--height", type=int, default=192)
+    args = parser.parse_args()
+    failures = run(args.count, args.width, args.height)
+    for failure in failures:
+        print(f"FAIL: screened out without the model: {failure}")
+    if failures:
+        sys.exit(1)
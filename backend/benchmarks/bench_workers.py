@@ -0,0 +1,170 @@
+"""
+Benchmark: gunicorn worker processes — memory per worker and throughput scaling
+Starts the production server (gunicorn.conf.py, SQLite storage) with 1..N workers, with and without
+preload, drives it from separate client processes and reads RSS/PSS/private memory from /proc.
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from typing import Dict, List
+
+import aiohttp
+
+FARM_ID = "bench-farm"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, preload: bool, port: int, workdir: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_PRELOAD="true" if preload else "false",
+        GUNICORN_MAX_REQUESTS=os.getenv("GUNICORN_MAX_REQUESTS", "0"),
+        GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "bench"),
+        STORAGE_BACKEND="sqlite",
+        SQLITE_STORAGE_PATH=os.path.join(workdir, "storage.db"),
+        JOB_SQLITE_PATH=os.path.join(workdir, "jobs.db"),
+        SENSOR_BUFFER_SHARED_DIR=os.path.join(workdir, "sensors"),
+        SENSOR_ARCHIVE_PATH=os.path.join(workdir, "archive"),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "api.main:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                if len(worker_pids(server.pid)) == workers:
+                    return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def worker_pids(master: int) -> List[int]:
+    pids = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == master:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return pids
+
+
+def memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS (shared pages split between sharers) and private memory in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0].endswith(":") and len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def seed(port: int, readings: int):
+    now = time.time()
+    body = "\n".join(
+        json.dumps({"sensor_id": f"probe-{i % 50}", "sensor_type": "soil_moisture", "value": 20 + i % 17, "timestamp": now - i})
+        for i in range(readings)
+    )
+
+    async def post():
+        async with aiohttp.ClientSession() as session:
+            url = f"http://127.0.0.1:{port}/api/sensors/{FARM_ID}/readings/bulk"
+            async with session.post(url, data=body, headers={"Content-Type": "application/x-ndjson"}) as resp:
+                assert resp.status == 200, await resp.text()
+
+    asyncio.run(post())
+
+
+def client(port: int, path: str, seconds: float, concurrency: int, counts):
+    async def run():
+        done = 0
+        deadline = time.time() + seconds
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            async def loop():
+                nonlocal done
+                while time.time() < deadline:
+                    async with session.get(f"http://127.0.0.1:{port}{path}") as resp:
+                        await resp.read()
+                        assert resp.status == 200
+                    done += 1
+            await asyncio.gather(*(loop() for _ in range(concurrency)))
+        return done
+
+    counts.put(asyncio.run(run()))
+
+
+def throughput(port: int, path: str, seconds: float, clients: int, concurrency: int) -> float:
+    counts = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=client, args=(port, path, seconds, concurrency, counts))
+        for _ in range(clients)
+    ]
+    for proc in procs:
+        proc.start()
+    total = sum(counts.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=16, help="connections per client")
+    parser.add_argument("--readings", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"CPUs available: {len(os.sched_getaffinity(0))} (throughput can only scale up to this)")
+    paths = {"health": "/health", "live summary": f"/api/sensors/{FARM_ID}/live"}
+    print(f"{'workers':>7} {'preload':>7} {'RSS/wkr MB':>10} {'PSS/wkr MB':>10} {'priv/wkr MB':>11} "
+          + " ".join(f"{name + ' req/s':>18}" for name in paths))
+
+    for workers in (int(n) for n in args.workers.split(",")):
+        for preload in (True, False):
+            with tempfile.TemporaryDirectory() as workdir:
+                port = free_port()
+                server = start_server(workers, preload, port, workdir)
+                try:
+                    seed(port, args.readings)
+                    rates = [throughput(port, path, args.seconds, args.clients, args.concurrency) for path in paths.values()]
+                    stats = [memory(pid) for pid in worker_pids(server.pid)]
+                finally:
+                    server.terminate()
+                    server.wait(timeout=60)
+
+            avg = {key: sum(s[key] for s in stats) / len(stats) for key in ("rss", "pss", "private")}
+            print(f"{workers:>7} {str(preload):>7} {avg['rss']:>10.1f} {avg['pss']:>10.1f} {avg['private']:>11.1f} "
+                  + " ".join(f"{rate:>18.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
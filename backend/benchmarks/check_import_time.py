@@ -0,0 +1,67 @@
+"""
+Check: cold import time of the API
+Imports api.main in a fresh interpreter with -X importtime, prints the slowest modules and exits
+non-zero if the import exceeds the budget or pulls in an SDK that should only load on first use.
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Loaded on first agent request / by the storage backend in use, never at import
+LAZY_MODULES = ("google.genai", "google.cloud.firestore", "aiohttp")
+
+
+def profile(target: str, modules) -> tuple:
+    """Import the target cold; returns (seconds, [(cumulative_us, self_us, module)], loaded lazy modules)."""
+    env = dict(os.environ, GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "import-check"))
+    probe = f"import sys, {target}; print(','.join(m for m in {tuple(modules)!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, env=env, check=True
+    )
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), module.strip()))
+
+    total = next(cumulative for cumulative, _, module in rows if module == target)
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return total / 1e6, rows, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--target", default="api.main")
+    parser.add_argument("--budget", type=float, default=float(os.getenv("IMPORT_TIME_BUDGET_SECONDS", 2.5)))
+    parser.add_argument("--runs", type=int, default=3, help="report the fastest of N cold imports")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [profile(args.target, LAZY_MODULES) for _ in range(args.runs)]
+    seconds, rows, loaded = min(runs, key=lambda run: run[0])
+
+    print(f"{'self ms':>9} {'cumulative ms':>14}  module")
+    for cumulative, self_us, module in sorted(rows, reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>9.1f} {cumulative / 1000:>14.1f}  {module}")
+
+    print(f"\ncold import of {args.target}: {seconds:.2f}s (budget {args.budget:.2f}s, best of {args.runs})")
+    failures = []
+    if seconds > args.budget:
+        failures.append(f"import took {seconds:.2f}s, over the {args.budget:.2f}s budget")
+    if loaded:
+        failures.append(f"imported at startup but should load on first use: {', '.join(loaded)}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+In-process fake of the async Firestore client
+Implements the subset of AsyncClient used by FirestoreService, with a configurable
+per-round-trip latency so concurrency behavior can be measured without the emulator.
+"""
+
+import uuid
+import asyncio
+import operator
+from typing import Dict, Any, List, Optional
+
+from google.api_core import exceptions as gcp_exceptions
+
+
+_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, reference: "FakeDocumentReference", data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+        self.update_time = reference._client._versions.get((reference._collection, reference.id))
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return self._data.get(field)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeAsyncClient", collection: str, doc_id: Optional[str] = None):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id or uuid.uuid4().hex[:20]
+
+    @property
+    def _docs(self) -> Dict[str, Dict[str, Any]]:
+        return self._client._data.setdefault(self._collection, {})
+
+    async def set(self, data: Dict[str, Any], merge: bool = False):
+        await self._client._round_trip()
+        self._client._apply_set(self, data, merge)
+
+    async def update(self, updates: Dict[str, Any]):
+        await self._client._round_trip()
+        if self.id not in self._docs:
+            raise KeyError(f"No document to update: {self._collection}/{self.id}")
+        self._client._apply_set(self, updates, merge=True, deep=False)
+
+    async def get(self, **kwargs) -> FakeSnapshot:
+        await self._client._round_trip()
+        self._client.reads += 1
+        return FakeSnapshot(self, self._docs.get(self.id))
+
+    async def delete(self):
+        await self._client._round_trip()
+        self._docs.pop(self.id, None)
+
+
+class FakeQuery:
+    def __init__(self, client: "FakeAsyncClient", collection: str):
+        self._client = client
+        self._collection = collection
+        self._filters: List[tuple] = []
+        self._orders: List[tuple] = []
+        self._limit: Optional[int] = None
+        self._fields: Optional[List[str]] = None
+        self._start_after: Optional[list] = None
+
+    def _copy(self) -> "FakeQuery":
+        query = FakeQuery(self._client, self._collection)
+        query._filters = list(self._filters)
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._fields = self._fields
+        query._start_after = self._start_after
+        return query
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        query = self._copy()
+        query._filters.append((field, _OPS[op], value))
+        return query
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        query = self._copy()
+        query._orders.append((field, direction == "DESCENDING"))
+        return query
+
+    def limit(self, count: int) -> "FakeQuery":
+        query = self._copy()
+        query._limit = count
+        return query
+
+    def select(self, fields: List[str]) -> "FakeQuery":
+        query = self._copy()
+        query._fields = list(fields)
+        return query
+
+    def start_after(self, values) -> "FakeQuery":
+        query = self._copy()
+        query._start_after = list(values)
+        return query
+
+    def _sort_key(self, doc_id: str, data: Dict[str, Any]) -> list:
+        return [doc_id if field == "__name__" else data.get(field) for field, _ in self._orders]
+
+    def _matches(self) -> List[tuple]:
+        docs = self._client._data.get(self._collection, {})
+        rows = [
+            (doc_id, data) for doc_id, data in docs.items()
+            if all(field in data and op(data[field], value) for field, op, value in self._filters)
+        ]
+        for index in reversed(range(len(self._orders))):
+            field, descending = self._orders[index]
+            rows.sort(
+                key=lambda row: row[0] if field == "__name__" else row[1].get(field),
+                reverse=descending
+            )
+
+        if self._start_after is not None:
+            cursor = [getattr(v, "id", v) for v in self._start_after]
+
+            def after(row) -> bool:
+                for (field, descending), key, bound in zip(self._orders, self._sort_key(*row), cursor):
+                    if key != bound:
+                        return key < bound if descending else key > bound
+                return False
+
+            rows = [row for row in rows if after(row)]
+
+        return rows[:self._limit] if self._limit is not None else rows
+
+    async def stream(self, **kwargs):
+        await self._client._round_trip()
+        for doc_id, data in self._matches():
+            self._client.reads += 1
+            if self._fields is not None:
+                data = {k: v for k, v in data.items() if k in self._fields}
+            yield FakeSnapshot(FakeDocumentReference(self._client, self._collection, doc_id), data)
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id: Optional[str] = None) -> FakeDocumentReference:
+        return FakeDocumentReference(self._client, self._collection, doc_id)
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeAsyncClient"):
+        self._client = client
+        self._writes: List[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False):
+        self._writes.append((reference, data, merge, None))
+
+    def update(self, reference: FakeDocumentReference, updates: Dict[str, Any], option: Any = None):
+        self._writes.append((reference, updates, True, option or FakeWriteOption(exists=True)))
+
+    def create(self, reference: FakeDocumentReference, data: Dict[str, Any]):
+        self._writes.append((reference, data, False, FakeWriteOption(exists=False)))
+
+    async def commit(self):
+        await self._client._round_trip()
+        for reference, _, _, option in self._writes:
+            if option is not None:
+                option.check(self._client, reference)
+        for reference, data, merge, option in self._writes:
+            self._client._apply_set(reference, data, merge, deep=option is None)
+        self._client.commits += 1
+        if self._client.lost_acks:
+            # Applied, but the caller sees a timeout (as when the response is lost)
+            self._client.lost_acks -= 1
+            raise gcp_exceptions.DeadlineExceeded("Commit acknowledgement lost")
+
+
+class FakeWriteOption:
+    """Precondition of a batched write: the document exists (or, for create, doesn't), at a given version if set."""
+
+    def __init__(self, last_update_time: Any = None, exists: bool = True):
+        self.last_update_time = last_update_time
+        self.exists = exists
+
+    def check(self, client: "FakeAsyncClient", reference: FakeDocumentReference):
+        version = client._versions.get((reference._collection, reference.id))
+        if self.exists and reference.id not in reference._docs:
+            raise gcp_exceptions.NotFound(f"No document to update: {reference._collection}/{reference.id}")
+        if not self.exists and reference.id in reference._docs:
+            raise gcp_exceptions.AlreadyExists(f"Document exists: {reference._collection}/{reference.id}")
+        if self.last_update_time is not None and version != self.last_update_time:
+            raise gcp_exceptions.FailedPrecondition(f"Document changed: {reference._collection}/{reference.id}")
+
+
+class FakeAsyncClient:
+    """Dict-backed stand-in for google.cloud.firestore.AsyncClient."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # (collection, doc_id) -> write counter, exposed as snapshot.update_time
+        self._versions: Dict[tuple, int] = {}
+        self.round_trips = 0
+        self.reads = 0
+        self.commits = 0
+        # Number of upcoming batch commits that are applied but then fail with DeadlineExceeded
+        self.lost_acks = 0
+
+    async def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _apply_set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool, deep: bool = True):
+        """Apply a set/update; merge=True with deep=True merges nested maps like set(merge=True)."""
+        docs = self._data.setdefault(reference._collection, {})
+        current = dict(docs.get(reference.id, {})) if merge else {}
+        self._apply_fields(current, data, deep=merge and deep)
+        docs[reference.id] = current
+        key = (reference._collection, reference.id)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _apply_fields(self, current: Dict[str, Any], data: Dict[str, Any], deep: bool):
+        for path, value in data.items():
+            target = current
+            *parents, leaf = path.split(".")
+            for part in parents:
+                target = target.setdefault(part, {})
+            transform = type(value).__name__
+            if transform == "Increment":
+                target[leaf] = target.get(leaf, 0) + value.value
+            elif transform == "Maximum":
+                target[leaf] = max(target[leaf], value.value) if leaf in target else value.value
+            elif transform == "Minimum":
+                target[leaf] = min(target[leaf], value.value) if leaf in target else value.value
+            elif deep and isinstance(value, dict):
+                target[leaf] = dict(target.get(leaf) or {})
+                self._apply_fields(target[leaf], value, deep)
+            else:
+                target[leaf] = value
+
+    def write_option(self, **kwargs) -> FakeWriteOption:
+        return FakeWriteOption(**kwargs)
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    async def get_all(self, references: List[FakeDocumentReference], **kwargs):
+        await self._round_trip()
+        for reference in references:
+            self.reads += 1
+            yield FakeSnapshot(reference, reference._docs.get(reference.id))
+
+    def close(self):
+        pass
@@ -0,0 +1,252 @@
+"""
+Local stand-in for the Gemini API
+Serves generateContent and streamGenerateContent (SSE) with configurable latency distributions,
+error rates and token counts. Point the agents at it with GEMINI_BASE_URL=http://127.0.0.1:<port>.
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from aiohttp import web
+
+ERROR_STATUSES = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution (seconds).
+
+    fixed:0.5, uniform:0.2,1.0, exponential:0.6 (mean) or lognormal:0.8,0.5 (median, sigma).
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Invalid latency distribution: {spec!r}")
+
+
+def parse_range(spec: str) -> Tuple[int, int]:
+    """"300" or "200,800" (uniform) token counts."""
+    values = [int(value) for value in spec.split(",")]
+    return values[0], values[-1]
+
+
+class FakeGemini:
+    """Request handler state: response shaping settings, a seeded RNG and served-request counters."""
+
+    def __init__(
+        self,
+        latency: str = "lognormal:0.8,0.5",
+        ttft_ratio: float = 0.25,
+        chunks: int = 8,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        output_tokens: str = "200,600",
+        cached_ratio: float = 0.0,
+        max_concurrency: int = 0,
+        seed: Optional[int] = None
+    ):
+        self.latency = parse_distribution(latency)
+        self.ttft_ratio = ttft_ratio
+        self.chunks = max(chunks, 1)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.output_tokens = parse_range(output_tokens)
+        self.cached_ratio = cached_ratio
+        self.rng = random.Random(seed)
+        # Requests served at once, like a per-key concurrency quota; the rest queue (0 = unlimited)
+        self.slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
+        self.requests = 0
+        self.streams = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.input_tokens = 0
+        self.output_tokens_sent = 0
+
+    def _usage(self, body: bytes, output_tokens: int) -> Dict[str, Any]:
+        # About four bytes of request JSON per prompt token
+        prompt_tokens = max(len(body) // 4, 1)
+        self.input_tokens += prompt_tokens
+        self.output_tokens_sent += output_tokens
+        usage = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": output_tokens,
+            "totalTokenCount": prompt_tokens + output_tokens,
+        }
+        cached = int(prompt_tokens * self.cached_ratio)
+        if cached:
+            usage["cachedContentTokenCount"] = cached
+        return usage
+
+    @staticmethod
+    def _text(tokens: int) -> str:
+        # About 0.75 words per token
+        return " ".join(f"palavra{i % 97}" for i in range(max(int(tokens * 0.75), 1)))
+
+    @staticmethod
+    def _response(model: str, text: str, usage: Dict[str, Any], finished: bool) -> Dict[str, Any]:
+        candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate], "usageMetadata": usage, "modelVersion": model}
+
+    def _error(self) -> Optional[web.Response]:
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            status = self.error_status
+            return web.json_response(
+                {"error": {"code": status, "message": "Injected by the fake Gemini server", "status": ERROR_STATUSES.get(status, "UNKNOWN")}},
+                status=status
+            )
+        return None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        try:
+            if self.slots is None:
+                return await self._handle(request)
+            async with self.slots:
+                return await self._handle(request)
+        except asyncio.CancelledError:
+            # The client closed the connection (the server runs with handler_cancellation)
+            self.cancelled += 1
+            raise
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        model, _, method = request.match_info["target"].partition(":")
+        body = await request.read()
+        self.requests += 1
+        total = self.latency(self.rng)
+        output_tokens = self.rng.randint(*self.output_tokens)
+
+        if method == "generateContent":
+            await asyncio.sleep(total)
+            error = self._error()
+            if error is not None:
+                return error
+            return web.json_response(
+                self._response(model, self._text(output_tokens), self._usage(body, output_tokens), finished=True)
+            )
+        if method != "streamGenerateContent":
+            return web.json_response({"error": {"code": 404, "message": f"Unsupported method {method}"}}, status=404)
+
+        self.streams += 1
+        first = total * self.ttft_ratio
+        await asyncio.sleep(first)
+        error = self._error()
+        if error is not None:
+            return error
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        interval = (total - first) / max(self.chunks - 1, 1)
+        sent = 0
+        for i in range(self.chunks):
+            if i:
+                await asyncio.sleep(interval)
+            # Usage totals grow chunk by chunk, like the real API; the last chunk has the final counts
+            tokens = output_tokens * (i + 1) // self.chunks - sent
+            sent += tokens
+            finished = i == self.chunks - 1
+            usage = self._usage(body, output_tokens) if finished else {"candidatesTokenCount": sent}
+            chunk = self._response(model, self._text(tokens), usage, finished)
+            await response.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+        await response.write_eof()
+        return response
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "requests": self.requests,
+            "streams": self.streams,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens_sent,
+        })
+
+
+def create_app(fake: FakeGemini) -> web.Application:
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/{version}/models/{target}", fake.handle)
+    app.router.add_get("/stats", fake.stats)
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Options shared by this server and the load scenarios that start it."""
+    parser.add_argument("--latency", default="lognormal:0.8,0.5", help="fixed:S | uniform:A,B | exponential:MEAN | lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--ttft-ratio", type=float, default=0.25, help="streams: first chunk at this fraction of the latency")
+    parser.add_argument("--chunks", type=int, default=8, help="streams: chunks per response")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503, choices=sorted(ERROR_STATUSES))
+    parser.add_argument("--output-tokens", default="200,600", help="N or MIN,MAX")
+    parser.add_argument("--cached-ratio", type=float, default=0.0, help="share of prompt tokens reported as cached")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="requests served at once, the rest queue (0 = unlimited)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def command(port: int, args: argparse.Namespace) -> list:
+    """Command line that runs this server with the options parsed by add_arguments."""
+    cmd = [
+        sys.executable, "-m", "benchmarks.fake_gemini", "--port", str(port),
+        "--latency", args.latency, "--ttft-ratio", str(args.ttft_ratio), "--chunks", str(args.chunks),
+        "--error-rate", str(args.error_rate), "--error-status", str(args.error_status),
+        "--output-tokens", args.output_tokens, "--cached-ratio", str(args.cached_ratio),
+        "--max-concurrency", str(args.max_concurrency),
+    ]
+    if args.seed is not None:
+        cmd += ["--seed", str(args.seed)]
+    return cmd
+
+
+def start(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    """Run the server in a separate process (so it does not compete with the client's event loop)."""
+    server = subprocess.Popen(command(port, args), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("fake Gemini server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = FakeGemini(
+        latency=args.latency,
+        ttft_ratio=args.ttft_ratio,
+        chunks=args.chunks,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        output_tokens=args.output_tokens,
+        cached_ratio=args.cached_ratio,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed
+    )
+    web.run_app(create_app(fake), host=args.host, port=args.port, print=None, access_log=None, handler_cancellation=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Replay: recorded API traffic against the app, offline, with model calls served from the cassette
+Reads the requests a server recorded with LLM_CASSETTE_MODE=record, sends them through the ASGI app
+in-process (no sockets, no Gemini) at full speed or at the recorded pace, and reports throughput,
+latency, status mismatches and, with --profile, the functions that used the most CPU.
+"""
+
+import os
+import sys
+import time
+import pstats
+import asyncio
+import argparse
+import cProfile
+import tempfile
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+
+
+async def call(app, record: Dict[str, Any], body: bytes) -> int:
+    """Run one recorded request through the ASGI app; returns the response status."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": record["method"],
+        "scheme": "http",
+        "path": record["path"],
+        "raw_path": record["path"].encode(),
+        "query_string": record["query"].encode("latin-1"),
+        "root_path": "",
+        "headers": [(b"host", b"replay")] + [
+            (name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]
+        ],
+        "client": ("127.0.0.1", 1234),
+        "server": ("replay", 80),
+    }
+    status = 0
+    body_done = asyncio.Event()
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await body_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            body_done.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def replay(app, records: List[Tuple[Dict[str, Any], bytes]], concurrency: int, pace: float) -> Dict[str, Any]:
+    """Send the records in recorded order; pace 0 = as fast as possible, 1 = original arrival times."""
+    latencies: List[float] = []
+    mismatches: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+    first_at = records[0][0]["at"] if records else 0.0
+
+    async def send_one(record: Dict[str, Any], body: bytes):
+        async with semaphore:
+            started = time.perf_counter()
+            status = await call(app, record, body)
+            latencies.append(time.perf_counter() - started)
+            if status != record["status"]:
+                mismatches[(record["method"], record["path"], record["status"], status)] += 1
+
+    started = time.perf_counter()
+    tasks = []
+    for record, body in records:
+        if pace > 0:
+            await asyncio.sleep(max((record["at"] - first_at) * pace - (time.perf_counter() - started), 0))
+        tasks.append(asyncio.create_task(send_one(record, body)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        "p99_ms": latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000 if latencies else 0.0,
+        "mismatches": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("cassette", help="cassette file written with LLM_CASSETTE_MODE=record")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--pace", type=float, default=0, help="0 = full speed, 1 = recorded arrival times")
+    parser.add_argument("--latency-scale", type=float, default=0, help="model latency: 0 = none, 1 = as recorded")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N requests")
+    parser.add_argument("--profile", action="store_true", help="profile the replay with cProfile")
+    parser.add_argument("--top", type=int, default=30, help="functions to list with --profile")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Must be set before the app (and its cassette) is imported
+        os.environ.update(
+            LLM_CASSETTE_MODE="replay",
+            LLM_CASSETTE_PATH=os.path.abspath(args.cassette),
+            LLM_REPLAY_LATENCY_SCALE=str(args.latency_scale),
+            GOOGLE_API_KEY=os.getenv("GOOGLE_API_KEY", "replay"),
+            STORAGE_BACKEND="sqlite",
+            SQLITE_STORAGE_PATH=os.path.join(workdir, "storage.db"),
+            JOB_SQLITE_PATH=os.path.join(workdir, "jobs.db"),
+            SENSOR_ARCHIVE_PATH=os.path.join(workdir, "archive"),
+            ANALYSIS_SPOOL_PATH=os.path.join(workdir, "analyses.spool.jsonl"),
+            USAGE_FLUSH_SECONDS="3600",
+        )
+        from api.main import app
+        from api.routes import warm_up_agents
+        from services.cassette import CASSETTE, KIND_HTTP, decode_body
+
+        records = sorted(CASSETTE.records(KIND_HTTP), key=lambda record: record["at"])
+        if args.limit:
+            records = records[:args.limit]
+        if not records:
+            sys.exit(f"no recorded requests in {args.cassette}")
+        records = [(record, decode_body(record["body"])) for record in records]
+        print(f"{len(records)} recorded requests, {Counter(record['path'] for record, _ in records).most_common(1)[0][0]} most frequent")
+
+        async def run():
+            await app.router.startup()
+            # SDK import and agent construction are one-off costs, not part of the request path
+            warm_up_agents()
+            try:
+                profiler = cProfile.Profile() if args.profile else None
+                if profiler:
+                    profiler.enable()
+                result = await replay(app, records, args.concurrency, args.pace)
+                if profiler:
+                    profiler.disable()
+                return result, profiler
+            finally:
+                await app.router.shutdown()
+
+        result, profiler = asyncio.run(run())
+
+    print(f"\nreplayed {result['requests']} requests in {result['seconds']:.2f}s: {result['rps']:.1f} req/s, "
+          f"p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+    print(f"model calls: {CASSETTE.replayed} replayed, {CASSETTE.misses} not in the cassette")
+    for (method, path, recorded, replayed), count in result["mismatches"].most_common(10):
+        print(f"  status {recorded} -> {replayed}: {method} {path} (x{count})")
+
+    if profiler:
+        print()
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+AgriSmart Brasil - Gunicorn Configuration
+Production server: the app preloaded once, Uvicorn worker processes, graceful restarts and worker recycling.
+"""
+
+import gc
+import os
+import uuid
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8080)}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", _cpu_count()))
+
+# Import the app once in the master; workers fork from it and share its memory copy-on-write
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Replace a worker after this many requests (jittered so workers do not restart together); 0 disables
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Seconds a worker gets to finish in-flight requests after SIGTERM or a restart
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Workers that stop heartbeating for this long are killed and replaced
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+# Heartbeat files on tmpfs; a container's overlay filesystem can stall them
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# Set before the app is imported so every worker of this server inherits them
+os.environ.setdefault("SERVER_INSTANCE_ID", uuid.uuid4().hex)
+if workers > 1:
+    # Any worker may receive the poll for a job another worker queued
+    os.environ.setdefault("JOB_BACKEND", "sqlite")
+    # A write only clears the farm/crop read cache of the worker that made it; without
+    # snapshot listeners to refresh the others, they would serve stale farms until the TTL
+    if os.getenv("FIRESTORE_CACHE_LISTENERS", "false").lower() != "true":
+        os.environ.setdefault("FIRESTORE_CACHE_TTL_SECONDS", "0")
+    if os.path.isdir("/dev/shm"):
+        # One memory-mapped copy of the recent sensor readings instead of one per worker
+        os.environ.setdefault("SENSOR_BUFFER_SHARED_DIR", "/dev/shm/agrismart-sensors")
+        # Per-worker metric snapshots merged by /metrics, so a scrape covers every worker
+        os.environ.setdefault("METRICS_MULTIPROC_DIR", "/dev/shm/agrismart-metrics")
+
+
+def on_starting(server):
+    # Snapshots left by a previous server run would be counted again
+    directory = os.getenv("METRICS_MULTIPROC_DIR")
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+
+def pre_fork(server, worker):
+    # Preloaded objects are long-lived; moving them out of the collector's reach keeps
+    # GC passes in the workers from writing to (and so copying) the shared pages
+    gc.freeze()
@@ -1,8 +1,39 @@
 """
 AgriSmart Brasil Services Package
+Exports are imported on first access, so storage SDKs load only for the backend in use.
 """
 
-from .firestore import FirestoreService
+import importlib
 
-__all__ = ["FirestoreService"]
+# Exported name -> submodule that defines it (None: the export is the submodule itself)
+_EXPORTS = {
+    "StorageBackend": ".storage",
+    "create_storage": ".storage",
+    "FirestoreService": ".firestore",
+    "SQLiteStorage": ".sqlite_storage",
+    "ImagePreprocessor": ".image_preprocessor",
+    "PerceptualHashIndex": ".image_dedup",
+    "ImageFetcher": ".image_fetcher",
+    "BlockedURLError": ".image_fetcher",
+    "JobQueue": ".jobs",
+    "QueueFullError": ".jobs",
+    "AnalysisWriter": ".analysis_writer",
+    "SensorArchive": ".sensor_archive",
+    "RecentSensorReadings": ".sensor_buffer",
+    "crop_batch": None,
+}
 
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_EXPORTS[name] or f".{name}", __name__)
+    value = module if _EXPORTS[name] is None else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,275 @@
+"""
+Analysis Writer
+Write-behind persistence of agent results to the analyses store, in time- or size-triggered batches.
+"""
+
+import os
+import json
+import time
+import fcntl
+import asyncio
+import hashlib
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from .storage import StorageBackend
+
+
+# Request fields longer than this (e.g. base64 images) are stored as a digest
+MAX_STORED_FIELD_CHARS = 2048
+
+
+def compact_request(payload: Any) -> Any:
+    """Replace very long strings in a request payload with their size and digest."""
+    if isinstance(payload, dict):
+        return {key: compact_request(value) for key, value in payload.items()}
+    if isinstance(payload, list):
+        return [compact_request(value) for value in payload]
+    if isinstance(payload, str) and len(payload) > MAX_STORED_FIELD_CHARS:
+        return {"sha256": hashlib.sha256(payload.encode()).hexdigest(), "chars": len(payload)}
+    return payload
+
+
+class AnalysisWriter:
+    """
+    Buffers analyses in memory and saves them in batches from a background task.
+
+    submit() never waits on storage. The buffer is bounded; when it is full new
+    analyses are dropped and counted. A batch that keeps failing, and whatever cannot
+    be written on shutdown, is spooled to a local JSON-lines file and re-queued on the
+    next start. Worker processes share the spool under an exclusive flock; a starting
+    worker claims it whole by renaming it, so no entry is re-queued twice.
+    """
+
+    def __init__(
+        self,
+        storage_factory: Callable[[], StorageBackend],
+        max_queue: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        reuse_max_age: Optional[float] = None,
+        spool_path: Optional[str] = None,
+        max_attempts: Optional[int] = None
+    ):
+        """Initialize the writer from arguments or environment settings."""
+        self.storage_factory = storage_factory
+        self.max_queue = max_queue or int(os.getenv("ANALYSIS_QUEUE_MAX_SIZE", 10000))
+        self.batch_size = batch_size or int(os.getenv("ANALYSIS_BATCH_SIZE", 200))
+        self.flush_interval = flush_interval or float(os.getenv("ANALYSIS_FLUSH_SECONDS", 2))
+        self.reuse_max_age = (
+            reuse_max_age if reuse_max_age is not None
+            else float(os.getenv("ANALYSIS_REUSE_MAX_AGE_SECONDS", 86400))
+        )
+        self.spool_path = spool_path or os.getenv("ANALYSIS_SPOOL_PATH", "agrismart_analyses.spool.jsonl")
+        self.max_attempts = max_attempts or int(os.getenv("ANALYSIS_MAX_ATTEMPTS", 5))
+
+        self._buffer: deque = deque()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._unavailable_until = 0.0
+        # Consecutive failed saves of the batch at the front of the buffer
+        self._attempts = 0
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failures = 0
+        self.spooled = 0
+        self.lookups = 0
+        self.lookup_hits = 0
+
+    @staticmethod
+    def request_key(analysis_type: str, payload: Dict[str, Any]) -> str:
+        """Identity of an analysis request; identical requests share a stored result."""
+        body = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(f"{analysis_type}:{body}".encode()).hexdigest()
+
+    def _storage(self) -> Optional[StorageBackend]:
+        """Get the storage backend, backing off for a minute when it cannot be created."""
+        if time.monotonic() < self._unavailable_until:
+            return None
+        try:
+            return self.storage_factory()
+        except Exception:
+            self._unavailable_until = time.monotonic() + 60
+            return None
+
+    # ===== LIFECYCLE =====
+
+    async def start(self):
+        """Re-queue spooled analyses and start the background flush task."""
+        if self._task is not None:
+            return
+        for analysis_type, data in self._read_spool():
+            self._enqueue(analysis_type, data)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        while self._buffer:
+            if not await self._flush():
+                break
+
+        if self._buffer:
+            self._write_spool(list(self._buffer))
+            self.spooled += len(self._buffer)
+            self._buffer.clear()
+            self._pending.clear()
+
+    # ===== WRITE PATH =====
+
+    def submit(self, analysis_type: str, data: Dict[str, Any]) -> bool:
+        """
+        Queue an analysis for saving without waiting on storage.
+
+        Returns:
+            False if the buffer is full and the analysis was dropped
+        """
+        if len(self._buffer) >= self.max_queue:
+            self.dropped += 1
+            return False
+        self._enqueue(analysis_type, data)
+        return True
+
+    def _enqueue(self, analysis_type: str, data: Dict[str, Any]):
+        self._buffer.append((analysis_type, data))
+        if data.get("request_key"):
+            self._pending[data["request_key"]] = data
+        self._has_items.set()
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not await self._flush():
+                await asyncio.sleep(self.flush_interval)
+
+    async def _flush(self) -> bool:
+        """
+        Save one batch; on failure the batch goes back to the front of the buffer,
+        or to the spool after max_attempts failures so it can't block the buffer.
+        """
+        batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+        if len(self._buffer) < self.batch_size:
+            self._full.clear()
+        if not self._buffer:
+            self._has_items.clear()
+        if not batch:
+            return True
+
+        storage = self._storage()
+        try:
+            if storage is None:
+                raise RuntimeError("Analysis storage is unavailable")
+            await storage.save_analyses_bulk(batch)
+        except Exception:
+            self.failures += 1
+            self._attempts += 1
+            if self._attempts >= self.max_attempts:
+                self._attempts = 0
+                await asyncio.to_thread(self._write_spool, batch)
+                self.spooled += len(batch)
+                for _, data in batch:
+                    self._pending.pop(data.get("request_key"), None)
+                return False
+            self._buffer.extendleft(reversed(batch))
+            self._has_items.set()
+            if len(self._buffer) >= self.batch_size:
+                self._full.set()
+            return False
+
+        self._attempts = 0
+        for _, data in batch:
+            self._pending.pop(data.get("request_key"), None)
+        self.written += len(batch)
+        self.batches += 1
+        return True
+
+    # ===== SPOOL =====
+
+    @contextmanager
+    def _spool_locked(self):
+        with open(self.spool_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_spool(self) -> List[Tuple[str, Dict[str, Any]]]:
+        claimed = f"{self.spool_path}.{os.getpid()}"
+        try:
+            with self._spool_locked():
+                os.replace(self.spool_path, claimed)
+        except OSError:
+            return []
+        with open(claimed) as f:
+            entries = [tuple(json.loads(line)) for line in f if line.strip()]
+        os.remove(claimed)
+        return entries
+
+    def _write_spool(self, entries: List[Tuple[str, Dict[str, Any]]]):
+        lines = "".join(json.dumps(list(entry), default=str) + "\n" for entry in entries)
+        with self._spool_locked():
+            with open(self.spool_path, "a") as f:
+                f.write(lines)
+
+    # ===== LOOKUP =====
+
+    async def lookup(self, request_key: str, any_age: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Find a stored (or still buffered) analysis for an identical request.
+
+        Args:
+            request_key: Identity from request_key()
+            any_age: Accept the newest match however old, even with reuse disabled
+                (the fallback when no model call can be made)
+
+        Returns None when reuse is disabled, nothing recent matches or storage is unavailable.
+        """
+        if self.reuse_max_age <= 0 and not any_age:
+            return None
+        self.lookups += 1
+
+        analysis = self._pending.get(request_key)
+        if analysis is None:
+            storage = self._storage()
+            if storage is None:
+                return None
+            try:
+                analysis = await storage.find_analysis(
+                    request_key, max_age_seconds=None if any_age else self.reuse_max_age
+                )
+            except Exception:
+                return None
+
+        if analysis is not None:
+            self.lookup_hits += 1
+        return analysis
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffer depth, write and lookup counters."""
+        return {
+            "queued": len(self._buffer),
+            "max_queue": self.max_queue,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "spooled": self.spooled,
+            "lookups": self.lookups,
+            "lookup_hits": self.lookup_hits,
+        }
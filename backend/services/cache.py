@@ -0,0 +1,131 @@
+"""
+Read Cache
+Bounded LRU cache with per-entry TTL, negative caching and hit/stale counters.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire after `ttl` seconds.
+
+    Entries older than `stale_after` seconds are still served, but counted as
+    stale reads: nothing has confirmed they match the database. Refreshing an
+    entry (a write-through or a snapshot listener update) resets its age.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        ttl: Optional[float] = None,
+        stale_after: Optional[float] = None,
+        on_evict: Optional[Callable[[Hashable], None]] = None
+    ):
+        """Initialize the cache from arguments or environment settings."""
+        self.max_entries = max_entries or int(os.getenv("FIRESTORE_CACHE_MAX_ENTRIES", 10000))
+        self.ttl = ttl if ttl is not None else float(os.getenv("FIRESTORE_CACHE_TTL_SECONDS", 300))
+        self.stale_after = (
+            stale_after if stale_after is not None
+            else float(os.getenv("FIRESTORE_CACHE_STALE_SECONDS", 60))
+        )
+        self.on_evict = on_evict
+
+        # key -> (value, stored_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.stale_reads = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key.
+
+        Returns:
+            Tuple of (found, value); a cached miss is (True, None)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        value, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age >= self.ttl:
+            self._drop(key)
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if value is None:
+            self.negative_hits += 1
+        if age >= self.stale_after:
+            self.stale_reads += 1
+        return True, value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value (None caches a miss) and evict least recently used entries."""
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove a key; returns whether it was cached."""
+        if key not in self._entries:
+            return False
+        self._drop(key)
+        self.invalidations += 1
+        return True
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove every entry for which predicate(key, value) is true."""
+        keys = [key for key, (value, _) in self._entries.items() if predicate(key, value)]
+        for key in keys:
+            self.invalidate(key)
+        return len(keys)
+
+    def clear(self):
+        """Remove every entry."""
+        for key in list(self._entries):
+            self._drop(key)
+
+    def _drop(self, key: Hashable):
+        del self._entries[key]
+        if self.on_evict is not None:
+            self.on_evict(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio, stale reads and eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "negative_hits": self.negative_hits,
+            "stale_reads": self.stale_reads,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
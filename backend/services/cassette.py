@@ -0,0 +1,210 @@
+"""
+LLM Cassette
+Record/replay of Gemini calls, and of the API requests that caused them, in a compressed append-only file.
+"""
+
+import os
+import json
+import zlib
+import fcntl
+import base64
+import struct
+import asyncio
+import hashlib
+import threading
+from enum import Enum
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+
+MAGIC = b"AGRICAS1"
+# Frame header: record kind, key digest, length of the zlib-compressed JSON body that follows
+FRAME = struct.Struct("<B32sI")
+
+KIND_LLM = 1
+KIND_HTTP = 2
+
+MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode for a model request the cassette has no recording of."""
+
+
+def canonical(value: Any) -> Any:
+    """JSON-compatible form of SDK request arguments; bytes (images) become their digest and size."""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump(mode="python", exclude_none=True)
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in sorted(value.items(), key=lambda pair: str(pair[0]))}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return {"$bytes": hashlib.sha256(value).hexdigest(), "size": len(value)}
+    if isinstance(value, Enum):
+        return value.value
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def request_key(method: str, model: str, request: Any) -> bytes:
+    """Digest identifying a model request (method, model and canonical arguments)."""
+    body = json.dumps([method, model, request], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).digest()
+
+
+class Cassette:
+    """
+    Append-only file of zlib-compressed JSON records, each preceded by its kind and key.
+
+    Recording appends under an exclusive flock, so several workers can share
+    one file. Replay builds an index of (kind, key) -> frame offsets by reading
+    only the frame headers; identical requests recorded several times are
+    answered with their recordings in turn.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        mode: Optional[str] = None,
+        latency_scale: Optional[float] = None,
+        on_miss: Optional[str] = None,
+        compression: Optional[int] = None
+    ):
+        """Configure the cassette from arguments or environment settings; the file is opened on first use."""
+        self.path = path or os.getenv("LLM_CASSETTE_PATH", "agrismart_llm.cassette")
+        self.mode = (mode or os.getenv("LLM_CASSETTE_MODE", "off")).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"LLM_CASSETTE_MODE must be one of {', '.join(MODES)}")
+        # 0 replays at full speed, 1 with the recorded latency
+        self.latency_scale = (
+            latency_scale if latency_scale is not None
+            else float(os.getenv("LLM_REPLAY_LATENCY_SCALE", 0))
+        )
+        # "error" raises CassetteMissError, "live" calls the real model
+        self.on_miss = on_miss or os.getenv("LLM_REPLAY_MISS", "error")
+        self.compression = compression if compression is not None else int(os.getenv("LLM_CASSETTE_COMPRESSION", 6))
+
+        self._write_fd: Optional[int] = None
+        self._read_fd: Optional[int] = None
+        self._index: Optional[Dict[Tuple[int, bytes], List[Tuple[int, int]]]] = None
+        self._cursors: Dict[Tuple[int, bytes], int] = {}
+        self._lock = threading.Lock()
+
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ===== RECORD =====
+
+    def append(self, kind: int, key: bytes, record: Dict[str, Any]):
+        """Append one record (blocking; see record())."""
+        blob = zlib.compress(json.dumps(record, separators=(",", ":"), default=str).encode(), self.compression)
+        frame = FRAME.pack(kind, key, len(blob)) + blob
+        with self._lock:
+            if self._write_fd is None:
+                self._write_fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            fcntl.flock(self._write_fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(self._write_fd).st_size == 0:
+                    frame = MAGIC + frame
+                os.write(self._write_fd, frame)
+            finally:
+                fcntl.flock(self._write_fd, fcntl.LOCK_UN)
+        self.recorded += 1
+
+    async def record(self, kind: int, key: bytes, record: Dict[str, Any]):
+        """Append a record from a worker thread, off the event loop."""
+        await asyncio.to_thread(self.append, kind, key, record)
+
+    # ===== REPLAY =====
+
+    def _frames(self) -> Iterator[Tuple[int, bytes, int, int]]:
+        """(kind, key, body offset, body length) of every complete frame."""
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a cassette file: {self.path}")
+            offset = len(MAGIC)
+            while offset + FRAME.size <= size:
+                kind, key, length = FRAME.unpack(f.read(FRAME.size))
+                offset += FRAME.size
+                if offset + length > size:
+                    # Torn final frame of an interrupted recording
+                    break
+                yield kind, key, offset, length
+                offset += length
+                f.seek(offset)
+
+    def _read(self, offset: int, length: int) -> Dict[str, Any]:
+        if self._read_fd is None:
+            self._read_fd = os.open(self.path, os.O_RDONLY)
+        return json.loads(zlib.decompress(os.pread(self._read_fd, length, offset)))
+
+    def _load_index(self) -> Dict[Tuple[int, bytes], List[Tuple[int, int]]]:
+        with self._lock:
+            if self._index is None:
+                index: Dict[Tuple[int, bytes], List[Tuple[int, int]]] = {}
+                for kind, key, offset, length in self._frames():
+                    index.setdefault((kind, key), []).append((offset, length))
+                self._index = index
+        return self._index
+
+    def lookup(self, kind: int, key: bytes) -> Optional[Dict[str, Any]]:
+        """The next recording for a key (cycling through repeats), or None."""
+        frames = self._load_index().get((kind, key))
+        if not frames:
+            self.misses += 1
+            return None
+        with self._lock:
+            position = self._cursors.get((kind, key), 0)
+            self._cursors[(kind, key)] = position + 1
+        self.replayed += 1
+        return self._read(*frames[position % len(frames)])
+
+    def records(self, kind: int) -> Iterator[Dict[str, Any]]:
+        """Every record of a kind, in file order."""
+        for frame_kind, _, offset, length in self._frames():
+            if frame_kind == kind:
+                yield self._read(offset, length)
+
+    async def delay(self, seconds: float):
+        """Sleep for a recorded duration scaled by latency_scale (no-op at full speed)."""
+        if self.latency_scale > 0 and seconds > 0:
+            await asyncio.sleep(seconds * self.latency_scale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Mode, file and record/replay counters."""
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+            "indexed_keys": len(self._index) if self._index is not None else None,
+        }
+
+    def close(self):
+        for fd in (self._write_fd, self._read_fd):
+            if fd is not None:
+                os.close(fd)
+        self._write_fd = self._read_fd = None
+
+
+def encode_body(body: bytes) -> str:
+    return base64.b64encode(body).decode()
+
+
+def decode_body(body: str) -> bytes:
+    return base64.b64decode(body)
+
+
+CASSETTE = Cassette()
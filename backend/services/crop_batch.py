@@ -0,0 +1,250 @@
+"""
+Crop Batch Analysis
+Runs many crop image analyses through a bounded worker pool and aggregates field-level results.
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import asyncio
+import zipfile
+from collections import Counter
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator, Tuple
+
+
+# (filename, coroutine factory returning the image bytes)
+BatchItem = Tuple[str, Callable[[], Awaitable[bytes]]]
+
+DEFAULT_CONCURRENCY = int(os.getenv("CROP_BATCH_CONCURRENCY", 8))
+MAX_IMAGES = int(os.getenv("CROP_BATCH_MAX_IMAGES", 500))
+
+# Formats the pinned Pillow decodes without plugins
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff")
+
+# Limits on what an archive may expand to, checked before any member is read (zip bombs)
+MAX_IMAGE_BYTES = int(os.getenv("CROP_BATCH_MAX_IMAGE_BYTES", 25 * 1024 * 1024))
+MAX_ARCHIVE_BYTES = int(os.getenv("CROP_BATCH_MAX_ARCHIVE_BYTES", 1024 * 1024 * 1024))
+MAX_COMPRESSION_RATIO = int(os.getenv("CROP_BATCH_MAX_COMPRESSION_RATIO", 100))
+
+SEVERITY_ORDER = ["low", "medium", "high", "critical"]
+
+_JSON_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+
+
+def parse_analysis(text: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Extract the JSON object the crop agent asks Gemini to return."""
+    if not text:
+        return None
+
+    match = _JSON_FENCE.search(text)
+    candidate = match.group(1) if match else text
+
+    try:
+        parsed = json.loads(candidate)
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _issue_names(issues: Any) -> List[str]:
+    """Normalize the 'issues' field, which may be a string, list of strings or list of objects."""
+    if not issues:
+        return []
+    if isinstance(issues, str):
+        return [issues]
+    if isinstance(issues, dict):
+        issues = [issues]
+
+    names = []
+    for issue in issues:
+        if isinstance(issue, dict):
+            issue = issue.get("name") or issue.get("issue") or issue.get("type") or json.dumps(issue, ensure_ascii=False)
+        names.append(str(issue).strip().lower())
+    return names
+
+
+def _copy_to(fileobj, path: str):
+    fileobj.seek(0)
+    with open(path, "wb") as out:
+        shutil.copyfileobj(fileobj, out)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _read_zip_member(archive_path: str, name: str) -> bytes:
+    with zipfile.ZipFile(archive_path) as zf, zf.open(name) as member:
+        # Never trust the declared size alone; stop reading past the limit
+        data = member.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError(f"{name} is larger than {MAX_IMAGE_BYTES} bytes")
+    return data
+
+
+def _check_archive(infos: List[zipfile.ZipInfo]):
+    """Reject archives whose images expand past the per-image or total limits."""
+    total = 0
+    for info in infos:
+        if info.file_size > MAX_IMAGE_BYTES:
+            raise ValueError(f"{info.filename} is larger than {MAX_IMAGE_BYTES} bytes")
+        if info.file_size > max(info.compress_size, 1) * MAX_COMPRESSION_RATIO:
+            raise ValueError(f"{info.filename} has a suspicious compression ratio")
+        total += info.file_size
+        if total > MAX_ARCHIVE_BYTES:
+            raise ValueError(f"Archive expands to more than {MAX_ARCHIVE_BYTES} bytes")
+
+
+async def spool_uploads(files: List[Any], archive: Optional[Any], workdir: str) -> List[BatchItem]:
+    """
+    Copy uploaded files (and/or a zip archive) into `workdir`.
+
+    Multipart uploads are closed as soon as the route returns, so a streamed
+    batch has to own its own copies. Images are loaded lazily by the workers.
+    """
+    items: List[BatchItem] = []
+
+    for i, upload in enumerate(files):
+        path = os.path.join(workdir, f"{i:05d}")
+        await asyncio.to_thread(_copy_to, upload.file, path)
+        if os.path.getsize(path) > MAX_IMAGE_BYTES:
+            raise ValueError(f"{upload.filename} is larger than {MAX_IMAGE_BYTES} bytes")
+        items.append((upload.filename or path, lambda path=path: asyncio.to_thread(_read_file, path)))
+
+    if archive is not None:
+        path = os.path.join(workdir, "archive.zip")
+        await asyncio.to_thread(_copy_to, archive.file, path)
+        with zipfile.ZipFile(path) as zf:
+            infos = [
+                info for info in zf.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+                and not info.filename.startswith("__MACOSX/")
+            ]
+        _check_archive(infos)
+        names = [info.filename for info in infos]
+        items.extend(
+            (name, lambda name=name: asyncio.to_thread(_read_zip_member, path, name))
+            for name in names
+        )
+
+    return items
+
+
+class FieldReport:
+    """Field-level aggregate of issues, severities and latency for one batch."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.images = 0
+        self.failed = 0
+        self.cached = 0
+        self.latencies: List[float] = []
+        self.health_status: Counter = Counter()
+        self.severity: Counter = Counter()
+        self.issues: Counter = Counter()
+
+    def add(self, result: Dict[str, Any], latency: float):
+        """Account for one image result."""
+        self.images += 1
+        self.latencies.append(latency)
+
+        if result.get("status") != "success":
+            self.failed += 1
+            return
+        if result.get("cached"):
+            self.cached += 1
+
+        analysis = parse_analysis(result.get("analysis"))
+        if not analysis:
+            self.health_status["unparsed"] += 1
+            return
+
+        self.health_status[str(analysis.get("health_status", "unknown")).lower()] += 1
+        self.severity[str(analysis.get("severity", "unknown")).lower()] += 1
+        self.issues.update(_issue_names(analysis.get("issues")))
+
+    def _percentile(self, pct: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] * 1000
+
+    def summary(self) -> Dict[str, Any]:
+        """Build the aggregate report."""
+        elapsed = time.perf_counter() - self.started
+        worst = max(
+            (s for s in self.severity if s in SEVERITY_ORDER),
+            key=SEVERITY_ORDER.index,
+            default=None
+        )
+
+        return {
+            "images": self.images,
+            "failed": self.failed,
+            "cached": self.cached,
+            "health_status": dict(self.health_status),
+            "severity": dict(self.severity),
+            "worst_severity": worst,
+            "top_issues": self.issues.most_common(10),
+            "elapsed_s": round(elapsed, 3),
+            "throughput_images_per_s": round(self.images / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {
+                "p50": round(self._percentile(0.50), 1),
+                "p95": round(self._percentile(0.95), 1),
+                "max": round(max(self.latencies) * 1000, 1),
+            } if self.latencies else None,
+        }
+
+
+async def run_batch(
+    items: List[BatchItem],
+    analyze: Callable[[bytes], Awaitable[Dict[str, Any]]],
+    concurrency: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyze images with at most `concurrency` in flight, yielding results as they complete.
+
+    The last event yielded is the field-level summary.
+    """
+    pending: asyncio.Queue = asyncio.Queue()
+    for index, item in enumerate(items):
+        pending.put_nowait((index, item))
+
+    done: asyncio.Queue = asyncio.Queue()
+    report = FieldReport()
+
+    async def worker():
+        while True:
+            try:
+                index, (filename, load) = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            started = time.perf_counter()
+            try:
+                result = await analyze(await load())
+            except Exception as e:
+                result = {"status": "error", "agent": "crop_analyzer", "error": str(e)}
+            latency = time.perf_counter() - started
+
+            report.add(result, latency)
+            await done.put({
+                "type": "result",
+                "index": index,
+                "filename": filename,
+                "latency_ms": round(latency * 1000, 1),
+                "result": result
+            })
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await done.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    yield {"type": "summary", **report.summary()}
@@ -0,0 +1,66 @@
+"""
+Request Deadlines
+Per-endpoint default deadlines, client-supplied timeouts and the deadline of the request being served.
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+
+# Client header with the seconds it is willing to wait; it can shorten an endpoint's deadline, not extend it
+TIMEOUT_HEADER = b"x-request-timeout"
+
+# time.monotonic() by which the request being served must be answered (None: no deadline)
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceededError(TimeoutError):
+    """Raised instead of starting upstream work when the request's deadline has already passed."""
+
+
+def parse_deadlines(spec: str) -> Dict[str, float]:
+    """Parse "/api/farm/action-plan=90,/api/crop/analyze-image=45" into per-path deadlines (0 = none)."""
+    deadlines = {}
+    for entry in spec.split(","):
+        path, _, seconds = entry.strip().partition("=")
+        if path and seconds:
+            deadlines[path.strip()] = float(seconds)
+    return deadlines
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+class DeadlinePolicy:
+    """
+    Deadline of a request from its path and the client's X-Request-Timeout header.
+
+    REQUEST_DEADLINES overrides REQUEST_DEADLINE_SECONDS per path; a client
+    value only applies when it is shorter. 0 means no deadline.
+    """
+
+    def __init__(self, default: Optional[float] = None, per_path: Optional[Dict[str, float]] = None):
+        self.default = default if default is not None else float(os.getenv("REQUEST_DEADLINE_SECONDS", 60))
+        self.per_path = per_path if per_path is not None else parse_deadlines(
+            os.getenv("REQUEST_DEADLINES", "/api/farm/action-plan=90,/api/crop/analyze-image=45")
+        )
+
+    def seconds(self, path: str, client_timeout: Optional[bytes] = None) -> Optional[float]:
+        """Seconds the request may run before its response starts, or None for no limit."""
+        seconds = self.per_path.get(path, self.default) or None
+        if client_timeout:
+            try:
+                requested = float(client_timeout)
+            except ValueError:
+                # Malformed header: keep the endpoint's deadline
+                return seconds
+            if requested > 0 and (seconds is None or requested < seconds):
+                seconds = requested
+        return seconds
@@ -4,28 +4,246 @@ Handles all database operations with Google Cloud Firestore
 """
 
 import os
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+import asyncio
+from contextlib import aclosing
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+from datetime import datetime, timedelta
+from google.api_core import exceptions as gcp_exceptions
 from google.cloud import firestore
 from google.oauth2 import service_account
 
+from .cache import TTLCache
+from .metrics import instrument_storage
+from .storage import (
+    DEFAULT_PAGE_SIZE,
+    StorageBackend,
+    alert_severity,
+    decode_cursor,
+    encode_cursor,
+    format_alert_counts,
+)
+from .sensor_rollups import (
+    RESOLUTIONS,
+    aggregate_readings,
+    bucket_start,
+    choose_resolution,
+    merge_aggregates,
+    rollup_doc_id,
+    to_epoch,
+    to_point,
+)
 
-class FirestoreService:
+
+# Firestore caps a write batch at 500 operations
+MAX_BATCH_SIZE = 500
+
+DOCUMENT_ID = "__name__"
+
+# Markers of applied transform batches; a Firestore TTL policy on expires_at deletes them
+BATCH_MARKERS = "batch_markers"
+BATCH_MARKER_TTL = timedelta(days=7)
+
+RETRYABLE_ERRORS = (
+    gcp_exceptions.Aborted,
+    gcp_exceptions.DeadlineExceeded,
+    gcp_exceptions.InternalServerError,
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.ServiceUnavailable,
+)
+
+
+@instrument_storage("firestore")
+class FirestoreService(StorageBackend):
     """Service for interacting with Google Cloud Firestore."""
     
-    def __init__(self):
-        """Initialize Firestore client."""
+    def __init__(self, client: Optional[firestore.AsyncClient] = None):
+        """
+        Initialize the async Firestore client.
+        
+        Args:
+            client: Pre-built AsyncClient (e.g. pointed at the emulator or a fake)
+        """
+        self.batch_size = min(int(os.getenv("FIRESTORE_BATCH_SIZE", MAX_BATCH_SIZE)), MAX_BATCH_SIZE)
+        self.max_retries = int(os.getenv("FIRESTORE_MAX_RETRIES", 5))
+        self.page_size = int(os.getenv("FIRESTORE_PAGE_SIZE", 500))
+        
+        # Bounds concurrent batch commits across all requests (backpressure)
+        self._commit_slots = asyncio.Semaphore(int(os.getenv("FIRESTORE_MAX_INFLIGHT_BATCHES", 4)))
+        
+        # Read-through cache of farm documents and per-farm crop lists
+        self.cache = TTLCache(on_evict=self._unwatch)
+        self._cache_version = 0
+        self._watches: Dict[tuple, Any] = {}
+        self._listener_client: Optional[firestore.Client] = None
+        
+        if client is not None:
+            self.db = client
+            return
+        
         # Check if running in Cloud Run or local
         credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        credentials = None
         
         if credentials_path and os.path.exists(credentials_path):
             credentials = service_account.Credentials.from_service_account_file(
                 credentials_path
             )
-            self.db = firestore.Client(credentials=credentials)
+            self.db = firestore.AsyncClient(credentials=credentials)
         else:
             # Use default credentials in Cloud Run
-            self.db = firestore.Client()
+            self.db = firestore.AsyncClient()
+        
+        # Snapshot listeners are only available on the sync client (background threads)
+        if os.getenv("FIRESTORE_CACHE_LISTENERS", "false").lower() == "true":
+            self._listener_client = firestore.Client(credentials=credentials)
+    
+    def close(self):
+        """Close the underlying gRPC channel."""
+        for key in list(self._watches):
+            self._unwatch(key)
+        if self._listener_client is not None:
+            self._listener_client.close()
+        self.db.close()
+    
+    # ===== READ CACHE =====
+    
+    def _cache_store(self, key: tuple, value: Any, version: int):
+        # Skip the store if a write invalidated this data while it was being read
+        if version != self._cache_version:
+            return
+        self.cache.set(key, value)
+        self._watch(key)
+    
+    def _invalidate(self, key: tuple):
+        self._cache_version += 1
+        self.cache.invalidate(key)
+    
+    def _watch(self, key: tuple):
+        """Keep a cached entry fresh with a snapshot listener, when enabled."""
+        if self._listener_client is None or key in self._watches:
+            return
+        
+        loop = asyncio.get_running_loop()
+        kind, ident = key
+        if kind == 'farm':
+            target = self._listener_client.collection('farms').document(ident)
+        else:
+            target = self._listener_client.collection('crops').where('farm_id', '==', ident)
+        
+        def on_snapshot(snapshots, changes, read_time):
+            loop.call_soon_threadsafe(self._apply_snapshot, key, snapshots)
+        
+        self._watches[key] = target.on_snapshot(on_snapshot)
+    
+    def _apply_snapshot(self, key: tuple, snapshots: list):
+        if key not in self._watches:
+            return
+        if key[0] == 'farm':
+            value = snapshots[0].to_dict() if snapshots and snapshots[0].exists else None
+        else:
+            value = sorted(
+                ({**doc.to_dict(), 'id': doc.id} for doc in snapshots),
+                key=lambda crop: crop['id']
+            )
+        self.cache.set(key, value)
+    
+    def _unwatch(self, key: tuple):
+        watch = self._watches.pop(key, None)
+        if watch is not None:
+            watch.unsubscribe()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Read cache hit ratio, stale reads and active snapshot listeners."""
+        return {**self.cache.get_stats(), "listeners": len(self._watches)}
+    
+    # ===== PAGINATION =====
+    
+    async def _iter_query(
+        self,
+        collection: str,
+        query,
+        order_field: str,
+        descending: bool,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Dict[str, Any], str]]:
+        """
+        Yield query results one page at a time using start_after cursors.
+        
+        Only one page is held in memory, and the first item is available as
+        soon as the first page arrives regardless of the total result size.
+        Yields (document data, cursor that resumes after this document).
+        """
+        page_size = page_size or self.page_size
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        if order_field != DOCUMENT_ID:
+            query = query.order_by(order_field, direction=direction)
+        query = query.order_by(DOCUMENT_ID, direction=direction)
+        
+        if fields:
+            projection = set(fields)
+            if order_field != DOCUMENT_ID:
+                projection.add(order_field)
+            query = query.select(sorted(projection))
+        
+        while True:
+            page = query.limit(page_size)
+            if cursor:
+                value, doc_id = decode_cursor(cursor)
+                doc_ref = self.db.collection(collection).document(doc_id)
+                page = page.start_after([doc_ref] if order_field == DOCUMENT_ID else [value, doc_ref])
+            
+            count = 0
+            async for doc in page.stream():
+                count += 1
+                data = doc.to_dict()
+                data['id'] = doc.id
+                cursor = encode_cursor(data.get(order_field) if order_field != DOCUMENT_ID else None, doc.id)
+                yield data, cursor
+            
+            if count < page_size:
+                return
+    
+    async def _page(
+        self,
+        collection: str,
+        query,
+        order_field: str,
+        descending: bool,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Fetch `limit` items plus one look-ahead to know whether another page exists."""
+        items = []
+        next_cursor = None
+        last_cursor = None
+        
+        results = self._iter_query(
+            collection, query, order_field, descending,
+            fields=fields, cursor=cursor, page_size=limit + 1
+        )
+        async with aclosing(results):
+            async for item, item_cursor in results:
+                if len(items) == limit:
+                    next_cursor = last_cursor
+                    break
+                items.append(item)
+                last_cursor = item_cursor
+        
+        return {"items": items, "next_cursor": next_cursor}
+    
+    async def _iter_items(
+        self,
+        spec: tuple,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        results = self._iter_query(*spec, fields=fields, cursor=cursor)
+        async with aclosing(results):
+            async for item, _ in results:
+                yield item
     
     # ===== FARM OPERATIONS =====
     
@@ -34,42 +252,89 @@ class FirestoreService:
         farm_data['created_at'] = datetime.utcnow()
         farm_data['updated_at'] = datetime.utcnow()
         
-        self.db.collection('farms').document(farm_id).set(farm_data)
+        await self.db.collection('farms').document(farm_id).set(farm_data)
+        self._invalidate(('farm', farm_id))
         
         return {"status": "success", "farm_id": farm_id}
     
     async def get_farm(self, farm_id: str) -> Optional[Dict[str, Any]]:
-        """Get farm data by ID."""
-        doc = self.db.collection('farms').document(farm_id).get()
+        """Get farm data by ID (served from the read cache when possible)."""
+        key = ('farm', farm_id)
+        found, farm = self.cache.get(key)
         
-        if doc.exists:
-            return doc.to_dict()
-        return None
+        if not found:
+            version = self._cache_version
+            doc = await self.db.collection('farms').document(farm_id).get()
+            farm = doc.to_dict() if doc.exists else None
+            self._cache_store(key, farm, version)
+        
+        return dict(farm) if farm is not None else None
+    
+    async def get_farms(self, farm_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get several farms, reading only uncached ones in a single batched call."""
+        farms = {}
+        missing = []
+        for farm_id in farm_ids:
+            found, farm = self.cache.get(('farm', farm_id))
+            if found:
+                farms[farm_id] = dict(farm) if farm is not None else None
+            else:
+                farms[farm_id] = None
+                missing.append(farm_id)
+        
+        if missing:
+            version = self._cache_version
+            refs = [self.db.collection('farms').document(farm_id) for farm_id in missing]
+            async for doc in self.db.get_all(refs):
+                farm = doc.to_dict() if doc.exists else None
+                self._cache_store(('farm', doc.id), farm, version)
+                farms[doc.id] = dict(farm) if farm is not None else None
+        
+        return farms
     
     async def update_farm(self, farm_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Update farm data."""
         updates['updated_at'] = datetime.utcnow()
         
-        self.db.collection('farms').document(farm_id).update(updates)
+        await self.db.collection('farms').document(farm_id).update(updates)
+        self._invalidate(('farm', farm_id))
         
         return {"status": "success", "farm_id": farm_id}
     
-    async def list_farms(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """List all farms, optionally filtered by user."""
+    def _farms_query(self, user_id: Optional[str] = None):
         query = self.db.collection('farms')
         
         if user_id:
             query = query.where('user_id', '==', user_id)
         
-        docs = query.stream()
-        
-        farms = []
-        for doc in docs:
-            farm_data = doc.to_dict()
-            farm_data['id'] = doc.id
-            farms.append(farm_data)
-        
-        return farms
+        return 'farms', query, DOCUMENT_ID, False
+    
+    async def list_farms(
+        self,
+        user_id: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """List all farms, optionally filtered by user."""
+        return [farm async for farm in self.iter_farms(user_id, fields)]
+    
+    def iter_farms(
+        self,
+        user_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream farms page by page with bounded memory."""
+        return self._iter_items(self._farms_query(user_id), fields, cursor)
+    
+    async def list_farms_page(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of farms and the cursor of the next page."""
+        return await self._page(*self._farms_query(user_id), limit=limit, cursor=cursor, fields=fields)
     
     # ===== CROP OPERATIONS =====
     
@@ -79,27 +344,60 @@ class FirestoreService:
         crop_data['farm_id'] = farm_id
         
         doc_ref = self.db.collection('crops').document()
-        doc_ref.set(crop_data)
+        await doc_ref.set(crop_data)
+        self._invalidate(('crops', farm_id))
         
         return {"status": "success", "crop_id": doc_ref.id}
     
-    async def get_crops(self, farm_id: str) -> List[Dict[str, Any]]:
-        """Get all crops for a farm."""
-        docs = self.db.collection('crops').where('farm_id', '==', farm_id).stream()
+    def _crops_query(self, farm_id: str):
+        query = self.db.collection('crops').where('farm_id', '==', farm_id)
+        return 'crops', query, DOCUMENT_ID, False
+    
+    async def get_crops(self, farm_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get all crops for a farm (full documents are served from the read cache)."""
+        if fields:
+            return [crop async for crop in self.iter_crops(farm_id, fields)]
+        
+        key = ('crops', farm_id)
+        found, crops = self.cache.get(key)
         
-        crops = []
-        for doc in docs:
-            crop_data = doc.to_dict()
-            crop_data['id'] = doc.id
-            crops.append(crop_data)
+        if not found:
+            version = self._cache_version
+            crops = [crop async for crop in self.iter_crops(farm_id)]
+            self._cache_store(key, crops, version)
         
-        return crops
+        return [dict(crop) for crop in crops]
+    
+    def iter_crops(
+        self,
+        farm_id: str,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a farm's crops page by page with bounded memory."""
+        return self._iter_items(self._crops_query(farm_id), fields, cursor)
+    
+    async def get_crops_page(
+        self,
+        farm_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a farm's crops and the cursor of the next page."""
+        return await self._page(*self._crops_query(farm_id), limit=limit, cursor=cursor, fields=fields)
     
     async def update_crop(self, crop_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
         """Update crop data."""
         updates['updated_at'] = datetime.utcnow()
         
-        self.db.collection('crops').document(crop_id).update(updates)
+        await self.db.collection('crops').document(crop_id).update(updates)
+        
+        # The owning farm is not known here; drop any cached list containing the crop
+        self._cache_version += 1
+        self.cache.invalidate_where(
+            lambda key, crops: key[0] == 'crops' and any(crop['id'] == crop_id for crop in crops)
+        )
         
         return {"status": "success", "crop_id": crop_id}
     
@@ -111,7 +409,7 @@ class FirestoreService:
         analysis_data['timestamp'] = datetime.utcnow()
         
         doc_ref = self.db.collection('analyses').document()
-        doc_ref.set(analysis_data)
+        await doc_ref.set(analysis_data)
         
         return {"status": "success", "analysis_id": doc_ref.id}
     
@@ -132,13 +430,49 @@ class FirestoreService:
         docs = query.stream()
         
         analyses = []
-        for doc in docs:
+        async for doc in docs:
             analysis_data = doc.to_dict()
             analysis_data['id'] = doc.id
             analyses.append(analysis_data)
         
         return analyses
     
+    async def save_analyses_bulk(self, analyses: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Save many analyses using batched writes."""
+        now = datetime.utcnow()
+        collection = self.db.collection('analyses')
+        
+        writes = []
+        for analysis_type, analysis_data in analyses:
+            analysis_data['type'] = analysis_type
+            analysis_data['timestamp'] = now
+            writes.append((collection.document(), analysis_data))
+        
+        chunks = [writes[start:start + self.batch_size] for start in range(0, len(writes), self.batch_size)]
+        results = await asyncio.gather(*(self._commit_batch(chunk) for chunk in chunks))
+        
+        return {"status": "success", "written": len(writes), "batches": len(chunks), "retries": sum(results)}
+    
+    async def find_analysis(
+        self,
+        request_key: str,
+        max_age_seconds: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get the newest analysis stored for a request key, if recent enough."""
+        query = self.db.collection('analyses').where('request_key', '==', request_key)
+        
+        if max_age_seconds:
+            query = query.where('timestamp', '>=', datetime.utcnow() - timedelta(seconds=max_age_seconds))
+        
+        query = query.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(1)
+        
+        async for doc in query.stream():
+            analysis_data = doc.to_dict()
+            analysis_data['id'] = doc.id
+            return analysis_data
+        
+        return None
+    
     # ===== SENSOR DATA =====
     
     async def save_sensor_data(self, farm_id: str, sensor_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -147,19 +481,93 @@ class FirestoreService:
         sensor_data['timestamp'] = datetime.utcnow()
         
         doc_ref = self.db.collection('sensor_data').document()
-        doc_ref.set(sensor_data)
+        await doc_ref.set(sensor_data)
+        await self.apply_sensor_rollups(farm_id, aggregate_readings([sensor_data]))
         
         return {"status": "success", "data_id": doc_ref.id}
     
-    async def get_sensor_data(
+    async def save_sensor_data_bulk(
         self,
         farm_id: str,
-        sensor_type: Optional[str] = None,
-        hours: int = 24
-    ) -> List[Dict[str, Any]]:
-        """Get recent sensor data."""
-        from datetime import timedelta
+        readings: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Save many sensor readings using batched writes.
         
+        Readings are split into batches of at most `batch_size` writes, committed
+        with bounded concurrency and retried with exponential backoff on
+        transient errors. Document IDs are assigned up front so retries are idempotent.
+        
+        Args:
+            farm_id: Farm the readings belong to
+            readings: Sensor readings; 'timestamp' defaults to now
+            
+        Returns:
+            Number of readings written, batches committed and retries needed
+        """
+        now = datetime.utcnow()
+        collection = self.db.collection('sensor_data')
+        
+        chunks = []
+        for start in range(0, len(readings), self.batch_size):
+            chunk = []
+            for reading in readings[start:start + self.batch_size]:
+                reading['farm_id'] = farm_id
+                if not reading.get('timestamp'):
+                    reading['timestamp'] = now
+                chunk.append((collection.document(), reading))
+            chunks.append(chunk)
+        
+        results = await asyncio.gather(*(self._commit_batch(chunk) for chunk in chunks))
+        await self.apply_sensor_rollups(farm_id, aggregate_readings(readings))
+        
+        return {
+            "status": "success",
+            "farm_id": farm_id,
+            "written": len(readings),
+            "batches": len(chunks),
+            "retries": sum(results)
+        }
+    
+    async def _commit_batch(
+        self,
+        writes: List[tuple],
+        merge: bool = False,
+        transforms: bool = False,
+        marker_id: Optional[str] = None
+    ) -> int:
+        """
+        Commit one write batch with retries; returns the number of retries used.
+        
+        A commit that timed out may still have been applied. Repeating it is harmless for
+        plain sets, but not for Increment transforms: with transforms=True the batch also
+        creates a marker document (so it holds at most batch_size - 1 writes), and a retry
+        rejected because the marker exists is known to have been applied already. A fixed
+        marker_id extends this across calls: a batch an earlier call committed is skipped.
+        """
+        marker = None
+        if transforms or marker_id:
+            marker = self.db.collection(BATCH_MARKERS).document(marker_id)
+        async with self._commit_slots:
+            for attempt in range(self.max_retries + 1):
+                batch = self.db.batch()
+                for doc_ref, data in writes:
+                    batch.set(doc_ref, data, merge=merge)
+                if marker is not None:
+                    batch.create(marker, {'expires_at': datetime.utcnow() + BATCH_MARKER_TTL})
+                try:
+                    await batch.commit()
+                    return attempt
+                except gcp_exceptions.AlreadyExists:
+                    if marker is None or (attempt == 0 and marker_id is None):
+                        raise
+                    return attempt
+                except RETRYABLE_ERRORS:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(min(0.1 * 2 ** attempt, 5.0))
+    
+    def _sensor_data_query(self, farm_id: str, sensor_type: Optional[str], hours: int):
         cutoff_time = datetime.utcnow() - timedelta(hours=hours)
         
         query = self.db.collection('sensor_data').where('farm_id', '==', farm_id)
@@ -168,17 +576,153 @@ class FirestoreService:
         if sensor_type:
             query = query.where('sensor_type', '==', sensor_type)
         
-        query = query.order_by('timestamp', direction=firestore.Query.DESCENDING)
+        return 'sensor_data', query, 'timestamp', True
+    
+    async def get_sensor_data(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get recent sensor data."""
+        return [reading async for reading in self.iter_sensor_data(farm_id, sensor_type, hours, fields)]
+    
+    def iter_sensor_data(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream recent sensor data, newest first, page by page with bounded memory."""
+        return self._iter_items(self._sensor_data_query(farm_id, sensor_type, hours), fields, cursor)
+    
+    async def get_sensor_data_page(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of recent sensor data and the cursor of the next page."""
+        return await self._page(
+            *self._sensor_data_query(farm_id, sensor_type, hours),
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+    
+    # ===== SENSOR ROLLUPS =====
+    
+    async def apply_sensor_rollups(
+        self,
+        farm_id: str,
+        aggregates: Dict[tuple, Dict[str, Any]],
+        replace: bool = False
+    ) -> int:
+        """
+        Write rollup aggregates for a farm.
+        
+        By default aggregates are merged into existing buckets with Increment,
+        Minimum and Maximum transforms; replace=True overwrites them (backfill).
         
-        docs = query.stream()
+        Returns:
+            Number of rollup documents written
+        """
+        collection = self.db.collection('sensor_rollups')
+        
+        writes = []
+        for key, agg in aggregates.items():
+            sensor_id, resolution, bucket = key
+            data = {
+                'farm_id': farm_id,
+                'sensor_id': sensor_id,
+                'resolution': resolution,
+                'bucket': bucket,
+            }
+            if agg.get('sensor_type'):
+                data['sensor_type'] = agg['sensor_type']
+            
+            if replace:
+                data.update({k: agg[k] for k in ('count', 'sum', 'min', 'max')})
+            else:
+                data.update({
+                    'count': firestore.Increment(agg['count']),
+                    'sum': firestore.Increment(agg['sum']),
+                    'min': firestore.Minimum(agg['min']),
+                    'max': firestore.Maximum(agg['max']),
+                })
+            writes.append((collection.document(rollup_doc_id(farm_id, key)), data))
+        
+        step = self.batch_size if replace else self.batch_size - 1
+        await asyncio.gather(*(
+            self._commit_batch(writes[start:start + step], merge=not replace, transforms=not replace)
+            for start in range(0, len(writes), step)
+        ))
+        return len(writes)
+    
+    async def get_sensor_series(
+        self,
+        farm_id: str,
+        sensor_id: str,
+        start: datetime,
+        end: datetime,
+        resolution: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a sensor time series from rollups at the coarsest sufficient resolution.
+        
+        The number of documents read depends on the range and resolution only,
+        not on how many raw readings were ingested.
+        """
+        resolution = resolution or choose_resolution(start, end, max_points)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        
+        query = (
+            self.db.collection('sensor_rollups')
+            .where('farm_id', '==', farm_id)
+            .where('sensor_id', '==', sensor_id)
+            .where('resolution', '==', resolution)
+            .where('bucket', '>=', bucket_start(to_epoch(start), resolution))
+            .where('bucket', '<', int(to_epoch(end)))
+            .order_by('bucket')
+        )
+        
+        points = []
+        async for doc in query.stream():
+            points.append(to_point(doc.to_dict()))
+        
+        return {
+            "farm_id": farm_id,
+            "sensor_id": sensor_id,
+            "resolution": resolution,
+            "points": points
+        }
+    
+    async def backfill_sensor_rollups(self, farm_id: str) -> Dict[str, Any]:
+        """Rebuild all rollups of a farm from its raw sensor readings."""
+        query = self.db.collection('sensor_data').where('farm_id', '==', farm_id)
+        
+        readings = 0
+        aggregates: Dict[tuple, Dict[str, Any]] = {}
+        batch = []
+        async for doc in query.stream():
+            batch.append(doc.to_dict())
+            readings += 1
+            if len(batch) >= 10000:
+                merge_aggregates(aggregates, aggregate_readings(batch))
+                batch = []
+        merge_aggregates(aggregates, aggregate_readings(batch))
         
-        data = []
-        for doc in docs:
-            sensor_reading = doc.to_dict()
-            sensor_reading['id'] = doc.id
-            data.append(sensor_reading)
+        written = await self.apply_sensor_rollups(farm_id, aggregates, replace=True)
         
-        return data
+        return {"status": "success", "farm_id": farm_id, "readings": readings, "rollups": written}
     
     # ===== IRRIGATION SCHEDULES =====
     
@@ -192,7 +736,7 @@ class FirestoreService:
         schedule_data['created_at'] = datetime.utcnow()
         
         doc_ref = self.db.collection('irrigation_schedules').document()
-        doc_ref.set(schedule_data)
+        await doc_ref.set(schedule_data)
         
         return {"status": "success", "schedule_id": doc_ref.id}
     
@@ -206,7 +750,7 @@ class FirestoreService:
             .stream()
         )
         
-        for doc in docs:
+        async for doc in docs:
             schedule = doc.to_dict()
             schedule['id'] = doc.id
             return schedule
@@ -216,41 +760,294 @@ class FirestoreService:
     # ===== ALERTS =====
     
     async def create_alert(self, farm_id: str, alert_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create a new alert."""
+        """
+        Create a new alert and increment the farm's counters in the same batch.
+        
+        The batch carries a marker document, so retrying a commit that timed out
+        doesn't create the alert or increment the counters twice.
+        """
         alert_data['farm_id'] = farm_id
         alert_data['created_at'] = datetime.utcnow()
         alert_data['read'] = False
         
         doc_ref = self.db.collection('alerts').document()
-        doc_ref.set(alert_data)
+        await self._commit_batch([
+            (doc_ref, alert_data),
+            (self._alert_counters_ref(farm_id), {
+                'farm_id': farm_id,
+                'total': firestore.Increment(1),
+                'unread': firestore.Increment(1),
+                'unread_by_severity': {alert_severity(alert_data): firestore.Increment(1)},
+                'updated_at': alert_data['created_at'],
+            }),
+        ], merge=True, transforms=True)
         
         return {"status": "success", "alert_id": doc_ref.id}
     
-    async def get_alerts(self, farm_id: str, unread_only: bool = False) -> List[Dict[str, Any]]:
-        """Get alerts for a farm."""
+    def _alert_counters_ref(self, farm_id: str):
+        return self.db.collection('alert_counters').document(farm_id)
+    
+    def _alerts_query(self, farm_id: str, unread_only: bool):
         query = self.db.collection('alerts').where('farm_id', '==', farm_id)
         
         if unread_only:
             query = query.where('read', '==', False)
         
-        query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        return 'alerts', query, 'created_at', True
+    
+    async def get_alerts(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Get the most recent alerts for a farm."""
+        page = await self.get_alerts_page(farm_id, unread_only, limit=limit)
+        return page["items"]
+    
+    def iter_alerts(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a farm's alerts, newest first, page by page with bounded memory."""
+        return self._iter_items(self._alerts_query(farm_id, unread_only), fields, cursor)
+    
+    async def get_alerts_page(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a farm's alerts and the cursor of the next page."""
+        return await self._page(
+            *self._alerts_query(farm_id, unread_only),
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+    
+    async def mark_alert_read(self, alert_id: str) -> Dict[str, Any]:
+        """
+        Mark an alert as read and decrement its farm's unread counters.
         
-        docs = query.stream()
+        The alert update is conditioned on the version that was read, so a
+        concurrent change fails the batch and is retried instead of
+        decrementing the counters twice. A retry re-reads the alert first, so a
+        commit that timed out but was applied is not repeated either.
+        """
+        alert_ref = self.db.collection('alerts').document(alert_id)
         
-        alerts = []
-        for doc in docs:
-            alert_data = doc.to_dict()
-            alert_data['id'] = doc.id
-            alerts.append(alert_data)
+        for attempt in range(self.max_retries + 1):
+            snapshot = await alert_ref.get()
+            if not snapshot.exists:
+                raise KeyError(f"Alert not found: {alert_id}")
+            
+            alert = snapshot.to_dict()
+            if alert.get('read'):
+                break
+            
+            now = datetime.utcnow()
+            batch = self.db.batch()
+            batch.update(
+                alert_ref,
+                {'read': True, 'read_at': now},
+                option=self.db.write_option(last_update_time=snapshot.update_time)
+            )
+            batch.set(self._alert_counters_ref(alert['farm_id']), {
+                'unread': firestore.Increment(-1),
+                'unread_by_severity': {alert_severity(alert): firestore.Increment(-1)},
+                'updated_at': now,
+            }, merge=True)
+            
+            try:
+                await batch.commit()
+                break
+            except (gcp_exceptions.FailedPrecondition, *RETRYABLE_ERRORS):
+                if attempt == self.max_retries:
+                    raise
         
-        return alerts
+        return {"status": "success", "alert_id": alert_id}
     
-    async def mark_alert_read(self, alert_id: str) -> Dict[str, Any]:
-        """Mark an alert as read."""
-        self.db.collection('alerts').document(alert_id).update({
-            'read': True,
-            'read_at': datetime.utcnow()
-        })
+    async def mark_all_read(self, farm_id: str) -> Dict[str, Any]:
+        """
+        Mark every unread alert of a farm as read with batched writes.
         
-        return {"status": "success", "alert_id": alert_id}
+        Each batch updates up to batch_size - 1 alerts (conditioned on the
+        version read) plus one counter decrement, so counters stay exact even
+        when alerts are marked read concurrently, or when a commit that timed
+        out was applied (the page re-read after it no longer has those alerts).
+        """
+        query = (
+            self.db.collection('alerts')
+            .where('farm_id', '==', farm_id)
+            .where('read', '==', False)
+            .select(['severity'])
+            .limit(self.batch_size - 1)
+        )
+        
+        marked = 0
+        failures = 0
+        while True:
+            snapshots = [doc async for doc in query.stream()]
+            if not snapshots:
+                break
+            
+            now = datetime.utcnow()
+            severities: Dict[str, int] = {}
+            batch = self.db.batch()
+            for doc in snapshots:
+                batch.update(
+                    doc.reference,
+                    {'read': True, 'read_at': now},
+                    option=self.db.write_option(last_update_time=doc.update_time)
+                )
+                severity = alert_severity(doc.to_dict())
+                severities[severity] = severities.get(severity, 0) + 1
+            batch.set(self._alert_counters_ref(farm_id), {
+                'unread': firestore.Increment(-len(snapshots)),
+                'unread_by_severity': {s: firestore.Increment(-n) for s, n in severities.items()},
+                'updated_at': now,
+            }, merge=True)
+            
+            try:
+                await batch.commit()
+            except (gcp_exceptions.FailedPrecondition, *RETRYABLE_ERRORS):
+                # Re-read the page: another writer changed one of these alerts
+                failures += 1
+                if failures > self.max_retries:
+                    raise
+                continue
+            
+            failures = 0
+            marked += len(snapshots)
+        
+        return {"status": "success", "farm_id": farm_id, "marked": marked}
+    
+    async def get_alert_counts(self, farm_id: str) -> Dict[str, Any]:
+        """Get a farm's alert counters with a single document read."""
+        snapshot = await self._alert_counters_ref(farm_id).get()
+        counters = snapshot.to_dict() if snapshot.exists else {}
+        if not counters.get('migrated'):
+            # Counters start from increments; alerts from before they existed are only counted by a rebuild
+            return await self.rebuild_alert_counters(farm_id)
+        
+        return format_alert_counts(
+            farm_id,
+            counters.get('total', 0),
+            counters.get('unread', 0),
+            counters.get('unread_by_severity', {})
+        )
+    
+    async def rebuild_alert_counters(self, farm_id: str) -> Dict[str, Any]:
+        """
+        Recompute a farm's alert counters from its alerts and mark them migrated.
+        
+        The counter document is only written if it hasn't changed since it was
+        read before counting, so an alert created or read meanwhile makes the
+        rebuild start over instead of being lost.
+        """
+        counters_ref = self._alert_counters_ref(farm_id)
+        query = self.db.collection('alerts').where('farm_id', '==', farm_id).select(['read', 'severity'])
+        
+        for attempt in range(self.max_retries + 1):
+            snapshot = await counters_ref.get()
+            
+            total = 0
+            unread_by_severity: Dict[str, int] = {}
+            async for doc in query.stream():
+                alert = doc.to_dict()
+                total += 1
+                if not alert.get('read'):
+                    severity = alert_severity(alert)
+                    unread_by_severity[severity] = unread_by_severity.get(severity, 0) + 1
+            
+            unread = sum(unread_by_severity.values())
+            counters = {
+                'farm_id': farm_id,
+                'total': total,
+                'unread': unread,
+                'unread_by_severity': unread_by_severity,
+                'migrated': True,
+                'updated_at': datetime.utcnow(),
+            }
+            batch = self.db.batch()
+            if snapshot.exists:
+                batch.update(
+                    counters_ref,
+                    counters,
+                    option=self.db.write_option(last_update_time=snapshot.update_time)
+                )
+            else:
+                batch.create(counters_ref, counters)
+            
+            try:
+                await batch.commit()
+                break
+            except (
+                gcp_exceptions.FailedPrecondition,
+                gcp_exceptions.AlreadyExists,
+                gcp_exceptions.NotFound,
+                *RETRYABLE_ERRORS
+            ):
+                if attempt == self.max_retries:
+                    raise
+        
+        return format_alert_counts(farm_id, total, unread, unread_by_severity)
+    
+    # ===== TOKEN USAGE =====
+    
+    @staticmethod
+    def _token_usage_id(row: Dict[str, Any]) -> str:
+        return f"{row['day']}__{row['farm_id']}__{row['endpoint']}__{row['model']}".replace("/", "_")
+    
+    async def add_token_usage(self, rows: List[Dict[str, Any]], flush_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add token counts to the per-day usage documents with Increment transforms.
+        
+        Each batch carries a marker (derived from flush_id when given), so neither a
+        retried commit nor a retried flush adds the same counts twice.
+        """
+        collection = self.db.collection('token_usage')
+        now = datetime.utcnow()
+        
+        writes = []
+        for row in rows:
+            writes.append((collection.document(self._token_usage_id(row)), {
+                'day': row['day'],
+                'farm_id': row['farm_id'],
+                'endpoint': row['endpoint'],
+                'model': row['model'],
+                'calls': firestore.Increment(row['calls']),
+                'input_tokens': firestore.Increment(row['input_tokens']),
+                'output_tokens': firestore.Increment(row['output_tokens']),
+                'cached_tokens': firestore.Increment(row['cached_tokens']),
+                'updated_at': now,
+            }))
+        
+        step = self.batch_size - 1
+        await asyncio.gather(*(
+            self._commit_batch(
+                writes[start:start + step],
+                merge=True,
+                transforms=True,
+                marker_id=f"token_usage__{flush_id}__{start // step}" if flush_id else None
+            )
+            for start in range(0, len(writes), step)
+        ))
+        return {"status": "success", "rows": len(writes)}
+    
+    async def get_token_usage(self, day: str, farm_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a day's token usage documents, optionally for one farm."""
+        query = self.db.collection('token_usage').where('day', '==', day)
+        
+        if farm_id:
+            query = query.where('farm_id', '==', farm_id)
+        
+        query = query.select(['day', 'farm_id', 'endpoint', 'model', 'calls', 'input_tokens', 'output_tokens', 'cached_tokens'])
+        return [doc.to_dict() async for doc in query.stream()]
 
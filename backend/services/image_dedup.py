@@ -0,0 +1,163 @@
+"""
+Image Deduplication
+Perceptual hashing and a Hamming-distance index for reusing crop image diagnoses.
+"""
+
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from itertools import combinations
+from typing import Dict, Any, List, Optional, Tuple
+
+from PIL import Image
+
+
+HASH_BITS = 64
+
+
+def dhash(img: Image.Image) -> int:
+    """
+    Compute a 64-bit difference hash of an image.
+
+    Each bit compares two horizontally adjacent pixels of a 9x8 grayscale
+    thumbnail, so the hash survives re-encoding, resizing and small crops.
+    """
+    pixels = list(img.convert("L").resize((9, 8), Image.Resampling.BILINEAR).getdata())
+
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def diagnosis_scope(crop_type: str, context: Optional[str] = None) -> str:
+    """
+    Index scope of a diagnosis: the crop type plus a digest of any context sent
+    with the photo (symptoms, notes), which the model also saw.
+    """
+    context = " ".join((context or "").split()).casefold()
+    if not context:
+        return crop_type
+    return f"{crop_type}:{hashlib.sha256(context.encode()).hexdigest()[:16]}"
+
+
+class PerceptualHashIndex:
+    """
+    Multi-index hash table over 64-bit perceptual hashes.
+
+    The hash is split into `num_chunks` substrings, each indexed in its own
+    table. By the pigeonhole principle any hash within distance r of the query
+    matches at least one substring within r // num_chunks bits, so a lookup only
+    probes a few buckets per substring instead of scanning every entry.
+    Hashes only match within the scope they were added under (see diagnosis_scope).
+    """
+
+    def __init__(
+        self,
+        max_distance: Optional[int] = None,
+        num_chunks: int = 4,
+        max_entries: Optional[int] = None
+    ):
+        """Initialize the index from arguments or environment settings."""
+        self.max_distance = max_distance if max_distance is not None else int(
+            os.getenv("IMAGE_DEDUP_MAX_DISTANCE", 6)
+        )
+        self.max_entries = max_entries or int(os.getenv("IMAGE_DEDUP_MAX_ENTRIES", 100_000))
+
+        if HASH_BITS % num_chunks:
+            raise ValueError("num_chunks must divide 64")
+
+        self.num_chunks = num_chunks
+        self.chunk_bits = HASH_BITS // num_chunks
+        self.chunk_mask = (1 << self.chunk_bits) - 1
+
+        # All bit-flip masks within the per-chunk search radius
+        sub_radius = self.max_distance // num_chunks
+        self._probe_masks = [0]
+        for flips in range(1, sub_radius + 1):
+            for bits in combinations(range(self.chunk_bits), flips):
+                self._probe_masks.append(sum(1 << b for b in bits))
+
+        # (scope, chunk index, chunk value) -> entry ids
+        self._buckets: Dict[Tuple[str, int, int], List[int]] = {}
+        # entry id -> (hash, scope, value), oldest first
+        self._entries: "OrderedDict[int, Tuple[int, str, Any]]" = OrderedDict()
+        self._next_id = 0
+
+        self.lookups = 0
+        self.hits = 0
+        self.total_lookup_time = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _chunks(self, value: int):
+        for i in range(self.num_chunks):
+            yield i, (value >> (i * self.chunk_bits)) & self.chunk_mask
+
+    def add(self, value: int, scope: str, payload: Any):
+        """Index a hash together with the payload to return on a match."""
+        entry_id = self._next_id
+        self._next_id += 1
+
+        self._entries[entry_id] = (value, scope, payload)
+        for i, chunk in self._chunks(value):
+            self._buckets.setdefault((scope, i, chunk), []).append(entry_id)
+
+        while len(self._entries) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        entry_id, (value, scope, _) = self._entries.popitem(last=False)
+        for i, chunk in self._chunks(value):
+            key = (scope, i, chunk)
+            bucket = self._buckets[key]
+            bucket.remove(entry_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def lookup(self, value: int, scope: str) -> Optional[Tuple[Any, int]]:
+        """
+        Find the closest indexed hash in the same scope.
+
+        Returns:
+            Tuple of (payload, Hamming distance) or None if nothing is within max_distance
+        """
+        started = time.perf_counter()
+
+        best = None
+        best_distance = self.max_distance + 1
+        seen = set()
+
+        for i, chunk in self._chunks(value):
+            for mask in self._probe_masks:
+                for entry_id in self._buckets.get((scope, i, chunk ^ mask), ()):
+                    if entry_id in seen:
+                        continue
+                    seen.add(entry_id)
+                    distance = (self._entries[entry_id][0] ^ value).bit_count()
+                    if distance < best_distance:
+                        best, best_distance = entry_id, distance
+
+        self.lookups += 1
+        self.total_lookup_time += time.perf_counter() - started
+
+        if best is None:
+            return None
+
+        self.hits += 1
+        return self._entries[best][2], best_distance
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and lookup latency statistics."""
+        return {
+            "entries": len(self._entries),
+            "max_distance": self.max_distance,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "avg_lookup_us": round(self.total_lookup_time / self.lookups * 1e6, 2) if self.lookups else 0.0,
+        }
@@ -0,0 +1,344 @@
+"""
+Image Fetcher
+Downloads crop images by URL over a pooled aiohttp session with a local disk cache.
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import hashlib
+import ipaddress
+from urllib.parse import urljoin, urlsplit
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+# Leading bytes -> MIME type
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+)
+
+
+def sniff_image_type(data: bytes) -> Optional[str]:
+    """Detect the image MIME type from its leading bytes."""
+    for signature, mime_type in _SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return None
+
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class BlockedURLError(ValueError):
+    """The URL's scheme, host or address may not be fetched."""
+
+
+def is_public_address(address: str) -> bool:
+    """Whether an IP address is globally routable (not private, loopback, link-local, reserved or multicast)."""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def cache_lifetime(headers, default: float) -> Optional[float]:
+    """Seconds a response may be served from the cache under its Cache-Control header; None for no-store."""
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name.lower()] = value.strip().strip('"')
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    if "max-age" in directives:
+        try:
+            return max(0.0, float(int(directives["max-age"])))
+        except ValueError:
+            return 0.0
+    return default
+
+
+def _public_resolver():
+    """DNS resolver that drops non-public addresses, so hostnames (and rebinding) can't reach internal networks."""
+    import aiohttp
+    from aiohttp.abc import AbstractResolver
+
+    class PublicResolver(AbstractResolver):
+        def __init__(self):
+            self._resolver = aiohttp.resolver.DefaultResolver()
+
+        async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[Dict[str, Any]]:
+            hosts = [entry for entry in await self._resolver.resolve(host, port, family) if is_public_address(entry["host"])]
+            if not hosts:
+                raise BlockedURLError(f"{host} does not resolve to a public address")
+            return hosts
+
+        async def close(self) -> None:
+            await self._resolver.close()
+
+    return PublicResolver()
+
+
+class ImageFetcher:
+    """
+    Fetches image URLs with size caps, timeouts, Cache-Control freshness and ETag/Last-Modified
+    revalidation. Only http(s) URLs of public addresses are fetched, redirects included.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        timeout: Optional[float] = None,
+        fresh_for: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        cache_max_bytes: Optional[int] = None,
+        cache_max_entries: Optional[int] = None
+    ):
+        """Initialize the fetcher from arguments or environment settings."""
+        self.cache_dir = cache_dir or os.getenv("IMAGE_CACHE_DIR", "/tmp/agrismart-image-cache")
+        self.max_bytes = max_bytes or int(os.getenv("IMAGE_FETCH_MAX_BYTES", 25 * 1024 * 1024))
+        self.timeout = timeout or float(os.getenv("IMAGE_FETCH_TIMEOUT_SECONDS", 20))
+        self.fresh_for = fresh_for if fresh_for is not None else float(os.getenv("IMAGE_FETCH_FRESH_SECONDS", 86400))
+        self.pool_size = pool_size or int(os.getenv("IMAGE_FETCH_POOL_SIZE", 32))
+        self.cache_max_bytes = cache_max_bytes or int(os.getenv("IMAGE_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+        self.cache_max_entries = cache_max_entries or int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", 10000))
+        self.max_redirects = int(os.getenv("IMAGE_FETCH_MAX_REDIRECTS", 5))
+        # Empty: any public host
+        self.allowed_hosts = {
+            host.strip().lower() for host in os.getenv("IMAGE_FETCH_ALLOWED_HOSTS", "").split(",") if host.strip()
+        }
+        # Local development only: lets URLs reach loopback and private networks
+        self.allow_private = os.getenv("IMAGE_FETCH_ALLOW_PRIVATE_NETWORKS", "false").lower() == "true"
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._session: Optional["aiohttp.ClientSession"] = None
+        # Estimated cache size; the directory is rescanned when over a limit or every 100 writes
+        # (other workers share it)
+        self._cache_bytes = 0
+        self._cache_entries = 0
+        self._writes_since_scan = 100
+
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.bytes_downloaded = 0
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """Create the shared connection-pooled session on first use."""
+        if self._session is None or self._session.closed:
+            # Imported here so aiohttp stays out of the API's cold start
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.pool_size,
+                    ttl_dns_cache=300,
+                    resolver=None if self.allow_private else _public_resolver()
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=min(self.timeout, 5))
+            )
+        return self._session
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.cache_dir, digest)
+        return base + ".bin", base + ".json"
+
+    def _check_url(self, url: str):
+        """Reject URLs that aren't http(s), aren't allow-listed or name a non-public IP address."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise BlockedURLError("Only http and https image URLs are supported")
+        host = parts.hostname.lower()
+        if self.allowed_hosts and host not in self.allowed_hosts:
+            raise BlockedURLError(f"Image host {host} is not allowed")
+        try:
+            public = is_public_address(host)
+        except ValueError:
+            # A hostname: its addresses are checked by the resolver when connecting
+            return
+        if not public and not self.allow_private:
+            raise BlockedURLError(f"Image URL points to a non-public address ({host})")
+
+    def _read_cache(self, url: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(data_path, "rb") as f:
+                data = f.read()
+            # Recently used entries are evicted last
+            os.utime(data_path)
+            return data, meta
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, url: str, data: Optional[bytes], meta: Dict[str, Any]):
+        data_path, meta_path = self._paths(url)
+        if data is not None:
+            with open(data_path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        if data is not None:
+            self._cache_bytes += len(data)
+            self._cache_entries += 1
+            self._writes_since_scan += 1
+            if (self._writes_since_scan >= 100 or self._cache_bytes > self.cache_max_bytes
+                    or self._cache_entries > self.cache_max_entries):
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is within 90% of its limits."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".bin"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path[:-len(".bin")]))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        if total > self.cache_max_bytes or count > self.cache_max_entries:
+            for _, size, base in entries:
+                if total <= self.cache_max_bytes * 0.9 and count <= self.cache_max_entries * 0.9:
+                    break
+                for path in (base + ".bin", base + ".json"):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                count -= 1
+        self._cache_bytes = total
+        self._cache_entries = count
+        self._writes_since_scan = 0
+
+    async def _get(self, url: str, headers: Dict[str, str]) -> "aiohttp.ClientResponse":
+        """GET `url`, following redirects only to URLs that pass the same checks."""
+        for _ in range(self.max_redirects + 1):
+            self._check_url(url)
+            response = await self._get_session().get(url, headers=headers, allow_redirects=False)
+            location = response.headers.get("Location")
+            if response.status not in _REDIRECT_STATUSES or not location:
+                return response
+            response.release()
+            url = urljoin(url, location)
+        raise ValueError(f"Image URL redirected more than {self.max_redirects} times")
+
+    async def fetch(self, url: str) -> Tuple[bytes, str, Dict[str, Any]]:
+        """
+        Get the image at `url`, from the local cache when possible.
+
+        Args:
+            url: HTTP(S) image URL
+
+        Returns:
+            Tuple of (image bytes, MIME type, fetch stats)
+        """
+        started = time.perf_counter()
+        self._check_url(url)
+        cached = await asyncio.to_thread(self._read_cache, url)
+
+        if cached:
+            data, meta = cached
+            if time.time() - meta["fetched_at"] < meta.get("fresh_for", self.fresh_for):
+                self.cache_hits += 1
+                return data, meta["content_type"], self._stats("cache", data, started)
+
+        headers = {}
+        if cached:
+            if cached[1].get("etag"):
+                headers["If-None-Match"] = cached[1]["etag"]
+            if cached[1].get("last_modified"):
+                headers["If-Modified-Since"] = cached[1]["last_modified"]
+
+        async with await self._get(url, headers) as response:
+            if response.status == 304 and cached:
+                data, meta = cached
+                fresh_for = cache_lifetime(response.headers, meta.get("fresh_for", self.fresh_for))
+                if fresh_for is not None:
+                    meta.update(fetched_at=time.time(), fresh_for=fresh_for)
+                    await asyncio.to_thread(self._write_cache, url, None, meta)
+                self.revalidated += 1
+                return data, meta["content_type"], self._stats("revalidated", data, started)
+
+            response.raise_for_status()
+
+            if response.content_length and response.content_length > self.max_bytes:
+                raise ValueError(f"Image exceeds {self.max_bytes} bytes")
+
+            chunks = []
+            size = 0
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ValueError(f"Image exceeds {self.max_bytes} bytes")
+                chunks.append(chunk)
+            data = b"".join(chunks)
+
+            header_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            content_type = sniff_image_type(data) or (header_type if header_type.startswith("image/") else None)
+            if content_type is None:
+                raise ValueError(f"URL did not return an image (Content-Type: {header_type or 'unknown'})")
+
+            self.downloads += 1
+            self.bytes_downloaded += size
+
+            fresh_for = cache_lifetime(response.headers, self.fresh_for)
+            if fresh_for is not None:
+                meta = {
+                    "url": url,
+                    "content_type": content_type,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "fetched_at": time.time(),
+                    "fresh_for": fresh_for,
+                    "size": size,
+                }
+                await asyncio.to_thread(self._write_cache, url, data, meta)
+
+        return data, content_type, self._stats("network", data, started)
+
+    @staticmethod
+    def _stats(source: str, data: bytes, started: float) -> Dict[str, Any]:
+        return {
+            "source": source,
+            "bytes": len(data),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache and download statistics."""
+        return {
+            "cache_hits": self.cache_hits,
+            "revalidated": self.revalidated,
+            "downloads": self.downloads,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
+
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
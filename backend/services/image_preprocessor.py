@@ -0,0 +1,165 @@
+"""
+Image Preprocessor
+Downsizes and re-encodes crop photos before they are sent to the vision model.
+"""
+
+import io
+import os
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from .image_dedup import dhash
+from .vegetation_screen import screen
+
+
+# Pillow format name -> MIME type accepted by Gemini
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+}
+
+
+def _preprocess(
+    data: bytes,
+    max_edge: int,
+    fmt: str,
+    quality: int,
+    prescreen: bool
+) -> Tuple[bytes, str, Dict[str, Any]]:
+    """
+    Rotate, resize and re-encode a single image.
+
+    Runs inside a worker process, so it must stay a module-level function.
+    """
+    started = time.perf_counter()
+
+    with Image.open(io.BytesIO(data)) as img:
+        original_format = img.format
+        original_size = img.size
+
+        # Let the JPEG decoder downscale via DCT scaling instead of decoding full resolution
+        if original_format == "JPEG":
+            img.draft("RGB", (max_edge, max_edge))
+
+        # Apply the EXIF orientation to the pixels; the EXIF block is dropped on save
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+        if fmt == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+
+        out = io.BytesIO()
+        save_kwargs = {"quality": quality} if fmt in ("JPEG", "WEBP") else {"optimize": True}
+        if fmt == "JPEG":
+            save_kwargs["optimize"] = True
+        img.save(out, format=fmt, **save_kwargs)
+        processed = out.getvalue()
+        final_size = img.size
+        image_hash = dhash(img)
+        vegetation = screen(img) if prescreen else None
+
+    mime_type = MIME_TYPES[fmt]
+
+    # Never send something bigger than what we received
+    if len(processed) >= len(data) and original_format in MIME_TYPES and final_size == original_size:
+        processed = data
+        mime_type = MIME_TYPES[original_format]
+
+    stats = {
+        "original_bytes": len(data),
+        "processed_bytes": len(processed),
+        "bytes_saved": len(data) - len(processed),
+        "original_size": list(original_size),
+        "processed_size": list(final_size),
+        "format": mime_type,
+        "image_hash": f"{image_hash:016x}",
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    if vegetation is not None:
+        stats["prescreen"] = vegetation
+    return processed, mime_type, stats
+
+
+class ImagePreprocessor:
+    """Process-pool backed preprocessing stage for uploaded crop images."""
+
+    def __init__(
+        self,
+        max_edge: Optional[int] = None,
+        output_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        prescreen: Optional[bool] = None
+    ):
+        """Initialize the preprocessor from arguments or environment settings."""
+        self.max_edge = max_edge or int(os.getenv("IMAGE_MAX_EDGE", 1536))
+        self.output_format = (output_format or os.getenv("IMAGE_FORMAT", "JPEG")).upper()
+        self.quality = quality or int(os.getenv("IMAGE_QUALITY", 85))
+        self.max_workers = max_workers or int(os.getenv("IMAGE_PREPROCESS_WORKERS", os.cpu_count() or 1))
+        self.prescreen = prescreen if prescreen is not None else (
+            os.getenv("CROP_PRESCREEN_ENABLED", "true").lower() == "true"
+        )
+
+        if self.output_format not in MIME_TYPES:
+            raise ValueError(f"Unsupported IMAGE_FORMAT: {self.output_format}")
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        # Running totals since startup
+        self.images_processed = 0
+        self.total_bytes_in = 0
+        self.total_bytes_out = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Create the worker pool on first use."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def process(self, data: bytes) -> Tuple[bytes, str, Dict[str, Any]]:
+        """
+        Preprocess an image without blocking the event loop.
+
+        Args:
+            data: Raw image bytes as uploaded
+
+        Returns:
+            Tuple of (processed bytes, MIME type, preprocessing stats); the stats
+            include the vegetation pre-screen under "prescreen" when enabled
+        """
+        loop = asyncio.get_running_loop()
+        processed, mime_type, stats = await loop.run_in_executor(
+            self._get_executor(),
+            _preprocess,
+            data,
+            self.max_edge,
+            self.output_format,
+            self.quality,
+            self.prescreen
+        )
+
+        self.images_processed += 1
+        self.total_bytes_in += stats["original_bytes"]
+        self.total_bytes_out += stats["processed_bytes"]
+
+        return processed, mime_type, stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aggregate preprocessing statistics."""
+        return {
+            "images_processed": self.images_processed,
+            "bytes_in": self.total_bytes_in,
+            "bytes_out": self.total_bytes_out,
+            "bytes_saved": self.total_bytes_in - self.total_bytes_out,
+        }
+
+    def shutdown(self):
+        """Stop the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,403 @@
+"""
+Job Queue
+Runs long agent tasks in the background with pollable and streamable results.
+"""
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import sqlite3
+from typing import Dict, Any, List, Optional, Callable, Awaitable, AsyncIterator
+
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# One server run; gunicorn.conf.py sets it in the master so all of its workers share it
+SERVER_ID = os.getenv("SERVER_INSTANCE_ID") or uuid.uuid4().hex
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+def job_owner() -> Dict[str, Any]:
+    """Owner stamp of jobs queued by this process."""
+    return {"server": SERVER_ID, "pid": os.getpid()}
+
+
+def is_orphaned(job: Dict[str, Any]) -> bool:
+    """
+    Whether an unfinished job has no live owner.
+
+    Jobs from an earlier server run or from a worker process that has exited
+    (recycled or crashed) are orphaned; jobs of sibling workers are not.
+    """
+    owner = job.get("owner")
+    if not owner or owner.get("server") != SERVER_ID or owner.get("pid") == os.getpid():
+        return True
+    try:
+        os.kill(owner["pid"], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+# ===== STORAGE BACKENDS =====
+
+class InMemoryJobStore:
+    """Job records kept in process memory."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._keys: Dict[str, str] = {}
+
+    async def save(self, job: Dict[str, Any]):
+        self._jobs[job["id"]] = job
+        self._keys[job["key"]] = job["id"]
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def find_by_key(self, key: str) -> Optional[Dict[str, Any]]:
+        job_id = self._keys.get(key)
+        return self._jobs.get(job_id) if job_id else None
+
+    async def list_unfinished(self) -> List[Dict[str, Any]]:
+        return [job for job in self._jobs.values() if job["status"] not in TERMINAL_STATUSES]
+
+    async def claim_unfinished(self, owner: Dict[str, Any]) -> List[Dict[str, Any]]:
+        claimed = [job for job in await self.list_unfinished() if is_orphaned(job)]
+        for job in claimed:
+            job.update(status="queued", owner=owner)
+        return claimed
+
+    async def purge_expired(self, now: float) -> int:
+        expired = [job for job in self._jobs.values() if job.get("expires_at") and job["expires_at"] <= now]
+        for job in expired:
+            del self._jobs[job["id"]]
+            if self._keys.get(job["key"]) == job["id"]:
+                del self._keys[job["key"]]
+        return len(expired)
+
+
+class SQLiteJobStore:
+    """Durable job records in a local SQLite database."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("JOB_SQLITE_PATH", "agrismart_jobs.db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = asyncio.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened on first use: a connection must not be inherited by forked workers (gunicorn --preload)
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    key TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    expires_at REAL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs (key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn: Callable, *args):
+        # One shared connection; serialize access and keep it off the event loop
+        async with self._lock:
+            return await asyncio.to_thread(fn, *args)
+
+    def _write(self, conn: sqlite3.Connection, job: Dict[str, Any]):
+        conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, key, status, expires_at, data) VALUES (?, ?, ?, ?, ?)",
+            (job["id"], job["key"], job["status"], job.get("expires_at"), json.dumps(job, default=str))
+        )
+
+    def _save(self, job: Dict[str, Any]):
+        conn = self._connection()
+        self._write(conn, job)
+        conn.commit()
+
+    def _fetch(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        return [json.loads(row[0]) for row in self._connection().execute(sql, params)]
+
+    def _purge(self, now: float) -> int:
+        conn = self._connection()
+        cursor = conn.execute("DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        conn.commit()
+        return cursor.rowcount
+
+    def _claim(self, owner: Dict[str, Any]) -> List[Dict[str, Any]]:
+        # BEGIN IMMEDIATE serializes workers starting at the same time, so each orphan is claimed once
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute("SELECT data FROM jobs WHERE status NOT IN (?, ?)", TERMINAL_STATUSES)
+            claimed = [job for job in (json.loads(row[0]) for row in rows) if is_orphaned(job)]
+            for job in claimed:
+                job.update(status="queued", owner=owner)
+                self._write(conn, job)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return claimed
+
+    async def save(self, job: Dict[str, Any]):
+        await self._run(self._save, job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(self._fetch, "SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    async def find_by_key(self, key: str) -> Optional[Dict[str, Any]]:
+        rows = await self._run(
+            self._fetch,
+            "SELECT data FROM jobs WHERE key = ? ORDER BY rowid DESC LIMIT 1",
+            (key,)
+        )
+        return rows[0] if rows else None
+
+    async def list_unfinished(self) -> List[Dict[str, Any]]:
+        return await self._run(
+            self._fetch,
+            "SELECT data FROM jobs WHERE status NOT IN (?, ?)",
+            TERMINAL_STATUSES
+        )
+
+    async def claim_unfinished(self, owner: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await self._run(self._claim, owner)
+
+    async def purge_expired(self, now: float) -> int:
+        return await self._run(self._purge, now)
+
+
+def create_job_store(backend: Optional[str] = None):
+    """Build the job store selected by JOB_BACKEND (memory or sqlite)."""
+    backend = (backend or os.getenv("JOB_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        return SQLiteJobStore()
+    if backend == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unsupported JOB_BACKEND: {backend}")
+
+
+# ===== QUEUE =====
+
+class JobQueue:
+    """Priority queue of agent jobs drained by a bounded pool of async workers."""
+
+    def __init__(
+        self,
+        store=None,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        result_ttl: Optional[float] = None
+    ):
+        """Initialize the queue from arguments or environment settings."""
+        self.store = store or create_job_store()
+        self.num_workers = workers or int(os.getenv("JOB_WORKERS", 4))
+        self.max_size = max_size or int(os.getenv("JOB_QUEUE_MAX_SIZE", 1000))
+        self.result_ttl = result_ttl or float(os.getenv("JOB_RESULT_TTL_SECONDS", 3600))
+        # How often subscribers re-read a job that may be running in another worker process
+        self.poll_interval = float(os.getenv("JOB_POLL_SECONDS", 2))
+
+        self._handlers: Dict[str, JobHandler] = {}
+        # Kinds whose result depends on data that changes after it ran (see register)
+        self._rerun_kinds = set()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._seq = 0
+        self.running = 0
+
+    def register(self, kind: str, handler: JobHandler, reuse_results: bool = True):
+        """
+        Register the coroutine that executes jobs of a given kind.
+
+        With reuse_results=False (maintenance jobs that read the current data,
+        such as exports) an identical submission only joins a job that is still
+        queued; once it has started, a new submission runs again.
+        """
+        self._handlers[kind] = handler
+        if reuse_results:
+            self._rerun_kinds.discard(kind)
+        else:
+            self._rerun_kinds.add(kind)
+
+    @staticmethod
+    def job_key(kind: str, payload: Dict[str, Any]) -> str:
+        """Identity of a job; identical submissions share one result."""
+        body = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(f"{kind}:{body}".encode()).hexdigest()
+
+    async def start(self):
+        """Start workers and re-enqueue unfinished jobs that no live worker owns."""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+
+        for job in await self.store.claim_unfinished(job_owner()):
+            self._enqueue(job)
+
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def stop(self):
+        """Cancel workers; unfinished jobs stay in the store for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _enqueue(self, job: Dict[str, Any]):
+        self._seq += 1
+        self._queue.put_nowait((job["priority"], self._seq, job["id"]))
+
+    async def submit(self, kind: str, payload: Dict[str, Any], priority: int = 5) -> Dict[str, Any]:
+        """
+        Submit a job, or return the existing one for an identical pending or fresh submission.
+
+        Args:
+            kind: Registered job kind
+            payload: JSON-serializable handler arguments
+            priority: Lower values run first
+
+        Returns:
+            The job record
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        key = self.job_key(kind, payload)
+        existing = await self.store.find_by_key(key)
+        if existing and kind in self._rerun_kinds:
+            if existing["status"] == "queued":
+                return existing
+        elif existing and existing["status"] != "failed":
+            expires_at = existing.get("expires_at")
+            if expires_at is None or expires_at > time.time():
+                return existing
+
+        if self._queue is None or self._queue.qsize() >= self.max_size:
+            raise QueueFullError("Job queue is full")
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "key": key,
+            "kind": kind,
+            "priority": priority,
+            "status": "queued",
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "expires_at": None,
+            "owner": job_owner(),
+        }
+        await self.store.save(job)
+        self._enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record if it exists and has not expired."""
+        job = await self.store.get(job_id)
+        if job and job.get("expires_at") and job["expires_at"] <= time.time():
+            return None
+        return job
+
+    async def subscribe(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the job record on every status change until it finishes."""
+        updates: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(updates)
+        try:
+            job = await self.get(job_id)
+            status = None
+            while job is not None:
+                if job["status"] != status:
+                    status = job["status"]
+                    yield job
+                if status in TERMINAL_STATUSES:
+                    return
+                try:
+                    job = await asyncio.wait_for(updates.get(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    # Jobs run by another worker process only show up in the store
+                    job = await self.get(job_id)
+        finally:
+            self._subscribers[job_id].remove(updates)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    async def _update(self, job: Dict[str, Any], **fields):
+        job.update(fields)
+        await self.store.save(job)
+        for updates in self._subscribers.get(job["id"], ()):
+            updates.put_nowait(job)
+
+    async def _worker(self):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = await self.store.get(job_id)
+            if job is None or job["status"] != "queued":
+                continue
+
+            self.running += 1
+            await self._update(job, status="running", started_at=time.time())
+            try:
+                result = await self._handlers[job["kind"]](job["payload"])
+                failed = isinstance(result, dict) and result.get("status") == "error"
+                await self._update(
+                    job,
+                    status="failed" if failed else "completed",
+                    result=result,
+                    error=result.get("error") if failed else None,
+                    finished_at=time.time(),
+                    expires_at=time.time() + self.result_ttl
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._update(
+                    job,
+                    status="failed",
+                    error=str(e),
+                    finished_at=time.time(),
+                    expires_at=time.time() + self.result_ttl
+                )
+            finally:
+                self.running -= 1
+
+    async def _janitor(self):
+        while True:
+            await asyncio.sleep(60)
+            await self.store.purge_expired(time.time())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue depth and worker utilization."""
+        return {
+            "backend": type(self.store).__name__,
+            "workers": self.num_workers,
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_size": self.max_size,
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
@@ -0,0 +1,457 @@
+"""
+Metrics
+In-process counters, gauges and latency histograms rendered in the Prometheus text format.
+"""
+
+import os
+import copy
+import json
+import time
+import fcntl
+import asyncio
+import functools
+import inspect
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Callable, Iterable, Tuple
+
+
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds; covers cache hits (sub-millisecond) up to slow model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+# Agent and method of the call in progress, used to label model calls made inside it
+current_agent: ContextVar[Tuple[str, str]] = ContextVar("current_agent", default=("", ""))
+
+
+# ===== METRIC TYPES =====
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """A metric family; one child per combination of label values."""
+
+    kind = ""
+    child_class: type = _CounterChild
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values: str):
+        """The child for these label values (positional, in labelnames order)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> List[Tuple[LabelValues, Any]]:
+        # list() copies atomically, so a scrape in a worker thread never sees the dict resize
+        return [(values, self._sample(child)) for values, child in list(self._children.items())]
+
+    @staticmethod
+    def _sample(child) -> Any:
+        return child.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    child_class = _GaugeChild
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    @staticmethod
+    def _sample(child) -> Any:
+        return {"counts": list(child.counts), "sum": child.sum}
+
+
+class CallbackMetric:
+    """Counter or gauge read from existing stats at scrape time (nothing recorded on the hot path)."""
+
+    def __init__(self, name: str, kind: str, help: str, labelnames: Iterable[str], fn: Callable[[], Dict[LabelValues, float]]):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self) -> List[Tuple[LabelValues, Any]]:
+        try:
+            return [(tuple(values), float(value)) for values, value in self.fn().items()]
+        except Exception:
+            return []
+
+
+# ===== REGISTRY =====
+
+class MetricsRegistry:
+    """
+    Metric families of this process, optionally merged with sibling worker processes.
+
+    Recording only touches in-process objects. With `multiprocess_dir` set,
+    each worker writes its snapshot there every `flush_interval` seconds (and
+    on scrape); a scrape merges all snapshots. Counters and histograms of
+    exited workers are kept, gauges only count live workers.
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = None, flush_interval: Optional[float] = None):
+        self.multiprocess_dir = multiprocess_dir if multiprocess_dir is not None else os.getenv("METRICS_MULTIPROC_DIR")
+        self.flush_interval = flush_interval or float(os.getenv("METRICS_FLUSH_SECONDS", 5))
+        self._metrics: Dict[str, Any] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self._snapshot_name: Optional[str] = None
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name: str, kind: str, help: str, labelnames: Iterable[str], fn: Callable[[], Dict[LabelValues, float]]):
+        """Register a counter/gauge whose samples come from `fn` at scrape time."""
+        return self.register(CallbackMetric(name, kind, help, labelnames, fn))
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """All families with their current samples (JSON-serializable)."""
+        return {
+            name: {
+                "kind": metric.kind,
+                "help": metric.help,
+                "labelnames": list(metric.labelnames),
+                "buckets": list(getattr(metric, "buckets", ())),
+                "samples": [[list(values), value] for values, value in metric.samples()],
+            }
+            for name, metric in self._metrics.items()
+        }
+
+    # ===== MULTI-PROCESS =====
+
+    def _own_snapshot_path(self) -> str:
+        if self._snapshot_name is None:
+            # Unique per process lifetime, so a reused pid never overwrites an exited worker's counts
+            self._snapshot_name = f"{os.getpid()}-{time.time_ns()}.json"
+        return os.path.join(self.multiprocess_dir, self._snapshot_name)
+
+    def flush(self):
+        """Write this process's snapshot for sibling workers to merge."""
+        if not self.multiprocess_dir:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        path = self._own_snapshot_path()
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    async def start(self):
+        """Flush the snapshot periodically (multi-process mode only)."""
+        if self.multiprocess_dir and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self.multiprocess_dir:
+            self.flush()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _is_alive(snapshot_name: str) -> bool:
+        try:
+            os.kill(int(snapshot_name.split("-", 1)[0]), 0)
+        except (ValueError, ProcessLookupError):
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _collect_processes(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Merge the snapshots of all worker processes.
+
+        Snapshots of exited workers are folded into archive.json (counters
+        and histograms only) and removed, so the directory stays small.
+        """
+        self.flush()
+        directory = self.multiprocess_dir
+        with open(os.path.join(directory, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(directory, "archive.json")
+            archive = _read_snapshot(archive_path)
+            live = []
+            exited = []
+            for name in os.listdir(directory):
+                if not name.endswith(".json") or name == "archive.json":
+                    continue
+                (live if self._is_alive(name) else exited).append(name)
+
+            if exited:
+                for name in exited:
+                    _merge(archive, _read_snapshot(os.path.join(directory, name)), include_gauges=False)
+                with open(f"{archive_path}.tmp", "w") as f:
+                    json.dump(archive, f)
+                os.replace(f"{archive_path}.tmp", archive_path)
+                for name in exited:
+                    os.remove(os.path.join(directory, name))
+
+        merged: Dict[str, Dict[str, Any]] = {}
+        _merge(merged, archive, include_gauges=False)
+        for name in live:
+            _merge(merged, _read_snapshot(os.path.join(directory, name)), include_gauges=True)
+        return merged
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        families = self._collect_processes() if self.multiprocess_dir else self.snapshot()
+        lines: List[str] = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            labelnames = family["labelnames"]
+            for values, value in family["samples"]:
+                labels = _format_labels(labelnames, values)
+                if family["kind"] != "histogram":
+                    lines.append(f"{name}{{{labels}}} {_format_value(value)}" if labels else f"{name} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                prefix = f"{labels}," if labels else ""
+                for bound, count in zip([*family["buckets"], float("inf")], value["counts"]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{prefix}le="{_format_value(bound)}"}} {cumulative}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{suffix} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _read_snapshot(path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _merge(into: Dict[str, Dict[str, Any]], snapshot: Dict[str, Dict[str, Any]], include_gauges: bool):
+    """Add a snapshot's samples into `into` (histogram buckets and sums are added element-wise)."""
+    for name, family in snapshot.items():
+        if family["kind"] == "gauge" and not include_gauges:
+            continue
+        target = into.setdefault(name, {**family, "samples": []})
+        index = {tuple(sample[0]): sample for sample in target["samples"]}
+        for values, value in family["samples"]:
+            existing = index.get(tuple(values))
+            if existing is None:
+                sample = [values, copy.deepcopy(value)]
+                target["samples"].append(sample)
+                index[tuple(values)] = sample
+            elif family["kind"] == "histogram":
+                existing[1]["counts"] = [a + b for a, b in zip(existing[1]["counts"], value["counts"])]
+                existing[1]["sum"] += value["sum"]
+            else:
+                existing[1] += value
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: List[str], values: List[str]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values))
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ===== STANDARD METRICS =====
+
+HTTP_DURATION = REGISTRY.histogram(
+    "agrismart_http_request_duration_seconds",
+    "HTTP request latency by route template, until the last body byte is sent.",
+    ("method", "route", "status")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("agrismart_http_requests_in_flight", "HTTP requests being handled.").labels()
+HTTP_CANCELLED = REGISTRY.counter(
+    "agrismart_http_requests_cancelled_total",
+    "Requests whose handler was cancelled; reason is disconnect (client left) or deadline.",
+    ("method", "route", "reason")
+)
+RENDER_DURATION = REGISTRY.histogram(
+    "agrismart_response_render_seconds",
+    "Time to serialize a response body.",
+    ("format",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+AGENT_DURATION = REGISTRY.histogram(
+    "agrismart_agent_call_duration_seconds",
+    "Agent method latency; outcome is the returned status, 'exception' or 'cancelled'.",
+    ("agent", "method", "outcome")
+)
+LLM_DURATION = REGISTRY.histogram(
+    "agrismart_llm_request_duration_seconds",
+    "Gemini request latency (whole response); outcome is ok, error or cancelled.",
+    ("model", "agent", "outcome")
+)
+LLM_FIRST_TOKEN = REGISTRY.histogram(
+    "agrismart_llm_time_to_first_token_seconds",
+    "Time until the first chunk of a streamed Gemini response.",
+    ("model", "agent")
+)
+LLM_IN_FLIGHT = REGISTRY.gauge("agrismart_llm_requests_in_flight", "Gemini requests awaiting a response.", ("model",))
+LLM_TOKENS = REGISTRY.counter(
+    "agrismart_llm_tokens_total",
+    "Gemini tokens by model and endpoint; kind is input, output or cached (cached is part of input).",
+    ("model", "endpoint", "kind")
+)
+EVENT_LOOP_LAG = REGISTRY.histogram(
+    "agrismart_event_loop_lag_seconds",
+    "How late the event loop woke from a timer; time in which no other request could progress.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+).labels()
+STORAGE_DURATION = REGISTRY.histogram(
+    "agrismart_storage_operation_duration_seconds",
+    "Storage backend call latency (Firestore or SQLite).",
+    ("backend", "operation", "outcome")
+)
+
+
+# ===== INSTRUMENTATION HELPERS =====
+
+async def watch_event_loop(interval: Optional[float] = None):
+    """Record EVENT_LOOP_LAG every `interval` seconds (EVENT_LOOP_LAG_INTERVAL) until cancelled."""
+    interval = interval or float(os.getenv("EVENT_LOOP_LAG_INTERVAL", 0.25))
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0.0))
+
+
+def _instrument_methods(cls, wrap: Callable[[str, Callable], Callable]):
+    """Wrap the public coroutine methods a class defines."""
+    for name, fn in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(fn):
+            setattr(cls, name, functools.wraps(fn)(wrap(name, fn)))
+    return cls
+
+
+def instrument_agent(agent: str):
+    """Class decorator recording the latency and outcome of an agent's public async methods."""
+
+    def wrap(method: str, fn: Callable) -> Callable:
+        async def timed(*args, **kwargs):
+            token = current_agent.set((agent, method))
+            started = time.perf_counter()
+            outcome = "exception"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = result.get("status", "ok") if isinstance(result, dict) else "ok"
+                return result
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                AGENT_DURATION.labels(agent, method, outcome).observe(time.perf_counter() - started)
+                current_agent.reset(token)
+        return timed
+
+    return lambda cls: _instrument_methods(cls, wrap)
+
+
+def instrument_storage(backend: str):
+    """Class decorator recording the latency of a storage backend's public async methods."""
+
+    def wrap(operation: str, fn: Callable) -> Callable:
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = await fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                STORAGE_DURATION.labels(backend, operation, outcome).observe(time.perf_counter() - started)
+        return timed
+
+    return lambda cls: _instrument_methods(cls, wrap)
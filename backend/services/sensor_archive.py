@@ -0,0 +1,490 @@
+"""
+Sensor Archive
+Columnar per-farm, per-month sensor history on disk, read back as memory-mapped NumPy arrays.
+"""
+
+import os
+import json
+import math
+import time
+import shutil
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+import numpy as np
+
+from .storage import StorageBackend
+from .sensor_rollups import to_epoch
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet snapshots are optional
+    pa = pq = None
+
+
+PARQUET_AVAILABLE = pq is not None
+
+# Column name -> on-disk dtype (little-endian, so files are portable between hosts)
+COLUMNS = {
+    "timestamp": np.dtype("<f8"),
+    "value": np.dtype("<f8"),
+    "sensor": np.dtype("<i4"),
+}
+
+EXPORT_FIELDS = ["sensor_id", "sensor_type", "value", "timestamp"]
+
+
+class SensorColumns:
+    """
+    Time-ordered sensor readings as parallel arrays.
+
+    `sensors` holds codes into `sensor_ids`/`sensor_types`. Arrays loaded from
+    a single sorted partition are read-only views of the memory-mapped files.
+    """
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        values: np.ndarray,
+        sensors: np.ndarray,
+        sensor_ids: List[str],
+        sensor_types: List[Optional[str]]
+    ):
+        self.timestamps = timestamps
+        self.values = values
+        self.sensors = sensors
+        self.sensor_ids = sensor_ids
+        self.sensor_types = sensor_types
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def empty(cls, sensor_ids: List[str], sensor_types: List[Optional[str]]) -> "SensorColumns":
+        return cls(*(np.empty(0, dtype) for dtype in COLUMNS.values()), sensor_ids, sensor_types)
+
+    def select(self, sensor_id: str) -> "SensorColumns":
+        """Readings of one sensor (a copy; empty if the sensor is unknown)."""
+        if sensor_id not in self.sensor_ids:
+            return SensorColumns.empty(self.sensor_ids, self.sensor_types)
+        mask = self.sensors == self.sensor_ids.index(sensor_id)
+        return SensorColumns(
+            self.timestamps[mask], self.values[mask], self.sensors[mask], self.sensor_ids, self.sensor_types
+        )
+
+
+def daily_summary(columns: SensorColumns) -> List[Dict[str, Any]]:
+    """Per-UTC-day count, mean, min and max of time-ordered readings."""
+    if not len(columns):
+        return []
+
+    days = (columns.timestamps // 86400).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(days[1:] != days[:-1]) + 1))
+    counts = np.diff(np.append(starts, len(days)))
+    sums = np.add.reduceat(columns.values, starts)
+    mins = np.minimum.reduceat(columns.values, starts)
+    maxs = np.maximum.reduceat(columns.values, starts)
+
+    return [
+        {
+            "day": datetime.fromtimestamp(int(day) * 86400, tz=timezone.utc).date().isoformat(),
+            "count": int(count),
+            "mean": float(total / count),
+            "min": float(low),
+            "max": float(high),
+        }
+        for day, count, total, low, high in zip(days[starts], counts, sums, mins, maxs)
+    ]
+
+
+class SensorArchive:
+    """
+    Append-only columnar sensor history, partitioned by farm and month.
+
+    Layout: <root>/<farm_id>/farm.json holds the interned sensor dictionary and
+    the export watermark; <root>/<farm_id>/<YYYY-MM>/ holds one raw file per
+    column plus a manifest whose row count is authoritative, so a crash in the
+    middle of an append leaves only ignored trailing bytes.
+    """
+
+    def __init__(self, root: Optional[str] = None, chunk_rows: Optional[int] = None):
+        """Initialize the archive from arguments or environment settings."""
+        self.root = root or os.getenv("SENSOR_ARCHIVE_PATH", "sensor_archive")
+        self.chunk_rows = chunk_rows or int(os.getenv("SENSOR_ARCHIVE_CHUNK_ROWS", 50000))
+        self.max_history_days = int(os.getenv("SENSOR_ARCHIVE_MAX_HISTORY_DAYS", 3650))
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._exports: Dict[str, asyncio.Lock] = {}
+
+    def _lock(self, farm_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(farm_id, threading.Lock())
+
+    def _farm_dir(self, farm_id: str) -> str:
+        if not farm_id or "/" in farm_id or "\\" in farm_id or farm_id.startswith("."):
+            raise ValueError(f"Invalid farm ID for archive: {farm_id!r}")
+        return os.path.join(self.root, farm_id)
+
+    # ===== METADATA =====
+
+    @staticmethod
+    def _read_json(path: str, default: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        """Replace a JSON file atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _farm_meta(self, farm_id: str) -> Dict[str, Any]:
+        return self._read_json(
+            os.path.join(self._farm_dir(farm_id), "farm.json"),
+            {"sensors": [], "exported_until": None}
+        )
+
+    @staticmethod
+    def _manifest(partition: str) -> Dict[str, Any]:
+        return SensorArchive._read_json(
+            os.path.join(partition, "manifest.json"),
+            {"rows": 0, "min_ts": None, "max_ts": None, "sorted": True}
+        )
+
+    def months(self, farm_id: str) -> List[str]:
+        """Months (YYYY-MM) with archived readings, oldest first."""
+        farm_dir = self._farm_dir(farm_id)
+        if not os.path.isdir(farm_dir):
+            return []
+        for name in os.listdir(farm_dir):
+            # Finish a compaction interrupted between its two renames
+            if name.endswith(".old") and not os.path.exists(os.path.join(farm_dir, name[:-4])):
+                os.rename(os.path.join(farm_dir, name), os.path.join(farm_dir, name[:-4]))
+        return sorted(
+            name for name in os.listdir(farm_dir)
+            if len(name) == 7 and os.path.isdir(os.path.join(farm_dir, name))
+        )
+
+    # ===== WRITE PATH =====
+
+    def append(self, farm_id: str, readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Append readings to their month partitions.
+
+        Readings without a sensor_id, numeric value or timestamp are skipped.
+        Returns the number appended and the months touched.
+        """
+        with self._lock(farm_id):
+            farm_dir = self._farm_dir(farm_id)
+            meta = self._farm_meta(farm_id)
+            codes = {sensor_id: code for code, (sensor_id, _) in enumerate(meta["sensors"])}
+
+            timestamps, values, sensors = [], [], []
+            for reading in readings:
+                sensor_id = reading.get("sensor_id")
+                value = reading.get("value")
+                if (
+                    sensor_id is None or reading.get("timestamp") is None
+                    or not isinstance(value, (int, float)) or isinstance(value, bool)
+                ):
+                    continue
+                code = codes.get(sensor_id)
+                if code is None:
+                    code = codes[sensor_id] = len(meta["sensors"])
+                    meta["sensors"].append([sensor_id, reading.get("sensor_type")])
+                timestamps.append(to_epoch(reading["timestamp"]))
+                values.append(value)
+                sensors.append(code)
+
+            if not timestamps:
+                return {"appended": 0, "months": []}
+
+            timestamps = np.asarray(timestamps, dtype=COLUMNS["timestamp"])
+            order = np.argsort(timestamps, kind="stable")
+            columns = {
+                "timestamp": timestamps[order],
+                "value": np.asarray(values, dtype=COLUMNS["value"])[order],
+                "sensor": np.asarray(sensors, dtype=COLUMNS["sensor"])[order],
+            }
+
+            # The dictionary must be on disk before any partition references new codes
+            os.makedirs(farm_dir, exist_ok=True)
+            self._write_json(os.path.join(farm_dir, "farm.json"), meta)
+
+            month_ids = columns["timestamp"].astype("datetime64[s]").astype("datetime64[M]")
+            bounds = np.concatenate(([0], np.flatnonzero(month_ids[1:] != month_ids[:-1]) + 1, [len(month_ids)]))
+            months = []
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                month = str(month_ids[start])
+                self._append_partition(
+                    os.path.join(farm_dir, month),
+                    {name: column[start:end] for name, column in columns.items()}
+                )
+                months.append(month)
+
+            return {"appended": len(timestamps), "months": months}
+
+    def _append_partition(self, partition: str, columns: Dict[str, np.ndarray]):
+        os.makedirs(partition, exist_ok=True)
+        manifest = self._manifest(partition)
+        rows = manifest["rows"]
+
+        for name, dtype in COLUMNS.items():
+            with open(os.path.join(partition, f"{name}.bin"), "ab") as f:
+                # Drop bytes past the manifest row count left by an interrupted append
+                f.truncate(rows * dtype.itemsize)
+                columns[name].tofile(f)
+
+        first, last = float(columns["timestamp"][0]), float(columns["timestamp"][-1])
+        self._write_json(os.path.join(partition, "manifest.json"), {
+            "rows": rows + len(columns["timestamp"]),
+            "min_ts": first if manifest["min_ts"] is None else min(manifest["min_ts"], first),
+            "max_ts": last if manifest["max_ts"] is None else max(manifest["max_ts"], last),
+            # Strictly newer: rows at the previous max_ts may repeat one, which compact() removes
+            "sorted": manifest["sorted"] and (manifest["max_ts"] is None or first > manifest["max_ts"]),
+        })
+
+    def compact(self, farm_id: str, month: str) -> bool:
+        """
+        Rewrite a partition in timestamp order, keeping one row per sensor and
+        timestamp; returns whether it needed it.
+        """
+        with self._lock(farm_id):
+            partition = os.path.join(self._farm_dir(farm_id), month)
+            manifest = self._manifest(partition)
+            if manifest["sorted"]:
+                return False
+
+            arrays = self._map_partition(partition, manifest)
+            order = np.lexsort((arrays["sensor"], arrays["timestamp"]))
+            # A retried export appends the readings it wrote before failing again
+            timestamps, sensors = arrays["timestamp"][order], arrays["sensor"][order]
+            keep = np.ones(len(order), dtype=bool)
+            keep[1:] = (timestamps[1:] != timestamps[:-1]) | (sensors[1:] != sensors[:-1])
+            order = order[keep]
+
+            staging = f"{partition}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+            for name in COLUMNS:
+                arrays[name][order].tofile(os.path.join(staging, f"{name}.bin"))
+            self._write_json(
+                os.path.join(staging, "manifest.json"),
+                {**manifest, "rows": len(order), "sorted": True}
+            )
+            del arrays
+
+            os.rename(partition, f"{partition}.old")
+            os.rename(staging, partition)
+            shutil.rmtree(f"{partition}.old")
+            return True
+
+    # ===== READ PATH =====
+
+    @staticmethod
+    def _map_partition(partition: str, manifest: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        rows = manifest["rows"]
+        if rows == 0:
+            return {name: np.empty(0, dtype) for name, dtype in COLUMNS.items()}
+        return {
+            name: np.memmap(os.path.join(partition, f"{name}.bin"), dtype=dtype, mode="r", shape=(rows,))
+            for name, dtype in COLUMNS.items()
+        }
+
+    def iter_partitions(
+        self,
+        farm_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[Tuple[str, SensorColumns]]:
+        """
+        Yield (month, columns) for each partition overlapping [start, end).
+
+        Columns of sorted partitions are zero-copy slices of the memory maps.
+        """
+        farm_dir = self._farm_dir(farm_id)
+        meta = self._farm_meta(farm_id)
+        sensor_ids = [sensor_id for sensor_id, _ in meta["sensors"]]
+        sensor_types = [sensor_type for _, sensor_type in meta["sensors"]]
+        low = to_epoch(start) if start is not None else -math.inf
+        high = to_epoch(end) if end is not None else math.inf
+
+        for month in self.months(farm_id):
+            partition = os.path.join(farm_dir, month)
+            manifest = self._manifest(partition)
+            if manifest["rows"] == 0 or manifest["max_ts"] < low or manifest["min_ts"] >= high:
+                continue
+
+            arrays = self._map_partition(partition, manifest)
+            if not manifest["sorted"]:
+                order = np.argsort(arrays["timestamp"], kind="stable")
+                arrays = {name: column[order] for name, column in arrays.items()}
+
+            first, last = np.searchsorted(arrays["timestamp"], [low, high], side="left")
+            if first == last:
+                continue
+            yield month, SensorColumns(
+                arrays["timestamp"][first:last],
+                arrays["value"][first:last],
+                arrays["sensor"][first:last],
+                sensor_ids,
+                sensor_types
+            )
+
+    def load(
+        self,
+        farm_id: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        sensor_id: Optional[str] = None
+    ) -> SensorColumns:
+        """
+        Load readings in [start, end), optionally for one sensor, oldest first.
+
+        A range inside one month is returned without copying; longer ranges
+        are concatenated.
+        """
+        parts = [columns for _, columns in self.iter_partitions(farm_id, start, end)]
+        if not parts:
+            meta = self._farm_meta(farm_id)
+            columns = SensorColumns.empty(
+                [sensor_id for sensor_id, _ in meta["sensors"]],
+                [sensor_type for _, sensor_type in meta["sensors"]]
+            )
+        elif len(parts) == 1:
+            columns = parts[0]
+        else:
+            columns = SensorColumns(
+                np.concatenate([part.timestamps for part in parts]),
+                np.concatenate([part.values for part in parts]),
+                np.concatenate([part.sensors for part in parts]),
+                parts[-1].sensor_ids,
+                parts[-1].sensor_types
+            )
+        return columns.select(sensor_id) if sensor_id is not None else columns
+
+    def write_parquet(self, farm_id: str, month: str) -> str:
+        """Write a Parquet snapshot of one month partition and return its path."""
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("pyarrow is required for Parquet snapshots")
+
+        start = datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc)
+        end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=timezone.utc)
+        columns = self.load(farm_id, start, end)
+        table = pa.table({
+            "timestamp": pa.array((columns.timestamps * 1e6).astype(np.int64), pa.timestamp("us", tz="UTC")),
+            "sensor_id": pa.DictionaryArray.from_arrays(
+                pa.array(columns.sensors), pa.array(columns.sensor_ids, pa.string())
+            ),
+            "value": pa.array(columns.values),
+        })
+
+        path = os.path.join(self._farm_dir(farm_id), f"{month}.parquet")
+        pq.write_table(table, f"{path}.tmp", compression="zstd")
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    # ===== EXPORT =====
+
+    async def export(self, storage: StorageBackend, farm_id: str, parquet: bool = False) -> Dict[str, Any]:
+        """
+        Append readings newer than the farm's watermark from storage.
+
+        Readings stream in pages and are appended in chunks of chunk_rows, so
+        memory stays bounded on a first export of multi-year history.
+        Readings that arrive with timestamps older than the watermark are not
+        picked up; delete the farm's archive to re-export them. The watermark
+        only moves once the whole export succeeded; a retry after a failure
+        appends the newest readings again, and compaction drops the duplicates.
+        """
+        lock = self._exports.setdefault(farm_id, asyncio.Lock())
+        async with lock:
+            meta = await asyncio.to_thread(self._farm_meta, farm_id)
+            watermark = meta.get("exported_until")
+            since = watermark if watermark is not None else time.time() - self.max_history_days * 86400
+            hours = max(1, math.ceil((time.time() - since) / 3600) + 1)
+
+            exported = 0
+            newest = watermark
+            months = set()
+            chunk: List[Dict[str, Any]] = []
+
+            async def flush():
+                nonlocal exported, chunk
+                result = await asyncio.to_thread(self.append, farm_id, chunk)
+                exported += result["appended"]
+                months.update(result["months"])
+                chunk = []
+
+            # Newest first, so everything after the watermark comes before it
+            async for reading in storage.iter_sensor_data(farm_id, hours=hours, fields=EXPORT_FIELDS):
+                if reading.get("timestamp") is None:
+                    continue
+                epoch = to_epoch(reading["timestamp"])
+                if watermark is not None and epoch <= watermark:
+                    break
+                newest = epoch if newest is None else max(newest, epoch)
+                chunk.append(reading)
+                if len(chunk) >= self.chunk_rows:
+                    await flush()
+            if chunk:
+                await flush()
+
+            for month in sorted(months):
+                await asyncio.to_thread(self.compact, farm_id, month)
+                if parquet:
+                    await asyncio.to_thread(self.write_parquet, farm_id, month)
+
+            if newest is not None and newest != watermark:
+                def save_watermark():
+                    with self._lock(farm_id):
+                        meta = self._farm_meta(farm_id)
+                        meta["exported_until"] = newest
+                        self._write_json(os.path.join(self._farm_dir(farm_id), "farm.json"), meta)
+
+                await asyncio.to_thread(save_watermark)
+
+        return {
+            "status": "success",
+            "farm_id": farm_id,
+            "exported": exported,
+            "months": sorted(months),
+            "exported_until": (
+                datetime.fromtimestamp(newest, tz=timezone.utc).isoformat() if newest is not None else None
+            ),
+        }
+
+    def get_stats(self, farm_id: str) -> Dict[str, Any]:
+        """Archived months, row counts, bytes on disk and the export watermark."""
+        farm_dir = self._farm_dir(farm_id)
+        meta = self._farm_meta(farm_id)
+        partitions = []
+        for month in self.months(farm_id):
+            manifest = self._manifest(os.path.join(farm_dir, month))
+            partitions.append({
+                "month": month,
+                "rows": manifest["rows"],
+                "bytes": manifest["rows"] * sum(dtype.itemsize for dtype in COLUMNS.values()),
+                "sorted": manifest["sorted"],
+            })
+
+        watermark = meta.get("exported_until")
+        return {
+            "farm_id": farm_id,
+            "sensors": len(meta["sensors"]),
+            "rows": sum(p["rows"] for p in partitions),
+            "partitions": partitions,
+            "exported_until": (
+                datetime.fromtimestamp(watermark, tz=timezone.utc).isoformat() if watermark is not None else None
+            ),
+            "parquet_available": PARQUET_AVAILABLE,
+        }
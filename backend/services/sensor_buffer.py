@@ -0,0 +1,337 @@
+"""
+Sensor Ring Buffer
+Most recent sensor readings per farm in typed NumPy columns, for live dashboards and alerting.
+"""
+
+import os
+import json
+import mmap
+import time
+import fcntl
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from .sensor_rollups import to_epoch
+
+
+INITIAL_CAPACITY = 1024
+
+# Shared ring file header: magic, capacity, readings ever appended (uint64 words)
+RING_MAGIC = 0x31474E4952534741
+HEADER_BYTES = 64
+
+Reading = Tuple[str, float, float, Optional[str]]
+
+
+class SensorRingBuffer:
+    """
+    Fixed-capacity ring of (timestamp, value, sensor code) readings for one farm.
+
+    Sensor IDs are interned to int32 codes, so a reading costs 20 bytes.
+    Columns start small and double until they reach `capacity`; once full,
+    each append overwrites the oldest reading.
+    """
+
+    __slots__ = ("capacity", "timestamps", "values", "sensors", "sensor_ids", "sensor_types", "_codes", "_head", "_size")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        allocated = min(capacity, INITIAL_CAPACITY)
+        self.timestamps = np.empty(allocated, dtype=np.float64)
+        self.values = np.empty(allocated, dtype=np.float64)
+        self.sensors = np.empty(allocated, dtype=np.int32)
+        self.sensor_ids: List[str] = []
+        self.sensor_types: List[Optional[str]] = []
+        self._codes: Dict[str, int] = {}
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes + self.sensors.nbytes
+
+    def _intern(self, sensor_id: str, sensor_type: Optional[str]) -> int:
+        code = self._codes.get(sensor_id)
+        if code is None:
+            code = self._codes[sensor_id] = len(self.sensor_ids)
+            self.sensor_ids.append(sensor_id)
+            self.sensor_types.append(sensor_type)
+        return code
+
+    def _grow(self):
+        # Only called before the ring wraps, so the used region is [0, _size)
+        allocated = min(self.capacity, len(self.timestamps) * 2)
+        for name in ("timestamps", "values", "sensors"):
+            column = getattr(self, name)
+            grown = np.empty(allocated, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def append(self, sensor_id: str, value: float, timestamp: float, sensor_type: Optional[str] = None):
+        """Add one reading (amortized O(1))."""
+        if self._head == len(self.timestamps) and len(self.timestamps) < self.capacity:
+            self._grow()
+        head = self._head % len(self.timestamps)
+        self.timestamps[head] = timestamp
+        self.values[head] = value
+        self.sensors[head] = self._intern(sensor_id, sensor_type)
+        self._head = head + 1
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, readings: List[Reading]):
+        """Add (sensor_id, value, timestamp, sensor_type) readings in order."""
+        for sensor_id, value, timestamp, sensor_type in readings:
+            self.append(sensor_id, value, timestamp, sensor_type)
+
+    def _window(self, since: float, sensor_id: Optional[str] = None) -> np.ndarray:
+        """Indices of stored readings at or after `since`, optionally of one sensor."""
+        mask = self.timestamps[:self._size] >= since
+        if sensor_id is not None:
+            code = self._codes.get(sensor_id)
+            if code is None:
+                return np.empty(0, dtype=np.intp)
+            mask &= self.sensors[:self._size] == code
+        return np.flatnonzero(mask)
+
+    def readings(self, since: float, sensor_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Readings at or after `since` as time-ordered column copies."""
+        index = self._window(since, sensor_id)
+        index = index[np.argsort(self.timestamps[index], kind="stable")]
+        return {
+            "timestamps": self.timestamps[index],
+            "values": self.values[index],
+            "sensors": self.sensors[index],
+        }
+
+    def summary(self, since: float) -> List[Dict[str, Any]]:
+        """Per-sensor count, mean, min, max and latest reading at or after `since`."""
+        index = self._window(since)
+        if not len(index):
+            return []
+
+        timestamps = self.timestamps[index]
+        values = self.values[index]
+        sensors = self.sensors[index]
+        sensor_count = len(self.sensor_ids)
+
+        counts = np.bincount(sensors, minlength=sensor_count)
+        sums = np.bincount(sensors, weights=values, minlength=sensor_count)
+        mins = np.full(sensor_count, np.inf)
+        maxs = np.full(sensor_count, -np.inf)
+        np.minimum.at(mins, sensors, values)
+        np.maximum.at(maxs, sensors, values)
+
+        # Last occurrence of each sensor in time order is its latest reading
+        order = np.argsort(timestamps, kind="stable")[::-1]
+        codes, first = np.unique(sensors[order], return_index=True)
+        latest = dict(zip(codes.tolist(), order[first].tolist()))
+
+        return [
+            {
+                "sensor_id": self.sensor_ids[code],
+                "sensor_type": self.sensor_types[code],
+                "count": int(counts[code]),
+                "mean": float(sums[code] / counts[code]),
+                "min": float(mins[code]),
+                "max": float(maxs[code]),
+                "latest_value": float(values[latest[code]]),
+                "latest_at": float(timestamps[latest[code]]),
+            }
+            for code in codes.tolist()
+        ]
+
+
+class SharedSensorRingBuffer(SensorRingBuffer):
+    """
+    SensorRingBuffer in a memory-mapped file that every worker process maps.
+
+    The file holds a small header and the three columns at full capacity
+    (sparse: pages are only allocated once written). The header counts
+    readings ever appended, and sensor IDs go to an append-only sidecar, so
+    all processes derive the same codes. Writers hold an exclusive flock on
+    the ring file and readers a shared one.
+    """
+
+    __slots__ = ("path", "_ring", "_map", "_header", "_names", "_names_read")
+
+    def __init__(self, path: str, capacity: int):
+        super().__init__(0)
+        self.path = path
+        self._ring = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._names = os.open(f"{path}.sensors", os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self._names_read = 0
+
+        with self._locked(fcntl.LOCK_EX):
+            if os.fstat(self._ring).st_size < HEADER_BYTES:
+                os.ftruncate(self._ring, HEADER_BYTES + capacity * 20)
+                os.pwrite(self._ring, np.array([RING_MAGIC, capacity, 0], dtype=np.uint64).tobytes(), 0)
+            self._map = mmap.mmap(self._ring, 0)
+
+        self._header = np.frombuffer(self._map, dtype=np.uint64, count=3)
+        if int(self._header[0]) != RING_MAGIC:
+            raise ValueError(f"Not a sensor ring file: {path}")
+
+        # An existing ring keeps the capacity it was created with
+        self.capacity = capacity = int(self._header[1])
+        offset = HEADER_BYTES
+        self.timestamps = np.frombuffer(self._map, dtype=np.float64, count=capacity, offset=offset)
+        offset += capacity * 8
+        self.values = np.frombuffer(self._map, dtype=np.float64, count=capacity, offset=offset)
+        offset += capacity * 8
+        self.sensors = np.frombuffer(self._map, dtype=np.int32, count=capacity, offset=offset)
+
+    def __len__(self) -> int:
+        return min(int(self._header[2]), self.capacity)
+
+    @contextmanager
+    def _locked(self, operation: int):
+        fcntl.flock(self._ring, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._ring, fcntl.LOCK_UN)
+
+    def _sync(self):
+        """Pick up readings and sensor IDs appended by other processes."""
+        appended = int(self._header[2])
+        self._size = min(appended, self.capacity)
+        self._head = appended % self.capacity
+
+        size = os.fstat(self._names).st_size
+        if size > self._names_read:
+            data = os.pread(self._names, size - self._names_read, self._names_read)
+            for line in data.splitlines():
+                SensorRingBuffer._intern(self, *json.loads(line))
+            self._names_read = size
+
+    def _intern(self, sensor_id: str, sensor_type: Optional[str]) -> int:
+        code = self._codes.get(sensor_id)
+        if code is None:
+            # Called with the exclusive lock held and the sidecar fully read
+            code = super()._intern(sensor_id, sensor_type)
+            line = (json.dumps([sensor_id, sensor_type]) + "\n").encode()
+            os.write(self._names, line)
+            self._names_read += len(line)
+        return code
+
+    def append(self, sensor_id: str, value: float, timestamp: float, sensor_type: Optional[str] = None):
+        self.extend([(sensor_id, value, timestamp, sensor_type)])
+
+    def extend(self, readings: List[Reading]):
+        with self._locked(fcntl.LOCK_EX):
+            self._sync()
+            appended = int(self._header[2])
+            for sensor_id, value, timestamp, sensor_type in readings:
+                SensorRingBuffer.append(self, sensor_id, value, timestamp, sensor_type)
+            self._header[2] = appended + len(readings)
+
+    def readings(self, since: float, sensor_id: Optional[str] = None) -> Dict[str, np.ndarray]:
+        with self._locked(fcntl.LOCK_SH):
+            self._sync()
+            return super().readings(since, sensor_id)
+
+    def summary(self, since: float) -> List[Dict[str, Any]]:
+        with self._locked(fcntl.LOCK_SH):
+            self._sync()
+            return super().summary(since)
+
+
+class RecentSensorReadings:
+    """
+    Per-farm SensorRingBuffers holding the last `hours` of readings.
+
+    With `shared_dir` set (e.g. under /dev/shm), buffers are memory-mapped
+    files, so every worker process of a multi-worker server sees all
+    readings while the data is held once.
+    """
+
+    def __init__(self, capacity: Optional[int] = None, hours: Optional[float] = None, shared_dir: Optional[str] = None):
+        """Initialize the buffers from arguments or environment settings."""
+        self.capacity = capacity or int(os.getenv("SENSOR_BUFFER_CAPACITY", 100000))
+        self.hours = hours or float(os.getenv("SENSOR_BUFFER_HOURS", 24))
+        self.shared_dir = shared_dir or os.getenv("SENSOR_BUFFER_SHARED_DIR") or None
+        self._farms: Dict[str, SensorRingBuffer] = {}
+
+        if self.shared_dir:
+            os.makedirs(self.shared_dir, exist_ok=True)
+
+    def _ring_path(self, farm_id: str) -> str:
+        return os.path.join(self.shared_dir, f"{quote(farm_id, safe='')}.ring")
+
+    def _buffer(self, farm_id: str, create: bool = False) -> Optional[SensorRingBuffer]:
+        """A farm's buffer; shared rings created by other workers are opened on first access."""
+        buffer = self._farms.get(farm_id)
+        if buffer is not None:
+            return buffer
+
+        if self.shared_dir:
+            path = self._ring_path(farm_id)
+            if create or os.path.exists(path):
+                buffer = self._farms[farm_id] = SharedSensorRingBuffer(path, self.capacity)
+        elif create:
+            buffer = self._farms[farm_id] = SensorRingBuffer(self.capacity)
+        return buffer
+
+    def extend(self, farm_id: str, readings: List[Dict[str, Any]]) -> int:
+        """
+        Add readings for a farm; returns how many were kept.
+
+        Readings without a sensor_id, numeric value or timestamp, or older
+        than the retention window, are skipped.
+        """
+        cutoff = time.time() - self.hours * 3600
+        kept = []
+        for reading in readings:
+            value = reading.get("value")
+            if (
+                reading.get("sensor_id") is None or reading.get("timestamp") is None
+                or not isinstance(value, (int, float)) or isinstance(value, bool)
+            ):
+                continue
+            epoch = to_epoch(reading["timestamp"])
+            if epoch < cutoff:
+                continue
+            kept.append((reading["sensor_id"], value, epoch, reading.get("sensor_type")))
+
+        if kept:
+            self._buffer(farm_id, create=True).extend(kept)
+        return len(kept)
+
+    def _since(self, minutes: Optional[float]) -> float:
+        window = min(minutes * 60, self.hours * 3600) if minutes else self.hours * 3600
+        return time.time() - window
+
+    def summary(self, farm_id: str, minutes: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Per-sensor statistics over the last `minutes` (default: the whole retention window)."""
+        buffer = self._buffer(farm_id)
+        return buffer.summary(self._since(minutes)) if buffer is not None else []
+
+    def readings(self, farm_id: str, sensor_id: str, minutes: Optional[float] = None) -> Dict[str, List[float]]:
+        """A sensor's buffered readings over the last `minutes`, oldest first."""
+        buffer = self._buffer(farm_id)
+        if buffer is None:
+            return {"timestamps": [], "values": []}
+        columns = buffer.readings(self._since(minutes), sensor_id)
+        return {"timestamps": columns["timestamps"].tolist(), "values": columns["values"].tolist()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Buffered farms, readings and bytes held."""
+        if self.shared_dir:
+            for name in os.listdir(self.shared_dir):
+                if name.endswith(".ring"):
+                    self._buffer(unquote(name[:-len(".ring")]))
+
+        return {
+            "farms": len(self._farms),
+            "readings": sum(len(buffer) for buffer in self._farms.values()),
+            "bytes": sum(buffer.nbytes for buffer in self._farms.values()),
+            "capacity_per_farm": self.capacity,
+            "hours": self.hours,
+            "shared": bool(self.shared_dir),
+        }
@@ -0,0 +1,118 @@
+"""
+Sensor Rollups
+Incremental min/max/mean/count aggregates of sensor readings at fixed time resolutions.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# Resolution name -> bucket width in seconds, finest first
+RESOLUTIONS = {
+    "5m": 300,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+DEFAULT_MAX_POINTS = 500
+
+# (sensor_id, resolution, bucket start epoch) -> aggregate
+RollupKey = Tuple[str, str, int]
+
+
+def to_epoch(ts: Any) -> float:
+    """Seconds since epoch for a datetime (naive values are UTC) or a number."""
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return ts.timestamp()
+    return float(ts)
+
+
+def bucket_start(epoch: float, resolution: str) -> int:
+    """Start of the bucket containing `epoch`."""
+    width = RESOLUTIONS[resolution]
+    return int(epoch // width * width)
+
+
+def aggregate_readings(readings: List[Dict[str, Any]]) -> Dict[RollupKey, Dict[str, Any]]:
+    """
+    Fold readings into per-bucket aggregates for every resolution.
+
+    Readings without a sensor_id or numeric value are skipped.
+    """
+    aggregates: Dict[RollupKey, Dict[str, Any]] = {}
+
+    for reading in readings:
+        sensor_id = reading.get("sensor_id")
+        value = reading.get("value")
+        if sensor_id is None or not isinstance(value, (int, float)) or reading.get("timestamp") is None:
+            continue
+
+        epoch = to_epoch(reading["timestamp"])
+        for resolution in RESOLUTIONS:
+            key = (sensor_id, resolution, bucket_start(epoch, resolution))
+            agg = aggregates.get(key)
+            if agg is None:
+                aggregates[key] = {
+                    "sensor_type": reading.get("sensor_type"),
+                    "count": 1,
+                    "sum": value,
+                    "min": value,
+                    "max": value,
+                }
+            else:
+                agg["count"] += 1
+                agg["sum"] += value
+                if value < agg["min"]:
+                    agg["min"] = value
+                if value > agg["max"]:
+                    agg["max"] = value
+
+    return aggregates
+
+
+def merge_aggregates(target: Dict[RollupKey, Dict[str, Any]], source: Dict[RollupKey, Dict[str, Any]]):
+    """Combine two sets of aggregates into `target` in place."""
+    for key, agg in source.items():
+        current = target.get(key)
+        if current is None:
+            target[key] = agg
+            continue
+        current["count"] += agg["count"]
+        current["sum"] += agg["sum"]
+        current["min"] = min(current["min"], agg["min"])
+        current["max"] = max(current["max"], agg["max"])
+
+
+def rollup_doc_id(farm_id: str, key: RollupKey) -> str:
+    """Deterministic document ID of a rollup bucket."""
+    sensor_id, resolution, bucket = key
+    return f"{farm_id}__{sensor_id}__{resolution}__{bucket}".replace("/", "_")
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: Optional[int] = None) -> str:
+    """
+    Pick the finest resolution that returns at most `max_points` buckets per sensor.
+
+    Falls back to the coarsest resolution for very long ranges.
+    """
+    span = to_epoch(end) - to_epoch(start)
+    limit = max_points or DEFAULT_MAX_POINTS
+
+    for resolution, width in RESOLUTIONS.items():
+        if span / width <= limit:
+            return resolution
+    return list(RESOLUTIONS)[-1]
+
+
+def to_point(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Format a stored rollup document as a series point."""
+    count = doc.get("count") or 0
+    return {
+        "bucket": datetime.fromtimestamp(doc["bucket"], tz=timezone.utc).isoformat(),
+        "count": count,
+        "min": doc.get("min"),
+        "max": doc.get("max"),
+        "mean": doc["sum"] / count if count else None,
+    }
@@ -0,0 +1,1040 @@
+"""
+SQLite Storage
+Embedded storage backend for edge sites and CI, with the same surface as FirestoreService.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, AsyncIterator, Callable, Tuple
+
+from .metrics import instrument_storage
+from .storage import (
+    DEFAULT_PAGE_SIZE,
+    StorageBackend,
+    alert_severity,
+    decode_cursor,
+    encode_cursor,
+    format_alert_counts,
+)
+from .sensor_rollups import (
+    RESOLUTIONS,
+    aggregate_readings,
+    bucket_start,
+    choose_resolution,
+    merge_aggregates,
+    rollup_doc_id,
+    to_epoch,
+    to_point,
+)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS farms (
+    id TEXT PRIMARY KEY,
+    user_id TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_farms_user ON farms (user_id, id);
+
+CREATE TABLE IF NOT EXISTS crops (
+    id TEXT PRIMARY KEY,
+    farm_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_crops_farm ON crops (farm_id, id);
+
+CREATE TABLE IF NOT EXISTS analyses (
+    id TEXT PRIMARY KEY,
+    farm_id TEXT,
+    type TEXT NOT NULL,
+    request_key TEXT,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_farm_time ON analyses (farm_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_analyses_farm_type_time ON analyses (farm_id, type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_analyses_request_key ON analyses (request_key, timestamp);
+
+CREATE TABLE IF NOT EXISTS sensor_data (
+    id TEXT PRIMARY KEY,
+    farm_id TEXT NOT NULL,
+    sensor_type TEXT,
+    timestamp REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sensor_data_farm_time ON sensor_data (farm_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_sensor_data_farm_type_time ON sensor_data (farm_id, sensor_type, timestamp);
+
+CREATE TABLE IF NOT EXISTS sensor_rollups (
+    id TEXT PRIMARY KEY,
+    farm_id TEXT NOT NULL,
+    sensor_id TEXT NOT NULL,
+    sensor_type TEXT,
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rollups_series ON sensor_rollups (farm_id, sensor_id, resolution, bucket);
+
+CREATE TABLE IF NOT EXISTS irrigation_schedules (
+    id TEXT PRIMARY KEY,
+    farm_id TEXT NOT NULL,
+    active INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_irrigation_farm_active ON irrigation_schedules (farm_id, active);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id TEXT PRIMARY KEY,
+    farm_id TEXT NOT NULL,
+    read INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_farm_read ON alerts (farm_id, read);
+CREATE INDEX IF NOT EXISTS idx_alerts_farm_time ON alerts (farm_id, created_at);
+
+CREATE TABLE IF NOT EXISTS alert_counters (
+    farm_id TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    unread INTEGER NOT NULL,
+    PRIMARY KEY (farm_id, severity)
+);
+
+CREATE TABLE IF NOT EXISTS token_usage (
+    day TEXT NOT NULL,
+    farm_id TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    input_tokens INTEGER NOT NULL,
+    output_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    PRIMARY KEY (day, farm_id, endpoint, model)
+);
+
+-- Flushes already added to token_usage, so a retried flush is skipped
+CREATE TABLE IF NOT EXISTS token_usage_flushes (
+    flush_id TEXT PRIMARY KEY,
+    flushed_at TEXT NOT NULL
+);
+"""
+
+# Merge a rollup bucket the way Firestore's Increment/Minimum/Maximum transforms do
+UPSERT_ROLLUP = """
+INSERT INTO sensor_rollups (id, farm_id, sensor_id, sensor_type, resolution, bucket, count, sum, min, max)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    sensor_type = COALESCE(excluded.sensor_type, sensor_type),
+    count = count + excluded.count,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max)
+"""
+
+INSERT_ANALYSIS = """
+INSERT INTO analyses (id, farm_id, type, request_key, timestamp, data) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+UPSERT_ALERT_COUNTER = """
+INSERT INTO alert_counters (farm_id, severity, total, unread) VALUES (?, ?, ?, ?)
+ON CONFLICT (farm_id, severity) DO UPDATE SET
+    total = total + excluded.total,
+    unread = unread + excluded.unread
+"""
+
+UPSERT_TOKEN_USAGE = """
+INSERT INTO token_usage (day, farm_id, endpoint, model, calls, input_tokens, output_tokens, cached_tokens)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, farm_id, endpoint, model) DO UPDATE SET
+    calls = calls + excluded.calls,
+    input_tokens = input_tokens + excluded.input_tokens,
+    output_tokens = output_tokens + excluded.output_tokens,
+    cached_tokens = cached_tokens + excluded.cached_tokens
+"""
+
+REPLACE_ROLLUP = """
+INSERT OR REPLACE INTO sensor_rollups (id, farm_id, sensor_id, sensor_type, resolution, bucket, count, sum, min, max)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def _dumps(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode_value, separators=(",", ":"))
+
+
+def _loads(raw: str) -> Dict[str, Any]:
+    return json.loads(raw, object_hook=_decode_object)
+
+
+def _new_id() -> str:
+    # Same length as Firestore auto-generated document IDs
+    return uuid.uuid4().hex[:20]
+
+
+def _merge_updates(data: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply an update dict with dotted field paths, like DocumentReference.update."""
+    for path, value in updates.items():
+        target = data
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+    return data
+
+
+@instrument_storage("sqlite")
+class SQLiteStorage(StorageBackend):
+    """
+    Storage backend on a local SQLite database in WAL mode.
+
+    Queries run on a small thread pool; each worker thread keeps its own
+    connection (and its prepared statement cache), so reads proceed in
+    parallel while SQLite serializes writers.
+    """
+
+    def __init__(self, path: Optional[str] = None, workers: Optional[int] = None):
+        """Open (and if needed create) the database from arguments or environment settings."""
+        self.path = path or os.getenv("SQLITE_STORAGE_PATH", "agrismart.db")
+        self.page_size = int(os.getenv("SQLITE_STORAGE_PAGE_SIZE", 500))
+        self.batch_size = int(os.getenv("SQLITE_STORAGE_BATCH_SIZE", 5000))
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv("SQLITE_STORAGE_WORKERS", 4)),
+            thread_name_prefix="sqlite-storage"
+        )
+
+        conn = self._connection()
+        # Databases from before alert counters existed get them rebuilt from their alerts once
+        counters_missing = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alert_counters'"
+        ).fetchone() is None
+        conn.executescript(SCHEMA)
+        if counters_missing:
+            self._rebuild_counters(conn, None)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False,
+                cached_statements=256
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    async def _run(self, fn: Callable, *args):
+        """Run fn(connection, *args) on the thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connection(), *args))
+
+    @staticmethod
+    def _transaction(conn: sqlite3.Connection, statements: List[Tuple[str, list]]):
+        """Execute (sql, rows) pairs with executemany in one write transaction."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _fetch(conn: sqlite3.Connection, sql: str, params: tuple) -> List[tuple]:
+        return conn.execute(sql, params).fetchall()
+
+    async def _write(self, sql: str, rows: list):
+        await self._run(self._transaction, [(sql, rows)])
+
+    async def _update_json(self, table: str, doc_id: str, updates: Dict[str, Any], columns: Dict[str, Any]):
+        """Read-modify-write a document's JSON (and indexed columns) in one transaction."""
+        def update(conn: sqlite3.Connection):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(f"SELECT data FROM {table} WHERE id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    raise KeyError(f"No document to update: {table}/{doc_id}")
+                data = _merge_updates(_loads(row[0]), updates)
+                assignments = "".join(f", {column} = ?" for column in columns)
+                conn.execute(
+                    f"UPDATE {table} SET data = ?{assignments} WHERE id = ?",
+                    (_dumps(data), *columns.values(), doc_id)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        await self._run(update)
+
+    def close(self):
+        """Stop the worker threads and close every connection."""
+        self._executor.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+
+    # ===== PAGINATION =====
+
+    async def _iter_query(
+        self,
+        table: str,
+        where: str,
+        params: tuple,
+        order_column: Optional[str],
+        descending: bool,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[Dict[str, Any], str]]:
+        """
+        Yield (document, resume cursor) pairs one page at a time using keyset pagination.
+
+        Documents are ordered by (order_column, id), or by id when order_column is None,
+        matching the Firestore backend. Cursors carry the raw epoch column value so
+        the keyset comparison is exact.
+        """
+        page_size = page_size or self.page_size
+        comparison = "<" if descending else ">"
+        direction = "DESC" if descending else "ASC"
+        if order_column:
+            select = f"SELECT id, {order_column}, data FROM {table} WHERE {where}"
+            order = f" ORDER BY {order_column} {direction}, id {direction} LIMIT ?"
+            after = f" AND ({order_column} {comparison} ? OR ({order_column} = ? AND id {comparison} ?))"
+        else:
+            select = f"SELECT id, NULL, data FROM {table} WHERE {where}"
+            order = f" ORDER BY id {direction} LIMIT ?"
+            after = f" AND id {comparison} ?"
+
+        projection = set(fields) if fields else None
+
+        while True:
+            if cursor:
+                value, doc_id = decode_cursor(cursor)
+                if order_column:
+                    epoch = to_epoch(value)
+                    rows = await self._run(
+                        self._fetch, select + after + order, (*params, epoch, epoch, doc_id, page_size)
+                    )
+                else:
+                    rows = await self._run(self._fetch, select + after + order, (*params, doc_id, page_size))
+            else:
+                rows = await self._run(self._fetch, select + order, (*params, page_size))
+
+            for doc_id, sort_value, raw in rows:
+                data = _loads(raw)
+                if projection is not None:
+                    data = {k: v for k, v in data.items() if k in projection or k == order_column}
+                data['id'] = doc_id
+                cursor = encode_cursor(sort_value, doc_id)
+                yield data, cursor
+
+            if len(rows) < page_size:
+                return
+
+    async def _page(
+        self,
+        *spec,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Fetch `limit` items plus one look-ahead to know whether another page exists."""
+        items = []
+        next_cursor = None
+        last_cursor = None
+
+        results = self._iter_query(*spec, fields=fields, cursor=cursor, page_size=limit + 1)
+        async with aclosing(results):
+            async for item, item_cursor in results:
+                if len(items) == limit:
+                    next_cursor = last_cursor
+                    break
+                items.append(item)
+                last_cursor = item_cursor
+
+        return {"items": items, "next_cursor": next_cursor}
+
+    async def _iter_items(
+        self,
+        spec: tuple,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        results = self._iter_query(*spec, fields=fields, cursor=cursor)
+        async with aclosing(results):
+            async for item, _ in results:
+                yield item
+
+    # ===== FARM OPERATIONS =====
+
+    async def create_farm(self, farm_id: str, farm_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new farm record."""
+        farm_data['created_at'] = datetime.utcnow()
+        farm_data['updated_at'] = datetime.utcnow()
+
+        await self._write(
+            "INSERT OR REPLACE INTO farms (id, user_id, data) VALUES (?, ?, ?)",
+            [(farm_id, farm_data.get('user_id'), _dumps(farm_data))]
+        )
+
+        return {"status": "success", "farm_id": farm_id}
+
+    async def get_farm(self, farm_id: str) -> Optional[Dict[str, Any]]:
+        """Get farm data by ID."""
+        rows = await self._run(self._fetch, "SELECT data FROM farms WHERE id = ?", (farm_id,))
+        return _loads(rows[0][0]) if rows else None
+
+    async def get_farms(self, farm_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get several farms in one query per 500 IDs."""
+        farms = {farm_id: None for farm_id in farm_ids}
+        for start in range(0, len(farm_ids), 500):
+            chunk = farm_ids[start:start + 500]
+            rows = await self._run(
+                self._fetch,
+                f"SELECT id, data FROM farms WHERE id IN ({','.join('?' * len(chunk))})",
+                tuple(chunk)
+            )
+            for farm_id, raw in rows:
+                farms[farm_id] = _loads(raw)
+        return farms
+
+    async def update_farm(self, farm_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Update farm data."""
+        updates['updated_at'] = datetime.utcnow()
+
+        columns = {'user_id': updates['user_id']} if 'user_id' in updates else {}
+        await self._update_json('farms', farm_id, updates, columns)
+
+        return {"status": "success", "farm_id": farm_id}
+
+    def _farms_query(self, user_id: Optional[str] = None):
+        if user_id:
+            return 'farms', 'user_id = ?', (user_id,), None, False
+        return 'farms', '1 = 1', (), None, False
+
+    async def list_farms(
+        self,
+        user_id: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """List all farms, optionally filtered by user."""
+        return [farm async for farm in self.iter_farms(user_id, fields)]
+
+    def iter_farms(
+        self,
+        user_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream farms page by page with bounded memory."""
+        return self._iter_items(self._farms_query(user_id), fields, cursor)
+
+    async def list_farms_page(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of farms and the cursor of the next page."""
+        return await self._page(*self._farms_query(user_id), limit=limit, cursor=cursor, fields=fields)
+
+    # ===== CROP OPERATIONS =====
+
+    async def add_crop(self, farm_id: str, crop_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a crop to a farm."""
+        crop_data['created_at'] = datetime.utcnow()
+        crop_data['farm_id'] = farm_id
+
+        crop_id = _new_id()
+        await self._write(
+            "INSERT INTO crops (id, farm_id, data) VALUES (?, ?, ?)",
+            [(crop_id, farm_id, _dumps(crop_data))]
+        )
+
+        return {"status": "success", "crop_id": crop_id}
+
+    def _crops_query(self, farm_id: str):
+        return 'crops', 'farm_id = ?', (farm_id,), None, False
+
+    async def get_crops(self, farm_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get all crops for a farm."""
+        return [crop async for crop in self.iter_crops(farm_id, fields)]
+
+    def iter_crops(
+        self,
+        farm_id: str,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a farm's crops page by page with bounded memory."""
+        return self._iter_items(self._crops_query(farm_id), fields, cursor)
+
+    async def get_crops_page(
+        self,
+        farm_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a farm's crops and the cursor of the next page."""
+        return await self._page(*self._crops_query(farm_id), limit=limit, cursor=cursor, fields=fields)
+
+    async def update_crop(self, crop_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Update crop data."""
+        updates['updated_at'] = datetime.utcnow()
+
+        columns = {'farm_id': updates['farm_id']} if 'farm_id' in updates else {}
+        await self._update_json('crops', crop_id, updates, columns)
+
+        return {"status": "success", "crop_id": crop_id}
+
+    # ===== ANALYSIS HISTORY =====
+
+    async def save_analysis(self, analysis_type: str, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Save an analysis result."""
+        analysis_data['type'] = analysis_type
+        analysis_data['timestamp'] = datetime.utcnow()
+
+        row = self._analysis_row(analysis_type, analysis_data)
+        await self._write(INSERT_ANALYSIS, [row])
+
+        return {"status": "success", "analysis_id": row[0]}
+
+    @staticmethod
+    def _analysis_row(analysis_type: str, analysis_data: Dict[str, Any]) -> tuple:
+        return (
+            _new_id(),
+            analysis_data.get('farm_id'),
+            analysis_type,
+            analysis_data.get('request_key'),
+            to_epoch(analysis_data['timestamp']),
+            _dumps(analysis_data)
+        )
+
+    async def get_analyses(
+        self,
+        farm_id: str,
+        analysis_type: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Get analysis history for a farm."""
+        if analysis_type:
+            where, params = 'farm_id = ? AND type = ?', (farm_id, analysis_type)
+        else:
+            where, params = 'farm_id = ?', (farm_id,)
+
+        spec = ('analyses', where, params, 'timestamp', True)
+        page = await self._page(*spec, limit=limit)
+        return page["items"]
+
+    async def save_analyses_bulk(self, analyses: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Save many analyses in one transaction."""
+        now = datetime.utcnow()
+        rows = []
+        for analysis_type, analysis_data in analyses:
+            analysis_data['type'] = analysis_type
+            analysis_data['timestamp'] = now
+            rows.append(self._analysis_row(analysis_type, analysis_data))
+
+        await self._write(INSERT_ANALYSIS, rows)
+
+        return {"status": "success", "written": len(rows), "batches": 1, "retries": 0}
+
+    async def find_analysis(
+        self,
+        request_key: str,
+        max_age_seconds: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get the newest analysis stored for a request key, if recent enough."""
+        cutoff = to_epoch(datetime.utcnow()) - max_age_seconds if max_age_seconds else 0
+        rows = await self._run(
+            self._fetch,
+            "SELECT id, data FROM analyses WHERE request_key = ? AND timestamp >= ? ORDER BY timestamp DESC LIMIT 1",
+            (request_key, cutoff)
+        )
+        if not rows:
+            return None
+
+        analysis_data = _loads(rows[0][1])
+        analysis_data['id'] = rows[0][0]
+        return analysis_data
+
+    # ===== SENSOR DATA =====
+
+    @staticmethod
+    def _sensor_row(reading: Dict[str, Any]) -> tuple:
+        return (
+            _new_id(),
+            reading['farm_id'],
+            reading.get('sensor_type'),
+            to_epoch(reading['timestamp']),
+            _dumps(reading)
+        )
+
+    async def save_sensor_data(self, farm_id: str, sensor_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Save sensor readings."""
+        sensor_data['farm_id'] = farm_id
+        sensor_data['timestamp'] = datetime.utcnow()
+
+        row = self._sensor_row(sensor_data)
+        await self._write(
+            "INSERT INTO sensor_data (id, farm_id, sensor_type, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+            [row]
+        )
+        await self.apply_sensor_rollups(farm_id, aggregate_readings([sensor_data]))
+
+        return {"status": "success", "data_id": row[0]}
+
+    async def save_sensor_data_bulk(
+        self,
+        farm_id: str,
+        readings: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Save many sensor readings with one executemany per transaction.
+
+        Readings and their rollups are committed in chunks of `batch_size`.
+        """
+        now = datetime.utcnow()
+        for reading in readings:
+            reading['farm_id'] = farm_id
+            if not reading.get('timestamp'):
+                reading['timestamp'] = now
+
+        batches = 0
+        for start in range(0, len(readings), self.batch_size):
+            chunk = readings[start:start + self.batch_size]
+            rows = [self._sensor_row(reading) for reading in chunk]
+            await self._run(self._transaction, [
+                ("INSERT INTO sensor_data (id, farm_id, sensor_type, timestamp, data) VALUES (?, ?, ?, ?, ?)", rows),
+                (UPSERT_ROLLUP, self._rollup_rows(farm_id, aggregate_readings(chunk))),
+            ])
+            batches += 1
+
+        return {
+            "status": "success",
+            "farm_id": farm_id,
+            "written": len(readings),
+            "batches": batches,
+            "retries": 0
+        }
+
+    def _sensor_data_query(self, farm_id: str, sensor_type: Optional[str], hours: int):
+        cutoff = to_epoch(datetime.utcnow() - timedelta(hours=hours))
+        if sensor_type:
+            where = 'farm_id = ? AND sensor_type = ? AND timestamp >= ?'
+            return 'sensor_data', where, (farm_id, sensor_type, cutoff), 'timestamp', True
+        return 'sensor_data', 'farm_id = ? AND timestamp >= ?', (farm_id, cutoff), 'timestamp', True
+
+    async def get_sensor_data(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get recent sensor data."""
+        return [reading async for reading in self.iter_sensor_data(farm_id, sensor_type, hours, fields)]
+
+    def iter_sensor_data(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream recent sensor data, newest first, page by page with bounded memory."""
+        return self._iter_items(self._sensor_data_query(farm_id, sensor_type, hours), fields, cursor)
+
+    async def get_sensor_data_page(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of recent sensor data and the cursor of the next page."""
+        return await self._page(
+            *self._sensor_data_query(farm_id, sensor_type, hours),
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+
+    # ===== SENSOR ROLLUPS =====
+
+    @staticmethod
+    def _rollup_rows(farm_id: str, aggregates: Dict[tuple, Dict[str, Any]]) -> List[tuple]:
+        return [
+            (
+                rollup_doc_id(farm_id, key),
+                farm_id,
+                key[0],
+                agg.get('sensor_type'),
+                key[1],
+                key[2],
+                agg['count'],
+                agg['sum'],
+                agg['min'],
+                agg['max'],
+            )
+            for key, agg in aggregates.items()
+        ]
+
+    async def apply_sensor_rollups(
+        self,
+        farm_id: str,
+        aggregates: Dict[tuple, Dict[str, Any]],
+        replace: bool = False
+    ) -> int:
+        """
+        Write rollup aggregates for a farm.
+
+        By default aggregates are merged into existing buckets with an upsert;
+        replace=True overwrites them (backfill).
+
+        Returns:
+            Number of rollup rows written
+        """
+        rows = self._rollup_rows(farm_id, aggregates)
+        await self._write(REPLACE_ROLLUP if replace else UPSERT_ROLLUP, rows)
+        return len(rows)
+
+    async def get_sensor_series(
+        self,
+        farm_id: str,
+        sensor_id: str,
+        start: datetime,
+        end: datetime,
+        resolution: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get a sensor time series from rollups at the coarsest sufficient resolution."""
+        resolution = resolution or choose_resolution(start, end, max_points)
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        rows = await self._run(
+            self._fetch,
+            """
+            SELECT bucket, count, sum, min, max FROM sensor_rollups
+            WHERE farm_id = ? AND sensor_id = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+            ORDER BY bucket
+            """,
+            (farm_id, sensor_id, resolution, bucket_start(to_epoch(start), resolution), int(to_epoch(end)))
+        )
+
+        points = [
+            to_point({"bucket": bucket, "count": count, "sum": total, "min": low, "max": high})
+            for bucket, count, total, low, high in rows
+        ]
+
+        return {
+            "farm_id": farm_id,
+            "sensor_id": sensor_id,
+            "resolution": resolution,
+            "points": points
+        }
+
+    async def backfill_sensor_rollups(self, farm_id: str) -> Dict[str, Any]:
+        """Rebuild all rollups of a farm from its raw sensor readings."""
+        def aggregate(conn: sqlite3.Connection):
+            readings = 0
+            aggregates: Dict[tuple, Dict[str, Any]] = {}
+            rows = conn.execute("SELECT data FROM sensor_data WHERE farm_id = ?", (farm_id,))
+            while True:
+                batch = [_loads(raw) for raw, in rows.fetchmany(10000)]
+                if not batch:
+                    break
+                readings += len(batch)
+                merge_aggregates(aggregates, aggregate_readings(batch))
+            return readings, aggregates
+
+        readings, aggregates = await self._run(aggregate)
+        written = await self.apply_sensor_rollups(farm_id, aggregates, replace=True)
+
+        return {"status": "success", "farm_id": farm_id, "readings": readings, "rollups": written}
+
+    # ===== IRRIGATION SCHEDULES =====
+
+    async def save_irrigation_schedule(
+        self,
+        farm_id: str,
+        schedule_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Save an irrigation schedule."""
+        schedule_data['farm_id'] = farm_id
+        schedule_data['created_at'] = datetime.utcnow()
+
+        schedule_id = _new_id()
+        await self._write(
+            "INSERT INTO irrigation_schedules (id, farm_id, active, created_at, data) VALUES (?, ?, ?, ?, ?)",
+            [(
+                schedule_id,
+                farm_id,
+                int(schedule_data.get('active') is True),
+                to_epoch(schedule_data['created_at']),
+                _dumps(schedule_data)
+            )]
+        )
+
+        return {"status": "success", "schedule_id": schedule_id}
+
+    async def get_active_irrigation_schedule(self, farm_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current active irrigation schedule."""
+        rows = await self._run(
+            self._fetch,
+            "SELECT id, data FROM irrigation_schedules WHERE farm_id = ? AND active = 1 LIMIT 1",
+            (farm_id,)
+        )
+        if not rows:
+            return None
+
+        schedule = _loads(rows[0][1])
+        schedule['id'] = rows[0][0]
+        return schedule
+
+    # ===== ALERTS =====
+
+    async def create_alert(self, farm_id: str, alert_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new alert."""
+        alert_data['farm_id'] = farm_id
+        alert_data['created_at'] = datetime.utcnow()
+        alert_data['read'] = False
+
+        alert_id = _new_id()
+        await self._run(self._transaction, [
+            (
+                "INSERT INTO alerts (id, farm_id, read, created_at, data) VALUES (?, ?, 0, ?, ?)",
+                [(alert_id, farm_id, to_epoch(alert_data['created_at']), _dumps(alert_data))]
+            ),
+            (UPSERT_ALERT_COUNTER, [(farm_id, alert_severity(alert_data), 1, 1)]),
+        ])
+
+        return {"status": "success", "alert_id": alert_id}
+
+    def _alerts_query(self, farm_id: str, unread_only: bool):
+        if unread_only:
+            return 'alerts', 'farm_id = ? AND read = 0', (farm_id,), 'created_at', True
+        return 'alerts', 'farm_id = ?', (farm_id,), 'created_at', True
+
+    async def get_alerts(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Get the most recent alerts for a farm."""
+        page = await self.get_alerts_page(farm_id, unread_only, limit=limit)
+        return page["items"]
+
+    def iter_alerts(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a farm's alerts, newest first, page by page with bounded memory."""
+        return self._iter_items(self._alerts_query(farm_id, unread_only), fields, cursor)
+
+    async def get_alerts_page(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a farm's alerts and the cursor of the next page."""
+        return await self._page(
+            *self._alerts_query(farm_id, unread_only),
+            limit=limit,
+            cursor=cursor,
+            fields=fields
+        )
+
+    @staticmethod
+    def _mark_read(conn: sqlite3.Connection, where: str, params: tuple) -> int:
+        """Mark the matching unread alerts read and decrement their counters in one transaction."""
+        read_at = json.dumps(_encode_value(datetime.utcnow()))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"SELECT id, farm_id, data FROM alerts WHERE {where} AND read = 0", params
+            ).fetchall()
+            decrements: Dict[Tuple[str, str], int] = {}
+            for _, farm_id, data in rows:
+                key = (farm_id, alert_severity(_loads(data)))
+                decrements[key] = decrements.get(key, 0) + 1
+
+            conn.executemany(
+                "UPDATE alerts SET read = 1, "
+                "data = json_set(data, '$.read', json('true'), '$.read_at', json(?)) WHERE id = ?",
+                [(read_at, alert_id) for alert_id, _, _ in rows]
+            )
+            conn.executemany(
+                UPSERT_ALERT_COUNTER,
+                [(farm_id, severity, 0, -count) for (farm_id, severity), count in decrements.items()]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    async def mark_alert_read(self, alert_id: str) -> Dict[str, Any]:
+        """Mark an alert as read and decrement its farm's unread counters."""
+        rows = await self._run(self._fetch, "SELECT 1 FROM alerts WHERE id = ?", (alert_id,))
+        if not rows:
+            raise KeyError(f"Alert not found: {alert_id}")
+        await self._run(self._mark_read, "id = ?", (alert_id,))
+
+        return {"status": "success", "alert_id": alert_id}
+
+    async def mark_all_read(self, farm_id: str) -> Dict[str, Any]:
+        """Mark every unread alert of a farm as read in one transaction."""
+        marked = await self._run(self._mark_read, "farm_id = ?", (farm_id,))
+        return {"status": "success", "farm_id": farm_id, "marked": marked}
+
+    async def get_alert_counts(self, farm_id: str) -> Dict[str, Any]:
+        """Get a farm's alert counters from its counter rows."""
+        rows = await self._run(
+            self._fetch,
+            "SELECT severity, total, unread FROM alert_counters WHERE farm_id = ?",
+            (farm_id,)
+        )
+        if not rows:
+            return await self.rebuild_alert_counters(farm_id)
+
+        return format_alert_counts(
+            farm_id,
+            sum(row[1] for row in rows),
+            sum(row[2] for row in rows),
+            {severity: unread for severity, _, unread in rows}
+        )
+
+    @staticmethod
+    def _rebuild_counters(
+        conn: sqlite3.Connection,
+        farm_id: Optional[str]
+    ) -> Dict[Tuple[str, str], List[int]]:
+        """Recompute the counter rows of one farm (or every farm) from the alerts in one transaction."""
+        where, params = ("WHERE farm_id = ?", (farm_id,)) if farm_id is not None else ("", ())
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            counts: Dict[Tuple[str, str], List[int]] = {}
+            for farm, read, data in conn.execute(f"SELECT farm_id, read, data FROM alerts {where}", params):
+                severity_counts = counts.setdefault((farm, alert_severity(_loads(data))), [0, 0])
+                severity_counts[0] += 1
+                severity_counts[1] += 0 if read else 1
+            conn.execute(f"DELETE FROM alert_counters {where}", params)
+            conn.executemany(
+                UPSERT_ALERT_COUNTER,
+                [(farm, severity, total, unread) for (farm, severity), (total, unread) in counts.items()]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return counts
+
+    async def rebuild_alert_counters(self, farm_id: str) -> Dict[str, Any]:
+        """Recompute a farm's alert counters from its alerts."""
+        counts = await self._run(self._rebuild_counters, farm_id)
+        return format_alert_counts(
+            farm_id,
+            sum(total for total, _ in counts.values()),
+            sum(unread for _, unread in counts.values()),
+            {severity: unread for (_, severity), (_, unread) in counts.items()}
+        )
+
+    # ===== TOKEN USAGE =====
+
+    async def add_token_usage(self, rows: List[Dict[str, Any]], flush_id: Optional[str] = None) -> Dict[str, Any]:
+        """Add token counts to the usage rows in one transaction (once per flush_id)."""
+        values = [
+            (
+                row["day"], row["farm_id"], row["endpoint"], row["model"],
+                row["calls"], row["input_tokens"], row["output_tokens"], row["cached_tokens"]
+            )
+            for row in rows
+        ]
+
+        def add(conn: sqlite3.Connection):
+            now = datetime.utcnow()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if flush_id is not None:
+                    conn.execute(
+                        "DELETE FROM token_usage_flushes WHERE flushed_at < ?",
+                        ((now - timedelta(days=7)).isoformat(),)
+                    )
+                    added = conn.execute(
+                        "INSERT OR IGNORE INTO token_usage_flushes (flush_id, flushed_at) VALUES (?, ?)",
+                        (flush_id, now.isoformat())
+                    ).rowcount
+                    if not added:
+                        conn.execute("ROLLBACK")
+                        return
+                conn.executemany(UPSERT_TOKEN_USAGE, values)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+        await self._run(add)
+        return {"status": "success", "rows": len(rows)}
+
+    async def get_token_usage(self, day: str, farm_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get a day's token usage rows, optionally for one farm."""
+        if farm_id:
+            where, params = 'day = ? AND farm_id = ?', (day, farm_id)
+        else:
+            where, params = 'day = ?', (day,)
+
+        columns = ("day", "farm_id", "endpoint", "model", "calls", "input_tokens", "output_tokens", "cached_tokens")
+        rows = await self._run(self._fetch, f"SELECT {', '.join(columns)} FROM token_usage WHERE {where}", params)
+        return [dict(zip(columns, row)) for row in rows]
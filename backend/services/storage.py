@@ -0,0 +1,326 @@
+"""
+Storage Backend
+Interface shared by the Firestore and embedded SQLite storage implementations.
+"""
+
+import os
+import json
+import base64
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
+
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def encode_cursor(value: Any, doc_id: str) -> str:
+    """Encode the sort value and document ID of the last item as an opaque page token."""
+    if isinstance(value, datetime):
+        value = {"$dt": value.isoformat()}
+    raw = json.dumps([value, doc_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[Any, str]:
+    """Decode a page token produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, doc_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor")
+    if isinstance(value, dict) and "$dt" in value:
+        value = datetime.fromisoformat(value["$dt"])
+    return value, doc_id
+
+
+def alert_severity(alert_data: Dict[str, Any]) -> str:
+    """Normalized severity used to bucket alert counters."""
+    return str(alert_data.get("severity") or "unknown").lower()
+
+
+def format_alert_counts(farm_id: str, total: int, unread: int, unread_by_severity: Dict[str, int]) -> Dict[str, Any]:
+    """Alert counter response shared by all backends."""
+    return {
+        "farm_id": farm_id,
+        "total": max(total, 0),
+        "unread": max(unread, 0),
+        "unread_by_severity": {severity: count for severity, count in unread_by_severity.items() if count > 0},
+    }
+
+
+class StorageBackend(ABC):
+    """Farm, crop, analysis, sensor, irrigation and alert persistence."""
+
+    # ===== FARM OPERATIONS =====
+
+    @abstractmethod
+    async def create_farm(self, farm_id: str, farm_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new farm record."""
+
+    @abstractmethod
+    async def get_farm(self, farm_id: str) -> Optional[Dict[str, Any]]:
+        """Get farm data by ID."""
+
+    @abstractmethod
+    async def get_farms(self, farm_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Get several farms at once."""
+
+    @abstractmethod
+    async def update_farm(self, farm_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Update farm data."""
+
+    @abstractmethod
+    async def list_farms(
+        self,
+        user_id: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """List all farms, optionally filtered by user."""
+
+    @abstractmethod
+    def iter_farms(
+        self,
+        user_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream farms page by page with bounded memory."""
+
+    @abstractmethod
+    async def list_farms_page(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of farms and the cursor of the next page."""
+
+    # ===== CROP OPERATIONS =====
+
+    @abstractmethod
+    async def add_crop(self, farm_id: str, crop_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Add a crop to a farm."""
+
+    @abstractmethod
+    async def get_crops(self, farm_id: str, fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Get all crops for a farm."""
+
+    @abstractmethod
+    def iter_crops(
+        self,
+        farm_id: str,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a farm's crops page by page with bounded memory."""
+
+    @abstractmethod
+    async def get_crops_page(
+        self,
+        farm_id: str,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a farm's crops and the cursor of the next page."""
+
+    @abstractmethod
+    async def update_crop(self, crop_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
+        """Update crop data."""
+
+    # ===== ANALYSIS HISTORY =====
+
+    @abstractmethod
+    async def save_analysis(self, analysis_type: str, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Save an analysis result."""
+
+    @abstractmethod
+    async def get_analyses(
+        self,
+        farm_id: str,
+        analysis_type: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Get analysis history for a farm, newest first."""
+
+    @abstractmethod
+    async def save_analyses_bulk(self, analyses: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Save many (analysis_type, analysis_data) pairs at once."""
+
+    @abstractmethod
+    async def find_analysis(
+        self,
+        request_key: str,
+        max_age_seconds: Optional[float] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Get the newest analysis stored for a request key, if recent enough."""
+
+    # ===== SENSOR DATA =====
+
+    @abstractmethod
+    async def save_sensor_data(self, farm_id: str, sensor_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Save sensor readings."""
+
+    @abstractmethod
+    async def save_sensor_data_bulk(self, farm_id: str, readings: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Save many sensor readings at once."""
+
+    @abstractmethod
+    async def get_sensor_data(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Get recent sensor data, newest first."""
+
+    @abstractmethod
+    def iter_sensor_data(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream recent sensor data, newest first, page by page with bounded memory."""
+
+    @abstractmethod
+    async def get_sensor_data_page(
+        self,
+        farm_id: str,
+        sensor_type: Optional[str] = None,
+        hours: int = 24,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of recent sensor data and the cursor of the next page."""
+
+    # ===== SENSOR ROLLUPS =====
+
+    @abstractmethod
+    async def apply_sensor_rollups(
+        self,
+        farm_id: str,
+        aggregates: Dict[tuple, Dict[str, Any]],
+        replace: bool = False
+    ) -> int:
+        """Merge (or with replace=True, overwrite) rollup aggregates for a farm."""
+
+    @abstractmethod
+    async def get_sensor_series(
+        self,
+        farm_id: str,
+        sensor_id: str,
+        start: datetime,
+        end: datetime,
+        resolution: Optional[str] = None,
+        max_points: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Get a sensor time series from rollups."""
+
+    @abstractmethod
+    async def backfill_sensor_rollups(self, farm_id: str) -> Dict[str, Any]:
+        """Rebuild all rollups of a farm from its raw sensor readings."""
+
+    # ===== IRRIGATION SCHEDULES =====
+
+    @abstractmethod
+    async def save_irrigation_schedule(self, farm_id: str, schedule_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Save an irrigation schedule."""
+
+    @abstractmethod
+    async def get_active_irrigation_schedule(self, farm_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current active irrigation schedule."""
+
+    # ===== ALERTS =====
+
+    @abstractmethod
+    async def create_alert(self, farm_id: str, alert_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a new alert."""
+
+    @abstractmethod
+    async def get_alerts(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Get the most recent alerts for a farm."""
+
+    @abstractmethod
+    def iter_alerts(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        fields: Optional[List[str]] = None,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a farm's alerts, newest first, page by page with bounded memory."""
+
+    @abstractmethod
+    async def get_alerts_page(
+        self,
+        farm_id: str,
+        unread_only: bool = False,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Get one page of a farm's alerts and the cursor of the next page."""
+
+    @abstractmethod
+    async def mark_alert_read(self, alert_id: str) -> Dict[str, Any]:
+        """Mark an alert as read."""
+
+    @abstractmethod
+    async def mark_all_read(self, farm_id: str) -> Dict[str, Any]:
+        """Mark every unread alert of a farm as read."""
+
+    @abstractmethod
+    async def get_alert_counts(self, farm_id: str) -> Dict[str, Any]:
+        """Get a farm's materialized alert counters (total, unread, unread per severity)."""
+
+    @abstractmethod
+    async def rebuild_alert_counters(self, farm_id: str) -> Dict[str, Any]:
+        """Recompute a farm's alert counters from its alerts."""
+
+    # ===== TOKEN USAGE =====
+
+    @abstractmethod
+    async def add_token_usage(self, rows: List[Dict[str, Any]], flush_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add calls and token counts to the totals of each row's (day, farm_id, endpoint, model).
+        
+        Repeating a call with the same rows and flush_id adds nothing already added.
+        """
+
+    @abstractmethod
+    async def get_token_usage(self, day: str, farm_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the token totals of a day (YYYY-MM-DD), optionally for one farm."""
+
+    # ===== LIFECYCLE =====
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Read cache statistics (empty for backends without a read cache)."""
+        return {}
+
+    @abstractmethod
+    def close(self):
+        """Release connections held by the backend."""
+
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    """Build the storage backend selected by STORAGE_BACKEND (firestore or sqlite)."""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "firestore")).lower()
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    if backend == "firestore":
+        from .firestore import FirestoreService
+        return FirestoreService()
+    raise ValueError(f"Unsupported STORAGE_BACKEND: {backend}")
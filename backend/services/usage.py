@@ -0,0 +1,397 @@
+"""
+Token Usage
+Per-call Gemini token accounting, aggregated per day, farm, endpoint and model, with per-farm daily budgets.
+"""
+
+import os
+import time
+import uuid
+import heapq
+import asyncio
+import itertools
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Awaitable, Dict, Any, List, Optional, Callable, Tuple, TypeVar
+
+from .metrics import LLM_TOKENS, current_agent
+from .storage import StorageBackend
+
+
+# Farm of calls made outside a farm-scoped request (jobs, briefings without a farm)
+UNATTRIBUTED = "unattributed"
+
+# Endpoint (analysis type) and farm of the request being served; model calls are attributed to them
+usage_scope: ContextVar[Tuple[str, str]] = ContextVar("usage_scope", default=("", ""))
+
+UsageKey = Tuple[str, str, str, str]
+
+# Budget states, in order of severity
+BUDGET_OK = "ok"
+BUDGET_DEGRADED = "degraded"
+BUDGET_EXHAUSTED = "exhausted"
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of calling the model when a farm's (or the key's) hard token budget is used up."""
+
+
+# Refusals during the current budgeted() call; a list, so tasks it spawns add to the same one
+_refusals: ContextVar[Optional[List[BudgetExceededError]]] = ContextVar("budget_refusals", default=None)
+
+T = TypeVar("T")
+
+
+async def budgeted(call: Awaitable[T]) -> T:
+    """
+    Await an agent call, raising BudgetExceededError if any model call in it was refused,
+    including refusals the agent caught and turned into an error result.
+    """
+    refusals: List[BudgetExceededError] = []
+    token = _refusals.set(refusals)
+    try:
+        result = await call
+    except Exception:
+        if refusals:
+            raise refusals[0]
+        raise
+    finally:
+        _refusals.reset(token)
+    if refusals:
+        raise refusals[0]
+    return result
+
+
+def today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def token_counts(usage_metadata: Any) -> Tuple[int, int, int]:
+    """(input, output, cached) tokens of a Gemini response's usage_metadata; thinking tokens count as output."""
+    if usage_metadata is None:
+        return 0, 0, 0
+    return (
+        getattr(usage_metadata, "prompt_token_count", None) or 0,
+        (getattr(usage_metadata, "candidates_token_count", None) or 0)
+        + (getattr(usage_metadata, "thoughts_token_count", None) or 0),
+        getattr(usage_metadata, "cached_content_token_count", None) or 0,
+    )
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """Parse "farm-a=200000,farm-b=50000" into per-farm daily token budgets."""
+    budgets = {}
+    for entry in spec.split(","):
+        farm_id, _, tokens = entry.strip().partition("=")
+        if farm_id and tokens:
+            budgets[farm_id.strip()] = int(tokens)
+    return budgets
+
+
+def _add(rows: Dict[UsageKey, List[int]], key: UsageKey, counts: List[int]):
+    totals = rows.get(key)
+    if totals is None:
+        rows[key] = list(counts)
+    else:
+        for i, value in enumerate(counts):
+            totals[i] += value
+
+
+def _row(key: UsageKey, counts: List[int]) -> Dict[str, Any]:
+    day, farm_id, endpoint, model = key
+    calls, input_tokens, output_tokens, cached_tokens = counts
+    return {
+        "day": day,
+        "farm_id": farm_id,
+        "endpoint": endpoint,
+        "model": model,
+        "calls": calls,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens,
+    }
+
+
+class TokenAccountant:
+    """
+    Aggregates token usage in memory and adds it to the storage totals from a background task.
+
+    Budgets count input plus output tokens per UTC day. Past a farm's budget, model
+    calls switch to the fallback model; past budget x hard ratio they are refused.
+    LLM_DAILY_TOKENS applies the same rule to the whole API key. Budget checks use
+    the stored totals of every worker (refreshed on each flush) plus this worker's
+    unflushed usage, so a farm can overshoot by at most one flush interval.
+    """
+
+    def __init__(
+        self,
+        flush_interval: Optional[float] = None,
+        farm_budget: Optional[int] = None,
+        farm_budgets: Optional[Dict[str, int]] = None,
+        key_budget: Optional[int] = None,
+        hard_ratio: Optional[float] = None,
+        fallback_model: Optional[str] = None,
+        max_prompts: Optional[int] = None
+    ):
+        """Initialize the accountant from arguments or environment settings (budgets of 0 are unlimited)."""
+        self.flush_interval = flush_interval or float(os.getenv("USAGE_FLUSH_SECONDS", 10))
+        self.farm_budget = farm_budget if farm_budget is not None else int(os.getenv("LLM_FARM_DAILY_TOKENS", 0))
+        self.farm_budgets = farm_budgets if farm_budgets is not None else parse_budgets(os.getenv("LLM_FARM_BUDGETS", ""))
+        self.key_budget = key_budget if key_budget is not None else int(os.getenv("LLM_DAILY_TOKENS", 0))
+        self.hard_ratio = hard_ratio or float(os.getenv("LLM_BUDGET_HARD_RATIO", 1.5))
+        self.fallback_model = fallback_model or os.getenv("LLM_FALLBACK_MODEL", "gemini-2.0-flash-lite")
+        self.max_prompts = max_prompts or int(os.getenv("USAGE_TOP_PROMPTS", 50))
+
+        self.storage_factory: Optional[Callable[[], StorageBackend]] = None
+        self._pending: Dict[UsageKey, List[int]] = {}
+        # Usage being written under _flush_id; kept as is until a flush of it succeeds
+        self._flushing: Dict[UsageKey, List[int]] = {}
+        self._flush_id = ""
+        # Stored budget tokens per farm for _totals_day, as of the last refresh
+        self._totals: Dict[str, int] = {}
+        self._totals_day = ""
+        self._largest: List[tuple] = []
+        self._sequence = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+        self.calls = 0
+        self.degraded_calls = 0
+        self.refused_calls = 0
+        self.flushes = 0
+        self.failures = 0
+
+    @property
+    def budgets_enabled(self) -> bool:
+        return bool(self.farm_budget or self.farm_budgets or self.key_budget)
+
+    # ===== LIFECYCLE =====
+
+    async def start(self, storage_factory: Callable[[], StorageBackend]):
+        """Start the background flush task; storage_factory returns the backend totals are kept in."""
+        self.storage_factory = storage_factory
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out the unflushed usage."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.storage_factory is not None:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> bool:
+        """
+        Add the unflushed usage to the stored totals and refresh the budget totals.
+
+        A failed flush is retried with the same rows and flush ID, which storage
+        uses to skip what the failed attempt had already added; usage recorded
+        meanwhile waits for the next flush.
+        """
+        if not self._flushing:
+            if not self._pending and not self.budgets_enabled:
+                return True
+            self._flushing, self._pending = self._pending, {}
+            self._flush_id = uuid.uuid4().hex
+        try:
+            storage = self.storage_factory()
+            if self._flushing:
+                await storage.add_token_usage(
+                    [_row(key, counts) for key, counts in self._flushing.items()],
+                    flush_id=self._flush_id
+                )
+        except Exception:
+            self.failures += 1
+            return False
+
+        self.flushes += 1
+        if self.budgets_enabled:
+            day = today()
+            try:
+                rows = await storage.get_token_usage(day)
+            except Exception:
+                # Keep counting what was just written until the next refresh succeeds
+                rows = None
+                for (key_day, farm_id, _, _), counts in self._flushing.items():
+                    if key_day == self._totals_day:
+                        self._totals[farm_id] = self._totals.get(farm_id, 0) + counts[1] + counts[2]
+            if rows is not None:
+                totals: Dict[str, int] = {}
+                for row in rows:
+                    totals[row["farm_id"]] = totals.get(row["farm_id"], 0) + row["input_tokens"] + row["output_tokens"]
+                self._totals, self._totals_day = totals, day
+        self._flushing = {}
+        return True
+
+    # ===== RECORDING =====
+
+    def record(self, model: str, usage_metadata: Any, degraded: bool = False):
+        """Count one model response against the current request's endpoint and farm."""
+        input_tokens, output_tokens, cached_tokens = token_counts(usage_metadata)
+        endpoint, farm_id = usage_scope.get()
+        if not endpoint:
+            agent, method = current_agent.get()
+            endpoint = f"{agent}.{method}" if agent else "unknown"
+        farm_id = farm_id or UNATTRIBUTED
+
+        self.calls += 1
+        if degraded:
+            self.degraded_calls += 1
+        _add(self._pending, (today(), farm_id, endpoint, model), [1, input_tokens, output_tokens, cached_tokens])
+        LLM_TOKENS.labels(model, endpoint, "input").inc(input_tokens)
+        LLM_TOKENS.labels(model, endpoint, "output").inc(output_tokens)
+        LLM_TOKENS.labels(model, endpoint, "cached").inc(cached_tokens)
+
+        prompt = (input_tokens, next(self._sequence), {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cached_tokens": cached_tokens,
+            "endpoint": endpoint,
+            "farm_id": farm_id,
+            "agent": ".".join(filter(None, current_agent.get())),
+            "model": model,
+            "at": time.time(),
+        })
+        if len(self._largest) < self.max_prompts:
+            heapq.heappush(self._largest, prompt)
+        elif input_tokens > self._largest[0][0]:
+            heapq.heapreplace(self._largest, prompt)
+
+    # ===== BUDGETS =====
+
+    def farm_limit(self, farm_id: str) -> int:
+        """Daily token budget of a farm (0: unlimited)."""
+        if not farm_id or farm_id == UNATTRIBUTED:
+            return 0
+        return self.farm_budgets.get(farm_id, self.farm_budget)
+
+    def used_today(self) -> Dict[str, int]:
+        """Budget tokens (input + output) used today per farm, stored plus unflushed."""
+        day = today()
+        used = dict(self._totals) if self._totals_day == day else {}
+        for rows in (self._flushing, self._pending):
+            for (key_day, farm_id, _, _), counts in rows.items():
+                if key_day == day:
+                    used[farm_id] = used.get(farm_id, 0) + counts[1] + counts[2]
+        return used
+
+    def budget_status(self, farm_id: Optional[str]) -> Dict[str, Any]:
+        """Today's usage of a farm against its budget and the key-wide budget."""
+        used = self.used_today()
+        farm_used = used.get(farm_id or UNATTRIBUTED, 0)
+        key_used = sum(used.values())
+        ratios = [
+            used_tokens / limit
+            for used_tokens, limit in ((farm_used, self.farm_limit(farm_id)), (key_used, self.key_budget))
+            if limit
+        ]
+        ratio = max(ratios, default=0.0)
+        state = BUDGET_EXHAUSTED if ratio >= self.hard_ratio else BUDGET_DEGRADED if ratio >= 1 else BUDGET_OK
+        return {
+            "farm_id": farm_id,
+            "day": today(),
+            "state": state,
+            "used_tokens": farm_used,
+            "budget_tokens": self.farm_limit(farm_id) or None,
+            "key_used_tokens": key_used,
+            "key_budget_tokens": self.key_budget or None,
+            "hard_ratio": self.hard_ratio,
+            "fallback_model": self.fallback_model,
+        }
+
+    def budget_state(self, farm_id: Optional[str]) -> str:
+        """ok, degraded (use the fallback model) or exhausted (no model calls)."""
+        if not self.budgets_enabled:
+            return BUDGET_OK
+        return self.budget_status(farm_id)["state"]
+
+    def choose_model(self, model: str) -> str:
+        """
+        The model to call for the current request given its farm's budget.
+
+        Raises:
+            BudgetExceededError: when the hard budget is used up
+        """
+        state = self.budget_state(usage_scope.get()[1] or None)
+        if state == BUDGET_EXHAUSTED:
+            self.refused_calls += 1
+            error = BudgetExceededError("Daily token budget exhausted")
+            refusals = _refusals.get()
+            if refusals is not None:
+                refusals.append(error)
+            raise error
+        if state == BUDGET_DEGRADED:
+            return self.fallback_model
+        return model
+
+    # ===== REPORTS =====
+
+    async def usage(self, day: Optional[str] = None, farm_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Stored totals of a day (all workers) plus this worker's unflushed usage, largest first."""
+        day = day or today()
+        rows: Dict[UsageKey, List[int]] = {}
+        for row in await self.storage_factory().get_token_usage(day, farm_id):
+            key = (row["day"], row["farm_id"], row["endpoint"], row["model"])
+            _add(rows, key, [row["calls"], row["input_tokens"], row["output_tokens"], row["cached_tokens"]])
+        for local in (self._flushing, self._pending):
+            for key, counts in local.items():
+                if key[0] == day and (farm_id is None or key[1] == farm_id):
+                    _add(rows, key, counts)
+
+        return sorted(
+            (_row(key, counts) for key, counts in rows.items()),
+            key=lambda row: row["input_tokens"] + row["output_tokens"],
+            reverse=True
+        )
+
+    async def top_prompts(self, limit: int, day: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Prompt-size offenders: endpoints ranked by average prompt tokens for a day,
+        and the largest single prompts this worker has sent since it started.
+        """
+        endpoints: Dict[str, List[int]] = {}
+        for row in await self.usage(day):
+            totals = endpoints.setdefault(row["endpoint"], [0, 0, 0])
+            totals[0] += row["calls"]
+            totals[1] += row["input_tokens"]
+            totals[2] += row["cached_tokens"]
+
+        ranked = sorted(
+            (
+                {
+                    "endpoint": endpoint,
+                    "calls": calls,
+                    "input_tokens": input_tokens,
+                    "avg_input_tokens": round(input_tokens / calls, 1) if calls else 0.0,
+                    "cached_ratio": round(cached_tokens / input_tokens, 3) if input_tokens else 0.0,
+                }
+                for endpoint, (calls, input_tokens, cached_tokens) in endpoints.items()
+            ),
+            key=lambda entry: entry["avg_input_tokens"],
+            reverse=True
+        )
+        return {
+            "day": day or today(),
+            "endpoints": ranked[:limit],
+            "largest_prompts": [prompt for _, _, prompt in heapq.nlargest(limit, self._largest)],
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Call, degrade, refusal and flush counters."""
+        return {
+            "calls": self.calls,
+            "degraded_calls": self.degraded_calls,
+            "refused_calls": self.refused_calls,
+            "unflushed_rows": len(self._pending) + len(self._flushing),
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "budgets_enabled": self.budgets_enabled,
+        }
+
+
+ACCOUNTANT = TokenAccountant()
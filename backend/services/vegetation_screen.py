@@ -0,0 +1,111 @@
+"""
+Vegetation Pre-screen
+RGB vegetation indices computed locally to decide whether an image needs a vision model call.
+"""
+
+import os
+from typing import Dict, Any, List
+
+import numpy as np
+from PIL import Image
+
+
+SCREEN_EDGE = 128
+GRID_SIZE = 16
+
+# Excess Green (chromatic coordinates) above which a pixel counts as vegetation
+EXG_VEGETATION = 0.05
+
+# Verdict thresholds (fractions of the image)
+HEALTHY_MIN_COVERAGE = float(os.getenv("PRESCREEN_HEALTHY_MIN_COVERAGE", 0.6))
+HEALTHY_MAX_SYMPTOMS = float(os.getenv("PRESCREEN_HEALTHY_MAX_SYMPTOMS", 0.02))
+NON_CROP_MAX_COVERAGE = float(os.getenv("PRESCREEN_NON_CROP_MAX_COVERAGE", 0.03))
+HEALTHY_MIN_GLI = 0.08
+
+
+def _grid_means(values: np.ndarray, grid: int) -> List[List[float]]:
+    """Average a 2-D array over a grid x grid block layout."""
+    h, w = values.shape
+    cells = (np.arange(h) * grid // h)[:, None] * grid + (np.arange(w) * grid // w)[None, :]
+    sums = np.bincount(cells.ravel(), weights=values.ravel(), minlength=grid * grid)
+    counts = np.bincount(cells.ravel(), minlength=grid * grid)
+    means = sums / np.maximum(counts, 1)
+    return np.round(means, 3).reshape(grid, grid).tolist()
+
+
+def screen(img: Image.Image) -> Dict[str, Any]:
+    """
+    Compute vegetation indices and symptom fractions for an image.
+
+    Returns the indices, a verdict ("healthy", "non_crop" or "ambiguous") and
+    ExG / vegetation coverage heatmaps on a GRID_SIZE x GRID_SIZE grid.
+    """
+    small = img.convert("RGB")
+    small.thumbnail((SCREEN_EDGE, SCREEN_EDGE), Image.Resampling.BILINEAR)
+    rgb = np.asarray(small, dtype=np.float32) / 255.0
+    R, G, B = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    # Chromatic coordinates make ExG robust to illumination
+    total = R + G + B + 1e-6
+    exg = (2 * G - R - B) / total
+
+    vari_den = G + R - B
+    vari = np.divide(G - R, vari_den, out=np.zeros_like(G), where=np.abs(vari_den) > 1e-3)
+    vari = np.clip(vari, -1.0, 1.0)
+    gli = (2 * G - R - B) / (2 * G + R + B + 1e-6)
+
+    # HSV for symptom classification
+    v = rgb.max(axis=-1)
+    c = v - rgb.min(axis=-1)
+    s = np.where(v > 0, c / np.maximum(v, 1e-6), 0.0)
+    safe_c = np.maximum(c, 1e-6)
+    hue = np.select(
+        [v == R, v == G],
+        [((G - B) / safe_c) % 6, (B - R) / safe_c + 2],
+        (R - G) / safe_c + 4
+    ) * 60.0
+    hue = np.where(c > 1e-6, hue, 0.0)
+
+    vegetation = (exg > EXG_VEGETATION) & (G > R)
+    # Chlorosis: yellow, saturated, bright leaf tissue
+    chlorotic = (hue >= 40) & (hue < 70) & (s > 0.35) & (v > 0.45) & ~vegetation
+    # Necrosis: brown to dark brown tissue
+    necrotic = (hue >= 10) & (hue < 40) & (s > 0.35) & (v > 0.12) & (v < 0.55)
+
+    coverage = float(vegetation.mean())
+    chlorosis = float(chlorotic.mean())
+    necrosis = float(necrotic.mean())
+    mean_gli = float(gli[vegetation].mean()) if vegetation.any() else 0.0
+
+    # Brown necrotic foliage has no green either; only images without symptoms are called non-crop
+    if (
+        coverage <= NON_CROP_MAX_COVERAGE
+        and chlorosis <= NON_CROP_MAX_COVERAGE
+        and necrosis <= NON_CROP_MAX_COVERAGE
+    ):
+        verdict = "non_crop"
+    elif (
+        coverage >= HEALTHY_MIN_COVERAGE
+        and chlorosis <= HEALTHY_MAX_SYMPTOMS
+        and necrosis <= HEALTHY_MAX_SYMPTOMS
+        and mean_gli >= HEALTHY_MIN_GLI
+    ):
+        verdict = "healthy"
+    else:
+        verdict = "ambiguous"
+
+    return {
+        "verdict": verdict,
+        "vegetation_coverage": round(coverage, 4),
+        "chlorosis_fraction": round(chlorosis, 4),
+        "necrosis_fraction": round(necrosis, 4),
+        "excess_green": round(float(exg.mean()), 4),
+        "vari": round(float(vari.mean()), 4),
+        "green_leaf_index": round(float(gli.mean()), 4),
+        "vegetation_gli": round(mean_gli, 4),
+        "heatmap": {
+            "grid": GRID_SIZE,
+            "excess_green": _grid_means(exg, GRID_SIZE),
+            "coverage": _grid_means(vegetation.astype(np.float32), GRID_SIZE),
+        },
+    }